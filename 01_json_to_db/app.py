@@ -1,34 +1,38 @@
+import os
 import pandas as pd
-import zipfile
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from joblib import Parallel, delayed
 
 import config
 import psql
+import egrul_reader
+import egrul_archive
+import egrul_cache
+import metrics
+from egrul_batch import EgrulBatch
 
 db = psql.PsqlConnector()
 
-def time_decorator(func):
-    """Декоратор для отображения времени исполнения функции"""
-    def decorator(*args, **kwargs):
-        start_dttm = pd.to_datetime('today')
-        result = func(*args, **kwargs)
-        end_dttm = pd.to_datetime('today')
-        diff = end_dttm - start_dttm
-        print(f'{func.__name__} - время выполнения: {round(diff.total_seconds(), 2)} с')
-        return result
-    return decorator
-
 def create_db_schema():
     """Создание структура базы данных"""
     db.execute_sql('sql/create_schema_hw1.sql')
     db.execute_sql('sql/recreate_table_hw1.okved.sql')
-    db.execute_sql('sql/recreate_table_hw1.telecom_companies.sql')
+    for table in config.okved_segments:
+        if config.egrul_incremental:
+            db.execute_sql('sql/create_table_hw1.egrul_segment.sql', table=table)
+        else:
+            db.execute_sql('sql/recreate_table_hw1.egrul_segment.sql', table=table)
+    db.execute_sql('sql/create_table_hw1.egrul_manifest.sql')
+    if not config.egrul_incremental:
+        db.truncate_table(config.schema, config.egrul_manifest_table, restart_identity=False)
 
-@time_decorator
+@metrics.timed
 def upload_okved():
     """1 задание домашней работы - загрузка данных ОКВЭД"""
     okved = pd.read_json(config.okved_filepath, compression='zip')
     db.insert_values(okved, schema=config.schema, table=config.okved_table)
+    metrics.add(rows_in=len(okved), rows_out=len(okved), bytes_read=os.path.getsize(config.okved_filepath))
     
 def get_filelist(zip_path, max_files_count=None):
     """Получение списка файлов в архиве
@@ -40,68 +44,354 @@ def get_filelist(zip_path, max_files_count=None):
     max_files_count: int, default: None
         Количество читаемых файлов (для тестирования).
     """
-    with zipfile.ZipFile(zip_path, 'r') as zip_archive:
-        filelist = zip_archive.namelist()
+    filelist = egrul_archive.get_archive(zip_path).namelist()
     if max_files_count:
         return filelist[:max_files_count]
     else:
         return filelist
 
-def get_okved_code(item):
-    """Получение кода ОКВЭД в данных ЕГРЮЛ.
+def get_fileinfo(zip_path, max_files_count=None):
+    """Получение описаний файлов в архиве (zipfile.ZipInfo: имя, CRC32, размер)
     
     Аргументы
     ----------
-    item: dict
-        Словарь, ячейка данных в датафрейме.
+    zip_path: str
+        Путь к zip-файлу.
+    max_files_count: int, default: None
+        Количество читаемых файлов (для тестирования).
     """
-    if item.get('СвОКВЭД'):
-        if item['СвОКВЭД'].get('СвОКВЭДОсн'):
-            return item['СвОКВЭД']['СвОКВЭДОсн']['КодОКВЭД']
-        
-def upload_egrul_job(filename, okved_primary_code, dtypes):
-    """Функция для загрузки данных ЕГРЮЛ из одного JSON-файла.
+    infolist = list(egrul_archive.get_archive(zip_path).infolist)
+    if max_files_count:
+        return infolist[:max_files_count]
+    else:
+        return infolist
+
+def get_okved_lookup(okved_segments):
+    """Таблица принадлежности кодов ОКВЭД сегментам загрузки
+    по справочнику ОКВЭД в базе данных, см. egrul_reader.get_okved_lookup.
+    
+    Аргументы
+    ----------
+    okved_segments: dict[str, list[str]]
+        Сегменты загрузки: название таблицы - список кодов ОКВЭД.
+    """
+    okved = db.read_query(f'SELECT code, parent_code FROM {config.schema}.{config.okved_table}')
+    return egrul_reader.get_okved_lookup(okved, okved_segments)
+
+def get_okved_segments_key(okved_segments):
+    """Описание сегментов загрузки для манифеста вида
+    'it_companies:62,63;telecom_companies:61'.
+    
+    Аргументы
+    ----------
+    okved_segments: dict[str, list[str]]
+        Сегменты загрузки: название таблицы - список кодов ОКВЭД.
+    """
+    return ';'.join(
+        f'{table}:{",".join(str(code) for code in codes)}'
+        for table, codes in sorted(okved_segments.items())
+        )
+
+def get_pending_fileinfo(zip_path, infolist, okved_segments_key):
+    """Отбор файлов архива, которые еще не загружены, изменились
+    с момента загрузки (по CRC32 и размеру в манифесте) или были
+    загружены с другими сегментами ОКВЭД.
+    
+    Аргументы
+    ----------
+    zip_path: str
+        Путь к zip-файлу.
+    infolist: list[zipfile.ZipInfo]
+        Описания файлов в архиве.
+    okved_segments_key: str
+        Описание сегментов загрузки, см. get_okved_segments_key.
+    """
+    manifest = db.read_query(
+        f"""SELECT member_name, crc32, file_size, okved_segments
+        FROM {config.schema}.{config.egrul_manifest_table}
+        WHERE archive_path = %(archive_path)s""",
+        params={'archive_path': os.path.abspath(zip_path)},
+        )
+    loaded = {
+        member_name: (crc32, file_size, segments_key)
+        for member_name, crc32, file_size, segments_key in manifest.itertuples(index=False)
+        }
+    return [
+        info for info in infolist
+        if loaded.get(info.filename) != (info.CRC, info.file_size, okved_segments_key)
+        ]
+
+def delete_egrul_members(filenames, conn=None):
+    """Удаление компаний, загруженных из файлов архива filenames, из таблиц
+    всех сегментов - откат предыдущей (в т.ч. частичной) загрузки этих файлов.
+    
+    Аргументы
+    ----------
+    filenames: list[str]
+        Названия JSON-файлов в архиве.
+    conn: psycopg2.extensions.connection, default: None
+        Соединение внешней транзакции.
+    """
+    for table in config.okved_segments:
+        db.execute_query(
+            f"DELETE FROM {config.schema}.{table} WHERE source_filename = ANY(%(filenames)s)",
+            params={'filenames': list(filenames)},
+            conn=conn,
+            )
+
+def update_egrul_manifest(zip_path, loaded_files, okved_segments_key, conn=None):
+    """Отметка файлов архива как загруженных в манифесте.
+    
+    Аргументы
+    ----------
+    zip_path: str
+        Путь к zip-файлу.
+    loaded_files: list[tuple[zipfile.ZipInfo, int]]
+        Описания загруженных файлов и количество загруженных из них строк.
+    okved_segments_key: str
+        Описание сегментов, с которыми загружены файлы, см. get_okved_segments_key.
+    conn: psycopg2.extensions.connection, default: None
+        Соединение внешней транзакции.
+    """
+    archive_path = os.path.abspath(zip_path)
+    manifest = pd.DataFrame(
+        [
+            (archive_path, info.filename, info.CRC, info.file_size, rows_count, okved_segments_key)
+            for info, rows_count in loaded_files
+            ],
+        columns=['archive_path', 'member_name', 'crc32', 'file_size', 'rows_count', 'okved_segments'],
+        )
+    db.insert_values(
+        manifest,
+        schema=config.schema,
+        table=config.egrul_manifest_table,
+        on_conflict_clause="""ON CONFLICT (archive_path, member_name) DO
+            UPDATE SET crc32 = EXCLUDED.crc32, file_size = EXCLUDED.file_size,
+            rows_count = EXCLUDED.rows_count, okved_segments = EXCLUDED.okved_segments,
+            load_dttm = CURRENT_TIMESTAMP""",
+        conn=conn,
+        )
+
+def insert_egrul_batch(egrul, table, conn=None):
+    """Загрузка пачки компаний в таблицу сегмента через COPY
+    (текстовый формат, сериализация без датафрейма).
+    
+    Аргументы
+    ----------
+    egrul: egrul_batch.EgrulBatch
+        Пачка компаний.
+    table: str
+        Название таблицы сегмента.
+    conn: psycopg2.extensions.connection, default: None
+        Соединение внешней транзакции.
+    """
+    db.copy_buffer(egrul.get_copy_buffer(), config.schema, table, egrul.columns, copy_format='text', conn=conn)
+    metrics.add(invalid_ids=sum(egrul.invalid_ids.values()))
+
+def upload_egrul_job(filename, okved_lookup, dtypes, read_mode='stream', batch_size=None):
+    """Функция для загрузки данных ЕГРЮЛ из одного JSON-файла
+    в таблицы сегментов ОКВЭД.
     
     Аргументы
     ----------
     filename: str
         Название JSON-файла в архиве.
-    okved_primary_code: str | int
-        Фильтруемый код ОКВЭД.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов ОКВЭД сегментам, см. get_okved_lookup.
     dtypes: dict
         Словарь-маппинг типов данных.
+    read_mode: str, default: 'stream'
+        Режим чтения JSON-файла:
+            'stream' - потоковый разбор по записям с загрузкой пачками по batch_size строк;
+            'prefilter' - как 'stream', но декодируются только записи, в сырых байтах
+                которых найден КодОКВЭД одного из сегментов;
+            'pandas' - чтение файла целиком через pd.read_json;
+            'cache' - фильтрация колоночного кэша всех компаний файла (egrul_cache),
+                кэш создается при первом чтении файла.
+    batch_size: int, default: None
+        Размер пачки для режима 'stream', по умолчанию config.egrul_batch_size.
+    """
+    if not batch_size:
+        batch_size = config.egrul_batch_size
+    
+    zip_archive = egrul_archive.get_archive(config.egrul_filepath)
+    with metrics.stage('upload_egrul_job', member=filename) as record:
+        info = zip_archive.getinfo(filename)
+        record['bytes_read'] = info.file_size
+        with db.connection() as conn:
+            delete_egrul_members([filename], conn=conn)
+            rows_count = 0
+            batches = get_egrul_batches(zip_archive, filename, okved_lookup, dtypes, read_mode, batch_size)
+            for segment, egrul in batches:
+                insert_egrul_batch(egrul, segment, conn=conn)
+                rows_count += len(egrul)
+            update_egrul_manifest(
+                config.egrul_filepath, [(info, rows_count)], get_okved_segments_key(config.okved_segments), conn=conn)
+        record['rows_out'] = rows_count
+
+def get_egrul_batches(zip_archive, filename, okved_lookup, dtypes, read_mode, batch_size):
+    """Чтение JSON-файла ЕГРЮЛ из архива (egrul_archive.EgrulArchive)
+    выбранным способом, см. upload_egrul_job.
+    
+    Возвращается
+    ----------
+    Генератор пар (название таблицы сегмента, egrul_batch.EgrulBatch с компаниями сегмента).
     """
-    with zipfile.ZipFile(config.egrul_filepath, 'r') as zip_archive:
-        with zip_archive.open(filename) as f:
-            egrul = pd.read_json(f, dtype=dtypes)
-            egrul['okved_code'] = egrul['data'].map(get_okved_code)
-            egrul = egrul[
-                (egrul['okved_code'].str.startswith(f'{okved_primary_code}.', na=False))
-                | (egrul['okved_code'] == str(okved_primary_code))
-                ]
-            egrul['source_filename'] = filename
-            egrul = egrul[[
-                'ogrn',
-                'inn',
-                'kpp',
-                'name',
-                'okved_code',
-                'source_filename',
-                ]]
-            db.insert_values(egrul, schema=config.schema, table=config.egrul_table)
-
-@time_decorator
+    if read_mode == 'cache':
+        segments = egrul_cache.get_cached_companies(
+            zip_archive, zip_archive.getinfo(filename), config.egrul_filepath,
+            config.egrul_cache_dir, okved_lookup)
+        for segment, egrul in segments.items():
+            yield segment, EgrulBatch.from_frame(egrul)
+        return
+    
+    with zip_archive.open(filename) as f:
+        if read_mode in ('stream', 'prefilter'):
+            yield from egrul_reader.iter_egrul_batches(
+                f, filename, okved_lookup, batch_size,
+                prefilter=read_mode == 'prefilter')
+        elif read_mode == 'pandas':
+            segments = egrul_reader.read_egrul_dataframe(f, filename, okved_lookup, dtypes)
+            for segment, egrul in segments.items():
+                yield segment, EgrulBatch.from_frame(egrul)
+        else:
+            raise ValueError(f'Неизвестный режим чтения ЕГРЮЛ: "{read_mode}"')
+
+def read_egrul_job(filename, okved_lookup, dtypes, read_mode):
+    """Воркер конвейера загрузки ЕГРЮЛ: чтение JSON-файла и распределение
+    его компаний по сегментам ОКВЭД без обращения к базе данных.
+    
+    Аргументы - см. upload_egrul_job.
+    
+    Возвращается
+    ----------
+    segments: dict[str, egrul_batch.EgrulBatch] | None
+        Название таблицы сегмента - компании сегмента из файла
+        или None, если в файле нет компаний ни одного сегмента.
+    """
+    segment_batches = {}
+    zip_archive = egrul_archive.get_archive(config.egrul_filepath)
+    with metrics.stage('read_egrul_job', member=filename) as record:
+        record['bytes_read'] = zip_archive.getinfo(filename).file_size
+        batches = get_egrul_batches(
+            zip_archive, filename, okved_lookup, dtypes, read_mode, config.egrul_batch_size)
+        for segment, egrul in batches:
+            if not egrul.empty:
+                segment_batches.setdefault(segment, []).append(egrul)
+                metrics.add(rows_out=len(egrul))
+    if segment_batches:
+        return {
+            segment: EgrulBatch.concat(batches)
+            for segment, batches in segment_batches.items()
+            }
+
+def upload_egrul_pipeline(infolist, okved_lookup, workers=None, queue_depth=None, flush_rows=None):
+    """Конвейерная загрузка ЕГРЮЛ: пул процессов-воркеров читает JSON-файлы
+    и распределяет компании по сегментам, единственный писатель в основном
+    процессе объединяет результаты и загружает их в БД крупными транзакциями
+    через COPY. В той же транзакции обновляется манифест загруженных файлов.
+    
+    Аргументы
+    ----------
+    infolist: list[zipfile.ZipInfo]
+        Описания JSON-файлов в архиве.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов ОКВЭД сегментам, см. get_okved_lookup.
+    workers: int, default: None
+        Количество процессов-воркеров, по умолчанию config.egrul_workers.
+    queue_depth: int, default: None
+        Максимальное количество файлов в обработке и неразобранных результатов,
+        по умолчанию config.egrul_queue_depth. Новые файлы отдаются воркерам
+        только по мере того, как писатель забирает результаты, - так
+        ограничивается потребление памяти.
+    flush_rows: int, default: None
+        Количество накопленных строк, при котором писатель загружает их в БД,
+        по умолчанию config.egrul_flush_rows.
+    """
+    workers = workers or config.egrul_workers
+    queue_depth = queue_depth or config.egrul_queue_depth
+    flush_rows = flush_rows or config.egrul_flush_rows
+    okved_segments_key = get_okved_segments_key(config.okved_segments)
+    
+    def write(buffer, loaded_files):
+        with metrics.stage('write_egrul_batch', members=len(loaded_files)) as record, \
+                db.connection() as conn:
+            delete_egrul_members([info.filename for info, _ in loaded_files], conn=conn)
+            for segment, batches in buffer.items():
+                egrul = EgrulBatch.concat(batches)
+                insert_egrul_batch(egrul, segment, conn=conn)
+                metrics.add(rows_in=len(egrul), rows_out=len(egrul))
+            update_egrul_manifest(config.egrul_filepath, loaded_files, okved_segments_key, conn=conn)
+    
+    files = iter(infolist)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(infos):
+            return {
+                executor.submit(
+                    metrics.run_with_metrics, read_egrul_job, info.filename, okved_lookup,
+                    config.egrul_dtypes, config.egrul_read_mode): info
+                for info in infos
+                }
+        
+        pending = submit(islice(files, queue_depth))
+        buffer = {}
+        buffered_rows = 0
+        loaded_files = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                info = pending.pop(future)
+                segments, records = future.result()
+                metrics.extend(records)
+                if segments is None:
+                    loaded_files.append((info, 0))
+                    continue
+                rows_count = 0
+                for segment, egrul in segments.items():
+                    buffer.setdefault(segment, []).append(egrul)
+                    rows_count += len(egrul)
+                buffered_rows += rows_count
+                loaded_files.append((info, rows_count))
+            pending.update(submit(islice(files, len(done))))
+            if buffered_rows >= flush_rows:
+                write(buffer, loaded_files)
+                buffer = {}
+                buffered_rows = 0
+                loaded_files = []
+        if loaded_files:
+            write(buffer, loaded_files)
+
+@metrics.timed
 def upload_egrul():
-    """2 задание домашней работы - загрузка данных ЕГРЮЛ"""
-    filelist = get_filelist(config.egrul_filepath)
-    Parallel(n_jobs=-1)(delayed(upload_egrul_job)(
-        filename, config.okved_primary_code, config.egrul_dtypes) for filename in filelist)
+    """2 задание домашней работы - загрузка данных ЕГРЮЛ
+    в таблицы сегментов ОКВЭД (config.okved_segments) за один проход по архиву"""
+    okved_lookup = get_okved_lookup(config.okved_segments)
+    infolist = get_fileinfo(config.egrul_filepath)
+    if config.egrul_incremental:
+        files_count = len(infolist)
+        infolist = get_pending_fileinfo(
+            config.egrul_filepath, infolist, get_okved_segments_key(config.okved_segments))
+        print(f'upload_egrul - новых или измененных файлов: {len(infolist)} из {files_count}')
+    filelist = [info.filename for info in infolist]
+    if config.egrul_upload_mode == 'pipeline':
+        upload_egrul_pipeline(infolist, okved_lookup)
+    elif config.egrul_upload_mode == 'parallel':
+        results = Parallel(n_jobs=-1)(delayed(metrics.run_with_metrics)(
+            upload_egrul_job, filename, okved_lookup, config.egrul_dtypes, config.egrul_read_mode)
+            for filename in filelist)
+        for _, records in results:
+            metrics.extend(records)
+    else:
+        raise ValueError(f'Неизвестный режим загрузки ЕГРЮЛ: "{config.egrul_upload_mode}"')
 
 def app():
     """Функция для запуска скрипта"""
-    create_db_schema()
-    upload_okved()
-    upload_egrul()
+    try:
+        create_db_schema()
+        upload_okved()
+        upload_egrul()
+    finally:
+        metrics.export(config.metrics_jsonl_path, config.metrics_prometheus_path)
     
 if __name__ == "__main__":
     app()
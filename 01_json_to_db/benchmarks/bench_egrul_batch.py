@@ -0,0 +1,69 @@
+"""Бенчмарк представления пачки компаний: датафрейм (как до egrul_batch)
+против EgrulBatch - память на пачку, сборка из строк разбора и сериализация в буфер COPY.
+
+Запуск из папки 01_json_to_db:
+    python -m benchmarks.bench_egrul_batch --rows 1000000
+"""
+import time
+import argparse
+
+import pandas as pd
+
+from egrul_batch import EgrulBatch
+from egrul_reader import egrul_columns
+from benchmarks.synthetic import get_companies_frame
+
+def get_rows(rows_count, seed):
+    """Строки в виде, в котором их отдает разбор JSON (идентификаторы - строки)."""
+    egrul = get_companies_frame(rows_count, seed=seed)
+    egrul['kpp'] = egrul['kpp'].astype('Int64')
+    for col in ['ogrn', 'inn', 'kpp']:
+        egrul[col] = egrul[col].astype(str).replace({'<NA>': ''})
+    return list(egrul.itertuples(index=False, name=None))
+
+def build_frame(rows):
+    egrul = pd.DataFrame.from_records(rows, columns=egrul_columns)
+    for col in ['ogrn', 'inn', 'kpp']:
+        egrul[col] = pd.to_numeric(egrul[col], errors='coerce').astype('Int64')
+    return egrul
+
+def timed(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    import psql
+
+    rows = get_rows(args.rows, args.seed)
+    egrul, frame_build = timed(lambda: build_frame(rows), args.repeat)
+    batch, batch_build = timed(lambda: EgrulBatch.from_rows(rows), args.repeat)
+    frame_size = int(egrul.memory_usage(deep=True).sum())
+    frame_buffer, frame_copy = timed(lambda: psql.PsqlConnector().get_copy_buffer(egrul), args.repeat)
+    batch_buffer, batch_copy = timed(lambda: batch.get_copy_buffer(), args.repeat)
+
+    print(f'Строк: {args.rows}')
+    print(f'{"представление":<14} {"память, МБ":>11} {"сборка, с":>10} {"COPY, с":>8} {"буфер, МБ":>10}')
+    for name, size, build, copy, buffer in [
+            ('DataFrame', frame_size, frame_build, frame_copy, frame_buffer),
+            ('EgrulBatch', batch.nbytes, batch_build, batch_copy, batch_buffer),
+            ]:
+        print(
+            f'{name:<14} {size / 2 ** 20:>11.1f} {build:>10.3f} {copy:>8.3f} '
+            f'{len(buffer.getbuffer()) / 2 ** 20:>10.1f}'
+            )
+    print(f'Память: в {frame_size / batch.nbytes:.1f} раза меньше')
+    if len(batch_buffer.getvalue().splitlines()) != len(egrul):
+        raise AssertionError('Количество строк в буферах COPY не совпадает')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Бенчмарк этапов загрузки 01_json_to_db на синтетических архивах ЕГРЮЛ и ОКВЭД.
+
+Замеряются get_filelist, upload_egrul_job (по всем файлам архива),
+replace_nans и insert_values (методы 'values' и 'copy') на БД из переменной
+среды MIDDLE_PYTHON_EDU_DB_SQLALCHEMY_CONN. Таблицы схемы hw1 в этой БД
+пересоздаются - запускайте бенчмарк только на локальной базе.
+Каждый этап выполняется в отдельном процессе, поэтому пик RSS относится
+только к нему. Результаты выводятся строками JSON (по строке на этап)
+и, если задан --output, дописываются в файл для сравнения прогонов.
+
+Запуск из папки 01_json_to_db:
+    python -m benchmarks.bench_load --members 4 --records 20000 --output bench_load.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from functools import partial
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from metrics import get_peak_rss
+from benchmarks import synthetic
+
+def set_config(params):
+    """Переключение путей и режима чтения приложения на данные бенчмарка."""
+    config.egrul_filepath = params['egrul_path']
+    config.okved_filepath = params['okved_path']
+    config.egrul_cache_dir = os.path.join(params['data_dir'], 'egrul_cache')
+    config.egrul_read_mode = params['read_mode']
+
+def bench_get_filelist(params):
+    import app
+
+    start = time.perf_counter()
+    filelist = app.get_filelist(config.egrul_filepath)
+    seconds = time.perf_counter() - start
+    return {'rows': len(filelist), 'bytes': os.path.getsize(config.egrul_filepath), 'seconds': seconds}
+
+def bench_upload_egrul_job(params):
+    import app
+
+    okved_lookup = app.get_okved_lookup(config.okved_segments)
+    infolist = app.get_fileinfo(config.egrul_filepath)
+    start = time.perf_counter()
+    for info in infolist:
+        app.upload_egrul_job(info.filename, okved_lookup, config.egrul_dtypes, config.egrul_read_mode)
+    seconds = time.perf_counter() - start
+    rows_loaded = sum(
+        int(app.db.read_query(f'SELECT count(*) FROM {config.schema}.{table}').iloc[0, 0])
+        for table in config.okved_segments
+        )
+    return {
+        'rows': params['members'] * params['records'],
+        'bytes': sum(info.file_size for info in infolist),
+        'seconds': seconds,
+        'rows_loaded': rows_loaded,
+        }
+
+def bench_replace_nans(params):
+    import psql
+
+    db = psql.PsqlConnector()
+    df = synthetic.get_vacancies_like_frame(params['frame_rows'], 2000, seed=params['seed'])
+    frame_size = int(df.memory_usage(deep=True).sum())
+    start = time.perf_counter()
+    db.replace_nans(df)
+    seconds = time.perf_counter() - start
+    return {'rows': len(df), 'bytes': frame_size, 'seconds': seconds}
+
+def bench_insert_values(params, method):
+    import psql
+
+    db = psql.PsqlConnector()
+    df = synthetic.get_companies_frame(params['insert_rows'], seed=params['seed'])
+    frame_size = int(df.memory_usage(deep=True).sum())
+    db.truncate_table(config.schema, config.egrul_table, restart_identity=False)
+    start = time.perf_counter()
+    db.insert_values(df, schema=config.schema, table=config.egrul_table, method=method)
+    seconds = time.perf_counter() - start
+    db.truncate_table(config.schema, config.egrul_table, restart_identity=False)
+    return {'rows': len(df), 'bytes': frame_size, 'seconds': seconds}
+
+stages = {
+    'get_filelist': bench_get_filelist,
+    'upload_egrul_job': bench_upload_egrul_job,
+    'replace_nans': bench_replace_nans,
+    'insert_values:values': partial(bench_insert_values, method='values'),
+    'insert_values:copy': partial(bench_insert_values, method='copy'),
+    }
+
+def run_stage_job(stage, params):
+    # Сообщения приложения (metrics.timed, ошибки psql) - в stderr, stdout - только результаты
+    with redirect_stdout(sys.stderr):
+        set_config(params)
+        result = stages[stage](params)
+    result['peak_rss'] = get_peak_rss()
+    return result
+
+def run_stage(stage, params):
+    """Выполнение этапа в отдельном (spawn) процессе."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_stage_job, stage, params).result()
+
+def prepare(params):
+    """Запись синтетических архивов и подготовка структуры БД со справочником ОКВЭД."""
+    set_config(params)
+    params['egrul_size'] = synthetic.write_egrul_archive(
+        params['egrul_path'], params['members'], params['records'], params['share'], params['seed'])
+    synthetic.write_okved_archive(params['okved_path'], params['seed'])
+
+    import app
+
+    config.egrul_incremental = False
+    app.create_db_schema()
+    app.upload_okved()
+    app.db.close()
+
+def get_result_record(stage, result, params):
+    """Строка результата: пропускная способность в строках/с и МБ/с, пик RSS в МБ."""
+    seconds = result.pop('seconds')
+    rows = result.pop('rows')
+    size = result.pop('bytes')
+    peak_rss = result.pop('peak_rss')
+    return {
+        'benchmark': stage,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rows': rows,
+        'mb': round(size / 2 ** 20, 3),
+        'seconds': round(seconds, 4),
+        'rows_per_s': round(rows / seconds, 1) if seconds else None,
+        'mb_per_s': round(size / 2 ** 20 / seconds, 3) if seconds else None,
+        'peak_rss_mb': round(peak_rss / 2 ** 20, 1) if peak_rss is not None else None,
+        **result,
+        'params': {
+            key: params[key]
+            for key in ['members', 'records', 'share', 'seed', 'read_mode', 'frame_rows', 'insert_rows']
+            },
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--members', type=int, default=4, help='количество JSON-файлов в архиве ЕГРЮЛ')
+    parser.add_argument('--records', type=int, default=20000, help='количество записей в JSON-файле')
+    parser.add_argument('--share', type=float, default=0.01, help='доля компаний с ОКВЭД 61')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--read-mode', default=config.egrul_read_mode, help='режим чтения ЕГРЮЛ, см. config.py')
+    parser.add_argument('--frame-rows', type=int, default=200000, help='строк в датафрейме для replace_nans')
+    parser.add_argument('--insert-rows', type=int, default=200000, help='строк в датафрейме для insert_values')
+    parser.add_argument('--stages', nargs='+', choices=list(stages), default=list(stages))
+    parser.add_argument('--data-dir', help='папка для архивов, по умолчанию - временная (удаляется)')
+    parser.add_argument('--output', help='файл JSON Lines, в который дописываются результаты')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='egrul_bench_')
+    os.makedirs(data_dir, exist_ok=True)
+    params = {
+        'members': args.members,
+        'records': args.records,
+        'share': args.share,
+        'seed': args.seed,
+        'read_mode': args.read_mode,
+        'frame_rows': args.frame_rows,
+        'insert_rows': args.insert_rows,
+        'data_dir': os.path.abspath(data_dir),
+        'egrul_path': os.path.abspath(os.path.join(data_dir, 'egrul.json.zip')),
+        'okved_path': os.path.abspath(os.path.join(data_dir, 'okved_2.json.zip')),
+        }
+    try:
+        with redirect_stdout(sys.stderr):
+            prepare(params)
+        for stage in args.stages:
+            record = get_result_record(stage, run_stage(stage, params), params)
+            line = json.dumps(record, ensure_ascii=False)
+            print(line, flush=True)
+            if args.output:
+                with open(args.output, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
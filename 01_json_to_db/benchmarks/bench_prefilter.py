@@ -0,0 +1,62 @@
+"""Бенчмарк разбора JSON-файла ЕГРЮЛ: pd.read_json, потоковый разбор и предфильтр.
+
+Запуск из папки 01_json_to_db:
+    python -m benchmarks.bench_prefilter --records 50000 --share 0.01
+"""
+import io
+import time
+import argparse
+
+import pandas as pd
+
+import egrul_reader
+from benchmarks.synthetic import get_egrul_member
+
+def read_pandas(data, okved_lookup, dtypes):
+    segments = egrul_reader.read_egrul_dataframe(io.BytesIO(data), 'bench.json', okved_lookup, dtypes)
+    return sum(len(egrul) for egrul in segments.values())
+
+def read_batches(data, okved_lookup, prefilter):
+    batches = egrul_reader.iter_egrul_batches(
+        io.BytesIO(data), 'bench.json', okved_lookup, 10000, prefilter=prefilter)
+    return sum(len(batch) for _, batch in batches)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--share', type=float, default=0.01, help='доля компаний с ОКВЭД 61')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    okved_lookup = egrul_reader.get_okved_lookup(
+        pd.DataFrame(columns=['code', 'parent_code']), {'telecom_companies': ['61']})
+    dtypes = {'ogrn': 'int64', 'inn': 'int64', 'kpp': 'int64'}
+    data = get_egrul_member(args.records, args.share)
+    print(f'Записей: {args.records}, размер файла: {len(data) / 2 ** 20:.1f} МБ')
+
+    modes = {
+        'pandas': lambda: read_pandas(data, okved_lookup, dtypes),
+        'stream': lambda: read_batches(data, okved_lookup, prefilter=False),
+        'prefilter': lambda: read_batches(data, okved_lookup, prefilter=True),
+        }
+    results = {}
+    for mode, func in modes.items():
+        cpu_times = []
+        for _ in range(args.repeat):
+            start_cpu = time.process_time()
+            rows = func()
+            cpu_times.append(time.process_time() - start_cpu)
+        results[mode] = rows, min(cpu_times)
+
+    baseline_cpu = results['pandas'][1]
+    print(f'{"режим":<10} {"строк":>7} {"CPU, с":>8} {"записей/с":>11} {"ускорение":>10}')
+    for mode, (rows, cpu_time) in results.items():
+        print(
+            f'{mode:<10} {rows:>7} {cpu_time:>8.3f} {args.records / cpu_time:>11.0f} '
+            f'{baseline_cpu / cpu_time:>9.1f}x'
+            )
+    if len({rows for rows, _ in results.values()}) != 1:
+        raise AssertionError('Режимы чтения вернули разное количество строк')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Бенчмарк подготовки строк к загрузке в БД: replace_nans против iter_db_rows.
+
+Сравнивается старый путь insert_values (replace_nans и список кортежей
+из df.to_numpy()) с однопроходной нормализацией iter_db_rows, строки
+которой забираются страницами, как это делает execute_values.
+Подключение к БД не требуется, но переменная среды с его строкой
+должна быть задана - ее проверяет config.py.
+
+Запуск из папки 01_json_to_db:
+    python -m benchmarks.bench_replace_nans --rows 1000000
+"""
+import time
+import argparse
+import tracemalloc
+from itertools import islice
+
+import psql
+from benchmarks.synthetic import get_vacancies_like_frame
+
+def old_path(db, df, page_size):
+    df = db.replace_nans(df)
+    tuples = [tuple(x) for x in df.to_numpy()]
+    rows_count = 0
+    for start in range(0, len(tuples), page_size):
+        rows_count += len(tuples[start:start + page_size])
+    return rows_count
+
+def new_path(db, df, page_size):
+    rows = db.iter_db_rows(df)
+    rows_count = 0
+    while True:
+        page = list(islice(rows, page_size))
+        if not page:
+            return rows_count
+        rows_count += len(page)
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--description-size', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    db = psql.PsqlConnector()
+    df = get_vacancies_like_frame(args.rows, args.description_size)
+    frame_size = df.memory_usage(deep=True).sum()
+    print(f'Строк: {args.rows}, размер датафрейма: {frame_size / 2 ** 20:.0f} МБ')
+    print(f'{"путь":<14} {"время, с":>9} {"строк/с":>10} {"пик памяти, МБ":>15}')
+    for name, func in [('replace_nans', old_path), ('iter_db_rows', new_path)]:
+        rows_count, elapsed, peak = measure(func, db, df, args.page_size)
+        print(f'{name:<14} {elapsed:>9.2f} {rows_count / elapsed:>10.0f} {peak / 2 ** 20:>15.0f}')
+
+if __name__ == '__main__':
+    main()
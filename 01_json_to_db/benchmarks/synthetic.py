@@ -0,0 +1,197 @@
+"""Синтетические данные для бенчмарков: архивы ЕГРЮЛ и ОКВЭД и датафреймы,
+по структуре повторяющие выгрузки ofdata.ru. Данные полностью определяются
+параметрами и seed, поэтому замеры разных версий кода сравнимы.
+
+Подготовка архивов для запуска app.py без реальной выгрузки
+(из папки 01_json_to_db):
+    python -m benchmarks.synthetic --output-dir bulk_data --members 20 --records 50000
+"""
+import os
+import json
+import random
+import zipfile
+import argparse
+
+import numpy as np
+import pandas as pd
+
+okved_codes = ['47.11', '41.20', '68.20', '62.01', '46.90', '49.41', '70.22', '56.10']
+okved_target_codes = ['61', '61.10', '61.20']
+
+# Первый класс каждого раздела ОКВЭД 2
+okved_section_classes = {
+    'A': 1, 'B': 5, 'C': 10, 'D': 35, 'E': 36, 'F': 41, 'G': 45, 'H': 49, 'I': 55, 'J': 58, 'K': 64,
+    'L': 68, 'M': 69, 'N': 77, 'O': 84, 'P': 85, 'Q': 86, 'R': 90, 'S': 94, 'T': 97, 'U': 99,
+    }
+
+def get_okved_records(seed=0):
+    """Справочник ОКВЭД: разделы, классы, подклассы, группы и подгруппы
+    с иерархией code/parent_code, как в okved_2.json."""
+    rnd = random.Random(seed)
+    records = []
+
+    def add(code, parent_code, section):
+        records.append({
+            'code': code,
+            'parent_code': parent_code,
+            'section': section,
+            'name': f'Вид деятельности {code}',
+            'comment': None,
+            })
+
+    sections = sorted(okved_section_classes.items(), key=lambda item: item[1])
+    for i, (section, first_class) in enumerate(sections):
+        add(section, None, section)
+        last_class = sections[i + 1][1] if i + 1 < len(sections) else 100
+        for class_number in range(first_class, last_class):
+            class_code = f'{class_number:02d}'
+            add(class_code, section, section)
+            for subclass_number in range(1, rnd.randint(2, 9)):
+                subclass_code = f'{class_code}.{subclass_number}'
+                add(subclass_code, class_code, section)
+                for group_number in range(rnd.randint(0, 4)):
+                    group_code = f'{subclass_code}{group_number}'
+                    add(group_code, subclass_code, section)
+                    for subgroup_number in range(1, rnd.randint(1, 4)):
+                        add(f'{group_code}.{subgroup_number}', group_code, section)
+    return records
+
+def get_egrul_record(i, okved_code, additional_share, rnd):
+    """Запись ЕГРЮЛ, по структуре повторяющая выгрузку ofdata.ru."""
+    additional_codes = rnd.sample(okved_codes, 5)
+    if rnd.random() < additional_share:
+        additional_codes[0] = '61.10'
+    return {
+        'ogrn': str(1020000000000 + i),
+        'inn': str(7700000000 + i),
+        'kpp': str(770001000 + i % 1000),
+        'name': f'ООО "КОМПАНИЯ {i}"',
+        'data': {
+            'ОГРН': str(1020000000000 + i),
+            'ДатаОГРН': '2002-07-30',
+            'ИНН': str(7700000000 + i),
+            'КПП': str(770001000 + i % 1000),
+            'СвНаимЮЛ': {
+                'НаимЮЛПолн': f'ОБЩЕСТВО С ОГРАНИЧЕННОЙ ОТВЕТСТВЕННОСТЬЮ "КОМПАНИЯ {i}"',
+                'НаимЮЛСокр': f'ООО "КОМПАНИЯ {i}"',
+                },
+            'СвАдресЮЛ': {
+                'АдресРФ': {
+                    'Индекс': '125009',
+                    'КодРегион': '77',
+                    'Регион': {'ТипРегион': 'ГОРОД', 'НаимРегион': 'МОСКВА'},
+                    'Улица': {'ТипУлица': 'УЛИЦА', 'НаимУлица': 'ТВЕРСКАЯ'},
+                    'Дом': str(rnd.randint(1, 200)),
+                    },
+                },
+            'СвУчредит': {
+                'УчрФЛ': [
+                    {
+                        'СвФЛ': {'Фамилия': 'ИВАНОВ', 'Имя': 'ИВАН', 'Отчество': 'ИВАНОВИЧ'},
+                        'ДоляУстКап': {'НоминСтоим': rnd.randint(10000, 100000)},
+                        }
+                    for _ in range(2)
+                    ],
+                },
+            'СвОКВЭД': {
+                'СвОКВЭДОсн': {'КодОКВЭД': okved_code, 'НаимОКВЭД': 'Основной вид деятельности'},
+                'СвОКВЭДДоп': [
+                    {'КодОКВЭД': code, 'НаимОКВЭД': 'Дополнительный вид деятельности'}
+                    for code in additional_codes
+                    ],
+                },
+            },
+        }
+
+def get_egrul_member(records_count, share, seed=0, first_record=0):
+    """Сериализованный JSON-файл ЕГРЮЛ: share записей - с основным ОКВЭД 61.*,
+    еще 2 * share - с ОКВЭД 61.10 среди дополнительных (ложные кандидаты предфильтра).
+    Номера записей (и ОГРН) начинаются с first_record."""
+    rnd = random.Random(seed)
+    records = [
+        get_egrul_record(
+            i,
+            rnd.choice(okved_target_codes) if rnd.random() < share else rnd.choice(okved_codes),
+            share * 2,
+            rnd,
+            )
+        for i in range(first_record, first_record + records_count)
+        ]
+    return json.dumps(records, ensure_ascii=False).encode('utf-8')
+
+def write_egrul_archive(path, members_count, records_count, share, seed=0):
+    """Запись zip-архива ЕГРЮЛ из members_count JSON-файлов по records_count записей.
+
+    Возвращается
+    ----------
+    size: int
+        Суммарный размер JSON-файлов до сжатия, байт.
+    """
+    size = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
+        for i in range(members_count):
+            data = get_egrul_member(records_count, share, seed=seed + i, first_record=i * records_count)
+            zip_archive.writestr(f'{i + 1}.json', data)
+            size += len(data)
+    return size
+
+def write_okved_archive(path, seed=0):
+    """Запись zip-архива со справочником ОКВЭД (один JSON-файл, как okved_2.json.zip)."""
+    data = json.dumps(get_okved_records(seed), ensure_ascii=False).encode('utf-8')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
+        zip_archive.writestr('okved_2.json', data)
+
+def get_companies_frame(rows_count, seed=0):
+    """Датафрейм компаний в формате таблицы сегмента ЕГРЮЛ,
+    с пустыми КПП и названиями, как после фильтрации выгрузки."""
+    rnd = np.random.default_rng(seed)
+    ogrn = np.arange(1020000000000, 1020000000000 + rows_count, dtype='int64')
+    kpp = (770001000 + ogrn % 1000).astype('float64')
+    kpp[rnd.random(rows_count) < 0.05] = np.nan
+    names = np.array(['ООО "КОМПАНИЯ"', 'АО "ОПЕРАТОР СВЯЗИ"', '', None], dtype=object)
+    return pd.DataFrame({
+        'ogrn': ogrn,
+        'inn': ogrn - 1020000000000 + 7700000000,
+        'kpp': kpp,
+        'name': names[rnd.choice(4, rows_count, p=[0.6, 0.3, 0.05, 0.05])],
+        'okved_code': np.array(okved_target_codes, dtype=object)[rnd.integers(0, 3, rows_count)],
+        'source_filename': [f'{i // 50000 + 1}.json' for i in range(rows_count)],
+        })
+
+def get_vacancies_like_frame(rows_count, description_size, seed=0):
+    """Датафрейм с пустотами всех видов и длинными строками, как у вакансий."""
+    rnd = np.random.default_rng(seed)
+    description = 'Описание вакансии. ' * (description_size // 19)
+    descriptions = np.array([description, '', None], dtype=object)
+    cities = np.array(['Москва', 'Санкт-Петербург', '', None], dtype=object)
+    load_dttm = pd.Series(pd.date_range('2023-01-01', periods=rows_count, freq='s'))
+    load_dttm[rnd.random(rows_count) < 0.1] = pd.NaT
+    salary = rnd.normal(150000, 30000, rows_count)
+    salary[rnd.random(rows_count) < 0.3] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(rows_count, dtype='int64'),
+        'city': cities[rnd.integers(0, len(cities), rows_count)],
+        'salary': salary,
+        'description': descriptions[rnd.choice(3, rows_count, p=[0.8, 0.1, 0.1])],
+        'load_dttm': load_dttm,
+        })
+
+def main():
+    parser = argparse.ArgumentParser(description='Подготовка синтетических архивов ЕГРЮЛ и ОКВЭД')
+    parser.add_argument('--output-dir', default='bulk_data')
+    parser.add_argument('--members', type=int, default=20, help='количество JSON-файлов в архиве ЕГРЮЛ')
+    parser.add_argument('--records', type=int, default=50000, help='количество записей в JSON-файле')
+    parser.add_argument('--share', type=float, default=0.01, help='доля компаний с ОКВЭД 61')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    egrul_path = os.path.join(args.output_dir, 'egrul.json.zip')
+    okved_path = os.path.join(args.output_dir, 'okved_2.json.zip')
+    size = write_egrul_archive(egrul_path, args.members, args.records, args.share, args.seed)
+    write_okved_archive(okved_path, args.seed)
+    print(f'{egrul_path}: {args.members} файлов, {size / 2 ** 20:.0f} МБ до сжатия')
+    print(f'{okved_path}')
+
+if __name__ == '__main__':
+    main()
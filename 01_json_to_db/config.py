@@ -21,10 +21,17 @@ DB_CREDENTIALS = dict(
     user=db_dict.username,
     password=db_dict.password,
     )
+# Размер пула соединений PsqlConnector (на процесс). Одновременно соединения держат основной поток
+# и поток фоновой загрузки, поэтому maxconn не меньше количества потоков, работающих с БД;
+# при занятых maxconn соединениях getconn ждет возврата соединения не дольше db_pool_timeout секунд
+db_pool_minconn = 1
+db_pool_maxconn = 4
+db_pool_timeout = 60
     
 schema = 'hw1'
 okved_table = 'okved'
 egrul_table = 'telecom_companies'
+egrul_manifest_table = 'egrul_manifest'
 
 # Параметры файловой системы
 bulk_data_dir = 'bulk_data'
@@ -33,6 +40,13 @@ egrul_filename = 'egrul.json.zip'
 
 okved_filepath = os.path.join(bulk_data_dir, okved_filename)
 egrul_filepath = os.path.join(bulk_data_dir, egrul_filename)
+# Колоночный кэш извлеченных из архива ЕГРЮЛ компаний (режим чтения 'cache')
+egrul_cache_dir = os.path.join(bulk_data_dir, 'egrul_cache')
+# Метрики этапов загрузки (metrics.py): файл JSON Lines дописывается при каждом запуске,
+# файл Prometheus перезаписывается - его можно класть в папку textfile collector node_exporter.
+# None - не выгружать
+metrics_jsonl_path = os.path.join(bulk_data_dir, 'metrics', 'json_to_db.jsonl')
+metrics_prometheus_path = os.path.join(bulk_data_dir, 'metrics', 'json_to_db.prom')
 
 # Параметры скрипта
 okved_primary_code = '61'
@@ -41,3 +55,29 @@ egrul_dtypes = {
     'inn': 'int64',
     'kpp': 'int64',
     }
+# Сегменты загрузки ЕГРЮЛ: таблица - коды ОКВЭД (разделы, классы, подклассы, группы).
+# Подчиненные коды определяются по дереву code/parent_code справочника hw1.okved,
+# все сегменты заполняются за один проход по архиву, например:
+# {'telecom_companies': ['61'], 'it_companies': ['62', '63']}
+okved_segments = {
+    egrul_table: [okved_primary_code],
+    }
+
+# Режим чтения JSON-файлов ЕГРЮЛ:
+# 'prefilter' - потоковый разбор пачками с предфильтром по сырым байтам,
+# 'stream' - потоковый разбор пачками, 'pandas' - pd.read_json целиком,
+# 'cache' - фильтрация колоночного кэша (первый проход собирает в памяти датафрейм
+# из каждого файла архива целиком, поэтому память не ограничена размером пачки)
+egrul_read_mode = 'prefilter'
+egrul_batch_size = 10000
+
+# Режим загрузки ЕГРЮЛ:
+# 'pipeline' - воркеры только читают файлы, в БД пишет один процесс (upload_egrul_pipeline),
+# 'parallel' - каждый joblib-воркер сам загружает свой файл в БД
+egrul_upload_mode = 'pipeline'
+egrul_workers = os.cpu_count()
+egrul_queue_depth = 2 * egrul_workers
+egrul_flush_rows = 100000
+# Инкрементальная загрузка ЕГРЮЛ: таблицы не пересоздаются,
+# загружаются только новые или измененные файлы архива (см. egrul_manifest)
+egrul_incremental = True
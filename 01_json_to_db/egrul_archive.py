@@ -0,0 +1,252 @@
+"""Чтение zip-архива ЕГРЮЛ без повторного разбора центрального каталога.
+
+Каталог архива разбирается один раз при открытии, сам архив отображается
+в память (mmap), и сжатые данные файла распаковываются прямо из отображения.
+open распаковывает файл потоково, порциями по мере чтения, - память не зависит
+от размера файла. read и iter_members распаковывают файл целиком в буфер
+размером с файл: zlib на время распаковки и подсчета CRC32 освобождает GIL,
+поэтому iter_members распаковывает следующие файлы в пуле потоков, пока текущий
+разбирается (память - до prefetch файлов целиком).
+"""
+import io
+import os
+import mmap
+import zlib
+import struct
+import zipfile
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+# Локальный заголовок файла в архиве (APPNOTE.TXT, 4.3.7)
+local_file_header = struct.Struct('<4s2B4HL2L2H')
+local_file_header_signature = b'PK\003\004'
+
+# Размер порции сжатых данных и максимальный размер распакованной порции при потоковом чтении
+read_chunk_size = 64 * 1024
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+class EgrulArchive:
+    """Zip-архив, отображенный в память.
+
+    Аргументы
+    ----------
+    path: str
+        Путь к zip-файлу.
+    """
+    def __init__(self, path):
+        self.path = path
+        with zipfile.ZipFile(path, 'r') as zip_archive:
+            self.infolist = [info for info in zip_archive.infolist() if not info.is_dir()]
+        self._infos = {info.filename: info for info in self.infolist}
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def namelist(self):
+        return [info.filename for info in self.infolist]
+
+    def getinfo(self, name):
+        """Описание файла в архиве (zipfile.ZipInfo) по названию."""
+        info = self._infos.get(name)
+        if info is None:
+            raise KeyError(f'В архиве {self.path} нет файла "{name}"')
+        return info
+
+    def _get_info(self, member):
+        return member if isinstance(member, zipfile.ZipInfo) else self.getinfo(member)
+
+    def _is_supported(self, info):
+        """Файл распаковывается из отображения: не зашифрован, без сжатия или deflate."""
+        return not info.flag_bits & 0x1 and info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+    def _get_data_start(self, info):
+        """Смещение сжатых данных файла в архиве (после локального заголовка)."""
+        header = local_file_header.unpack_from(self._mmap, info.header_offset)
+        if header[0] != local_file_header_signature:
+            raise zipfile.BadZipFile(f'Неверный локальный заголовок файла "{info.filename}" в архиве {self.path}')
+        filename_length, extra_length = header[-2:]
+        return info.header_offset + local_file_header.size + filename_length + extra_length
+
+    def read(self, member):
+        """Распаковка файла архива.
+
+        Аргументы
+        ----------
+        member: str | zipfile.ZipInfo
+            Название или описание файла в архиве.
+
+        Возвращается
+        ----------
+        data: bytes
+            Содержимое файла, CRC32 проверяется.
+        """
+        info = self._get_info(member)
+        if not self._is_supported(info):
+            # Зашифрованные файлы и прочие методы сжатия - через zipfile
+            with zipfile.ZipFile(self.path, 'r') as zip_archive:
+                return zip_archive.read(info)
+
+        start = self._get_data_start(info)
+        with memoryview(self._mmap) as view:
+            compressed = view[start:start + info.compress_size]
+            try:
+                if info.compress_type == zipfile.ZIP_DEFLATED:
+                    data = zlib.decompress(compressed, -zlib.MAX_WBITS, max(info.file_size, 1))
+                else:
+                    data = bytes(compressed)
+            finally:
+                compressed.release()
+        if zlib.crc32(data) != info.CRC:
+            raise zipfile.BadZipFile(f'Неверная контрольная сумма файла "{info.filename}" в архиве {self.path}')
+        return data
+
+    def open(self, member):
+        """Файл архива как бинарный файловый объект для чтения (совместимо
+        с zipfile.ZipFile.open): данные распаковываются порциями по мере чтения,
+        в памяти - не больше нескольких порций read_chunk_size.
+
+        Аргументы
+        ----------
+        member: str | zipfile.ZipInfo
+            Название или описание файла в архиве.
+        """
+        info = self._get_info(member)
+        if not self._is_supported(info):
+            zip_archive = zipfile.ZipFile(self.path, 'r')
+            try:
+                # Файл архива остается открытым, пока не закрыт возвращаемый объект
+                return zip_archive.open(info)
+            finally:
+                zip_archive.close()
+        return io.BufferedReader(_MemberReader(self, info, self._get_data_start(info)), read_chunk_size)
+
+    def iter_members(self, infolist=None, workers=None, prefetch=None):
+        """Распаковка файлов архива в пуле потоков с опережением:
+        пока вызывающий код обрабатывает текущий файл, распаковываются следующие.
+
+        Аргументы
+        ----------
+        infolist: list[zipfile.ZipInfo], default: None
+            Описания распаковываемых файлов, по умолчанию - все файлы архива.
+        workers: int, default: None
+            Количество потоков распаковки, по умолчанию - по числу процессоров.
+        prefetch: int, default: None
+            Максимальное количество распакованных и распаковываемых файлов
+            помимо текущего, по умолчанию workers. Ограничивает потребление памяти.
+
+        Возвращается
+        ----------
+        Генератор пар (zipfile.ZipInfo, io.BytesIO) в порядке infolist.
+        """
+        workers = workers or os.cpu_count() or 1
+        prefetch = prefetch or workers
+        infos = iter(self.infolist if infolist is None else infolist)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque((info, executor.submit(self.read, info)) for info in islice(infos, prefetch))
+            try:
+                while pending:
+                    info, future = pending.popleft()
+                    data = future.result()
+                    for next_info in islice(infos, 1):
+                        pending.append((next_info, executor.submit(self.read, next_info)))
+                    yield info, io.BytesIO(data)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+class _MemberReader(io.RawIOBase):
+    """Потоковое чтение файла архива из отображения в память (см. EgrulArchive.open).
+    Размер и CRC32 распакованных данных проверяются по достижении конца файла."""
+    def __init__(self, archive, info, start):
+        self._archive = archive
+        self._info = info
+        self._view = memoryview(archive._mmap)[start:start + info.compress_size]
+        self._offset = 0
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        else:
+            self._decompressor = None
+        self._chunk = b''
+        self._chunk_offset = 0
+        self._crc = 0
+        self._size = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+    def _read_chunk(self):
+        """Следующая порция распакованных данных (пустая - конец файла)."""
+        if self._decompressor is None:
+            data = bytes(self._view[self._offset:self._offset + read_chunk_size])
+            self._offset += len(data)
+        elif self._decompressor.unconsumed_tail:
+            data = self._decompressor.decompress(self._decompressor.unconsumed_tail, read_chunk_size)
+        elif self._offset < len(self._view) and not self._decompressor.eof:
+            compressed = self._view[self._offset:self._offset + read_chunk_size]
+            self._offset += len(compressed)
+            data = self._decompressor.decompress(compressed, read_chunk_size)
+        else:
+            data = self._decompressor.flush()
+        if data:
+            self._crc = zlib.crc32(data, self._crc)
+            self._size += len(data)
+        return data
+
+    def readinto(self, b):
+        while self._chunk_offset >= len(self._chunk) and not self._eof:
+            self._chunk = self._read_chunk()
+            self._chunk_offset = 0
+            if not self._chunk:
+                self._eof = True
+                self._check()
+        size = min(len(b), len(self._chunk) - self._chunk_offset)
+        b[:size] = self._chunk[self._chunk_offset:self._chunk_offset + size]
+        self._chunk_offset += size
+        return size
+
+    def _check(self):
+        info = self._info
+        if self._size != info.file_size or self._crc != info.CRC:
+            raise zipfile.BadZipFile(
+                f'Неверный размер или контрольная сумма файла "{info.filename}" в архиве {self._archive.path}'
+                )
+
+def get_archive(path):
+    """Архив path, открытый в текущем процессе: повторные вызовы (в т.ч.
+    из воркеров по файлам архива) не разбирают центральный каталог заново.
+    Архив переоткрывается, если файл изменился.
+
+    Аргументы
+    ----------
+    path: str
+        Путь к zip-файлу.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _archives_lock:
+        cached = _archives.get(key)
+        if cached is None or cached[0] != version:
+            # Прежний экземпляр закрывается сборщиком мусора:
+            # его файлы могут еще читаться в других потоках
+            cached = _archives[key] = (version, EgrulArchive(path))
+    return cached[1]
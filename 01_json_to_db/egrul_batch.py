@@ -0,0 +1,255 @@
+"""Компактное представление пачки компаний ЕГРЮЛ для загрузки в БД.
+
+Вместо датафрейма с object-колонками (каждое название и код ОКВЭД -
+отдельный объект str) пачка хранит:
+    - ogrn, inn, kpp - массивы int64 с масками заполненности. Длина идентификаторов
+      фиксирована (id_widths: ОГРН - 13, ИНН - 10, КПП - 9 цифр), поэтому ведущие
+      нули восстанавливаются дополнением до этой ширины: в буфере COPY и в
+      to_frame(ids_as_text=True) идентификаторы - строки фиксированной ширины.
+      В таблицах БД идентификаторы - BIGINT (как в исходной схеме), и там ведущие
+      нули теряются: при чтении они восстанавливаются так же, например
+      lpad(inn::text, 10, '0'). Нечисловые идентификаторы загружаются как NULL
+      и учитываются в invalid_ids с сообщением о них;
+    - okved_code, source_filename - словарное кодирование: список уникальных
+      значений и массив их номеров (-1 - пусто);
+    - name - названия в UTF-8 одним буфером байт и массив смещений
+      (как строковые колонки Arrow), пустое название - NULL.
+Пачка сериализуется в буфер COPY (текстовый формат) напрямую, без датафрейма.
+"""
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+egrul_batch_columns = ['ogrn', 'inn', 'kpp', 'name', 'okved_code', 'source_filename']
+id_columns = ['ogrn', 'inn', 'kpp']
+# Количество цифр идентификаторов (с ведущими нулями)
+id_widths = {'ogrn': 13, 'inn': 10, 'kpp': 9}
+dictionary_columns = ['okved_code', 'source_filename']
+
+copy_null = b'\\N'
+# Символы, экранируемые в текстовом формате COPY
+copy_special_pattern = re.compile(rb'[\\\t\n\r]')
+
+def _is_id(value):
+    if isinstance(value, str):
+        return value.isascii() and value.isdigit() and len(value) <= 18
+    return isinstance(value, int)
+
+def _is_empty(value):
+    return value is None or value == '' or (isinstance(value, float) and np.isnan(value))
+
+def _parse_ids(values):
+    """Разбор идентификаторов (str или int) в массив int64 и маску заполненности.
+    Пустые и нечисловые значения - NULL.
+
+    Возвращается
+    ----------
+    ids, valid, invalid: tuple
+        Значения, маска заполненности и список непустых нечисловых значений.
+    """
+    try:
+        # Все значения заполнены - разбор целиком на стороне numpy
+        return np.array(values, dtype=np.int64), np.ones(len(values), dtype=bool), []
+    except (TypeError, ValueError, OverflowError):
+        pass
+    valid = np.fromiter(map(_is_id, values), dtype=bool, count=len(values))
+    invalid = [values[i] for i in np.flatnonzero(~valid) if not _is_empty(values[i])]
+    values = np.array(values, dtype=object)
+    values[~valid] = 0
+    return values.astype(np.int64), valid, invalid
+
+def _encode_dictionary(values):
+    """Словарное кодирование: номера значений (-1 - пусто) и список уникальных значений."""
+    values = np.array(values, dtype=object)
+    values[values == ''] = None
+    codes, uniques = pd.factorize(values)
+    dtype = np.int16 if len(uniques) <= np.iinfo(np.int16).max else np.int32
+    return codes.astype(dtype), np.asarray(uniques, dtype=object)
+
+def _escape_copy_text(value):
+    return (
+        value.replace(b'\\', b'\\\\').replace(b'\t', b'\\t')
+        .replace(b'\n', b'\\n').replace(b'\r', b'\\r')
+        )
+
+class EgrulBatch:
+    """Пачка компаний ЕГРЮЛ в колоночном представлении, см. описание модуля.
+    Создается через from_rows, from_frame или concat.
+    """
+    columns = egrul_batch_columns
+
+    def __init__(self, ids, valid, name_offsets, name_data, codes, dictionaries, invalid_ids=None):
+        # ids, valid: dict[str, numpy.ndarray] - значения и маски идентификаторов
+        # codes, dictionaries: dict[str, numpy.ndarray] - номера и словари значений
+        # invalid_ids: dict[str, int] - количество нечисловых идентификаторов, замененных на NULL
+        self.ids = ids
+        self.valid = valid
+        self.name_offsets = name_offsets
+        self.name_data = name_data
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.invalid_ids = invalid_ids or dict.fromkeys(id_columns, 0)
+
+    def __len__(self):
+        return len(self.name_offsets) - 1
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        """Размер пачки в памяти, байт."""
+        return (
+            sum(self.ids[col].nbytes + self.valid[col].nbytes for col in id_columns)
+            + self.name_offsets.nbytes + len(self.name_data)
+            + sum(
+                self.codes[col].nbytes + sum(len(value) for value in self.dictionaries[col])
+                for col in dictionary_columns
+                )
+            )
+
+    @classmethod
+    def from_columns(cls, ogrn, inn, kpp, name, okved_code, source_filename):
+        """Пачка из списков значений колонок (значения идентификаторов - str или int)."""
+        ids, valid, invalid_ids = {}, {}, {}
+        for col, values in zip(id_columns, [ogrn, inn, kpp]):
+            ids[col], valid[col], invalid = _parse_ids(values)
+            invalid_ids[col] = len(invalid)
+            if invalid:
+                print(
+                    f'EgrulBatch - нечисловые значения {col} загружаются как NULL: {len(invalid)}, '
+                    f'например {invalid[:3]}'
+                    )
+
+        encoded_names = [value.encode('utf-8') if isinstance(value, str) else b'' for value in name]
+        name_offsets = np.zeros(len(encoded_names) + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, encoded_names), dtype=np.int64, count=len(encoded_names)),
+            out=name_offsets[1:],
+            )
+
+        codes, dictionaries = {}, {}
+        for col, values in zip(dictionary_columns, [okved_code, source_filename]):
+            codes[col], dictionaries[col] = _encode_dictionary(values)
+        return cls(ids, valid, name_offsets, b''.join(encoded_names), codes, dictionaries, invalid_ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Пачка из строк-кортежей в порядке колонок egrul_batch_columns."""
+        if not rows:
+            return cls.from_columns(*([] for _ in egrul_batch_columns))
+        return cls.from_columns(*map(list, zip(*rows)))
+
+    @classmethod
+    def from_frame(cls, egrul):
+        """Пачка из датафрейма с колонками egrul_batch_columns."""
+        columns = []
+        for col in egrul_batch_columns:
+            values = egrul[col]
+            if col in id_columns and values.dtype.kind in 'iuf':
+                # Числовые идентификаторы (в т.ч. Int64 и float с NaN) - без разбора строк
+                values = values.astype('Int64').astype(object).where(values.notna(), None)
+            columns.append(values.tolist())
+        return cls.from_columns(*columns)
+
+    @classmethod
+    def concat(cls, batches):
+        """Объединение пачек со слиянием словарей."""
+        batches = list(batches)
+        if len(batches) == 1:
+            return batches[0]
+        ids = {col: np.concatenate([batch.ids[col] for batch in batches]) for col in id_columns}
+        valid = {col: np.concatenate([batch.valid[col] for batch in batches]) for col in id_columns}
+
+        name_offsets = [np.zeros(1, dtype=np.int64)]
+        shift = 0
+        for batch in batches:
+            name_offsets.append(batch.name_offsets[1:] + shift)
+            shift += len(batch.name_data)
+
+        codes, dictionaries = {}, {}
+        for col in dictionary_columns:
+            dictionary = pd.unique(np.concatenate([batch.dictionaries[col] for batch in batches]))
+            index = pd.Index(dictionary)
+            dtype = np.int16 if len(dictionary) <= np.iinfo(np.int16).max else np.int32
+            col_codes = []
+            for batch in batches:
+                # Последний элемент сохраняет номер -1 (пусто)
+                remap = np.append(index.get_indexer(batch.dictionaries[col]), -1).astype(dtype)
+                col_codes.append(remap[batch.codes[col]])
+            codes[col] = np.concatenate(col_codes)
+            dictionaries[col] = np.asarray(dictionary, dtype=object)
+        invalid_ids = {col: sum(batch.invalid_ids[col] for batch in batches) for col in id_columns}
+        return cls(
+            ids, valid, np.concatenate(name_offsets), b''.join(batch.name_data for batch in batches),
+            codes, dictionaries, invalid_ids,
+            )
+
+    def get_names(self):
+        """Названия как список bytes в UTF-8 (b'' - пусто)."""
+        offsets = self.name_offsets.tolist()
+        data = self.name_data
+        return [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def get_id_text(self, col):
+        """Идентификаторы колонки col как bytes, дополненные ведущими нулями
+        до id_widths[col] цифр (пусто - None)."""
+        width = id_widths[col]
+        return [
+            b'%0*d' % (width, value) if ok else None
+            for value, ok in zip(self.ids[col].tolist(), self.valid[col].tolist())
+            ]
+
+    def to_frame(self, ids_as_text=False):
+        """Датафрейм с колонками egrul_batch_columns.
+
+        Аргументы
+        ----------
+        ids_as_text: bool, default: False
+            Идентификаторы - строки с ведущими нулями (см. get_id_text), иначе - Int64.
+        """
+        if ids_as_text:
+            egrul = pd.DataFrame({
+                col: [value.decode('ascii') if value else None for value in self.get_id_text(col)]
+                for col in id_columns
+                })
+        else:
+            egrul = pd.DataFrame({
+                col: pd.arrays.IntegerArray(self.ids[col], ~self.valid[col])
+                for col in id_columns
+                })
+        egrul['name'] = [name.decode('utf-8') if name else None for name in self.get_names()]
+        for col in dictionary_columns:
+            egrul[col] = pd.Categorical.from_codes(self.codes[col], self.dictionaries[col]).astype(object)
+        return egrul[egrul_batch_columns]
+
+    def get_copy_buffer(self):
+        """Сериализация в буфер текстового формата COPY (FORMAT text):
+        поля через табуляцию, пустоты - \\N.
+
+        Возвращается
+        ----------
+        buffer : io.BytesIO
+            Буфер, установленный на начало.
+        """
+        columns = []
+        for col in id_columns:
+            columns.append([value or copy_null for value in self.get_id_text(col)])
+
+        names = self.get_names()
+        if copy_special_pattern.search(self.name_data):
+            names = [_escape_copy_text(name) for name in names]
+        columns.append([name or copy_null for name in names])
+
+        for col in dictionary_columns:
+            # Последний элемент - для номера -1 (пусто)
+            dictionary = [_escape_copy_text(value.encode('utf-8')) for value in self.dictionaries[col]]
+            columns.append(np.array(dictionary + [copy_null], dtype=object)[self.codes[col]].tolist())
+
+        buffer = io.BytesIO()
+        buffer.write(b''.join(b'%b\t%b\t%b\t%b\t%b\t%b\n' % row for row in zip(*columns)))
+        buffer.seek(0)
+        return buffer
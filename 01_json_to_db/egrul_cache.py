@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+
+import egrul_reader
+import metrics
+
+egrul_cache_id_columns = ['ogrn', 'inn', 'kpp']
+
+def get_cache_path(cache_dir, zip_path, info):
+    """Путь к файлу кэша для файла архива ЕГРЮЛ.
+    Ключ кэша - имя архива, имя файла в архиве и его CRC32:
+    при изменении файла в архиве старый кэш не используется.
+
+    Аргументы
+    ----------
+    cache_dir: str
+        Папка кэша.
+    zip_path: str
+        Путь к zip-файлу.
+    info: zipfile.ZipInfo
+        Описание файла в архиве.
+    """
+    archive_name = os.path.basename(zip_path).split('.')[0]
+    member_name = info.filename.replace('/', '_')
+    return os.path.join(cache_dir, archive_name, f'{member_name}.{info.CRC:08x}.parquet')
+
+def extract_companies(f, filename):
+    """Извлечение всех компаний из JSON-файла ЕГРЮЛ без фильтрации по ОКВЭД.
+
+    Аргументы
+    ----------
+    f: file-like
+        Бинарный файловый объект с JSON-массивом записей ЕГРЮЛ.
+    filename: str
+        Название JSON-файла в архиве.
+
+    Возвращается
+    ----------
+    egrul: pandas.DataFrame
+        Колонки egrul_reader.egrul_columns, идентификаторы - в типе Int64.
+    """
+    egrul = pd.DataFrame.from_records(
+        list(egrul_reader.iter_egrul_records(f)),
+        columns=egrul_reader.egrul_columns[:-1],
+        )
+    for col in egrul_cache_id_columns:
+        egrul[col] = pd.to_numeric(egrul[col], errors='coerce').astype('Int64')
+    egrul['source_filename'] = filename
+    return egrul
+
+def write_cache(path, egrul):
+    """Запись извлеченных компаний в колоночный файл Parquet.
+    Файл сначала пишется во временный и затем переименовывается,
+    чтобы прерванная запись не оставила битый кэш.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    egrul.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+
+def read_cache(path, okved_lookup):
+    """Чтение кэша с векторным распределением компаний по сегментам загрузки.
+    
+    Аргументы
+    ----------
+    path: str
+        Путь к файлу кэша.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. egrul_reader.get_okved_lookup.
+    
+    Возвращается
+    ----------
+    segments: dict[str, pandas.DataFrame]
+        Название таблицы сегмента - компании сегмента; идентификаторы остаются
+        в типе Int64 (пустые - NA, загружаются как NULL, как и в остальных режимах).
+    """
+    egrul = pd.read_parquet(path)
+    metrics.add(rows_in=len(egrul))
+    return {
+        segment: companies.reset_index(drop=True)
+        for segment, companies in egrul_reader.split_by_segments(egrul, okved_lookup).items()
+        }
+
+def get_cached_companies(zip_archive, info, zip_path, cache_dir, okved_lookup):
+    """Компании файла архива ЕГРЮЛ, распределенные по сегментам загрузки.
+    При первом обращении файл разбирается целиком и сохраняется в кэш,
+    последующие обращения (в т.ч. с другими сегментами) читают только кэш.
+    
+    Аргументы
+    ----------
+    zip_archive: egrul_archive.EgrulArchive | zipfile.ZipFile
+        Открытый архив ЕГРЮЛ (используется метод open).
+    info: zipfile.ZipInfo
+        Описание файла в архиве.
+    zip_path: str
+        Путь к zip-файлу.
+    cache_dir: str
+        Папка кэша.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. egrul_reader.get_okved_lookup.
+    """
+    path = get_cache_path(cache_dir, zip_path, info)
+    if not os.path.exists(path):
+        with zip_archive.open(info) as f:
+            write_cache(path, extract_companies(f, info.filename))
+    return read_cache(path, okved_lookup)
@@ -0,0 +1,399 @@
+import re
+import json
+
+import ijson
+import pandas as pd
+
+import metrics
+from egrul_batch import EgrulBatch
+
+egrul_columns = [
+    'ogrn',
+    'inn',
+    'kpp',
+    'name',
+    'okved_code',
+    'source_filename',
+    ]
+
+# Префиксы событий ijson для извлекаемых полей записи ЕГРЮЛ
+egrul_record_prefix = 'item'
+egrul_field_prefixes = {
+    'item.ogrn': 'ogrn',
+    'item.inn': 'inn',
+    'item.kpp': 'kpp',
+    'item.name': 'name',
+    'item.data.СвОКВЭД.СвОКВЭДОсн.КодОКВЭД': 'okved_code',
+    }
+
+# Начало записи ЕГРЮЛ в сыром JSON: каждая запись массива открывается ключом "ogrn"
+egrul_record_start_pattern = re.compile(rb'\{\s*"ogrn"\s*:')
+egrul_prefilter_chunk_size = 4 * 1024 * 1024
+
+def get_okved_code(item):
+    """Получение кода ОКВЭД в данных ЕГРЮЛ.
+
+    Аргументы
+    ----------
+    item: dict
+        Словарь, ячейка данных в датафрейме.
+    """
+    if item.get('СвОКВЭД'):
+        if item['СвОКВЭД'].get('СвОКВЭДОсн'):
+            return item['СвОКВЭД']['СвОКВЭДОсн']['КодОКВЭД']
+
+def get_okved_lookup(okved, okved_segments):
+    """Таблица принадлежности кодов ОКВЭД сегментам загрузки.
+    Коды сегмента раскрываются по дереву code/parent_code справочника ОКВЭД:
+    в сегмент попадают сами коды и все подчиненные им коды.
+    
+    Аргументы
+    ----------
+    okved: pandas.DataFrame
+        Справочник ОКВЭД с колонками code, parent_code.
+    okved_segments: dict[str, list[str]]
+        Сегменты загрузки: название таблицы - список кодов ОКВЭД
+        (разделов, классов, подклассов, групп).
+    
+    Возвращается
+    ----------
+    okved_lookup: dict[str, tuple[str]]
+        Код ОКВЭД - названия таблиц сегментов, к которым он относится.
+    """
+    children = {}
+    for code, parent_code in okved[['code', 'parent_code']].itertuples(index=False):
+        if parent_code:
+            children.setdefault(parent_code, []).append(code)
+    okved_lookup = {}
+    for segment, codes in okved_segments.items():
+        stack = [str(code) for code in codes]
+        while stack:
+            code = stack.pop()
+            segments = okved_lookup.get(code, ())
+            if segment in segments:
+                continue
+            okved_lookup[code] = segments + (segment,)
+            stack.extend(children.get(code, []))
+    return okved_lookup
+
+def get_okved_segments(okved_code, okved_lookup):
+    """Сегменты загрузки, к которым относится компания с кодом ОКВЭД okved_code.
+    Код, которого нет в справочнике (например, более детальный), относится
+    к сегментам ближайшего предка - кода, получаемого отбрасыванием
+    последних символов ('61.10.1' -> '61.10' -> '61.1' -> '61'); класс ОКВЭД
+    (часть кода до первой точки) не сокращается. Результат для такого кода
+    запоминается в okved_lookup.
+    
+    Аргументы
+    ----------
+    okved_code: str | None
+        Код ОКВЭД компании.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    """
+    if not okved_code:
+        return ()
+    segments = okved_lookup.get(okved_code)
+    if segments is None:
+        code = okved_code
+        while '.' in code and segments is None:
+            code = code[:-1].rstrip('.')
+            segments = okved_lookup.get(code)
+        segments = segments or ()
+        okved_lookup[okved_code] = segments
+    return segments
+
+def get_okved_code_patterns(okved_lookup):
+    """Регулярные выражения для поиска значения КодОКВЭД в сырых байтах JSON.
+    Сначала ищется само значение кода - одного из классов ОКВЭД
+    (первых двух цифр) кодов сегментов, затем проверяется, что перед ним
+    стоит ключ КодОКВЭД - в UTF-8 или в виде \\u-последовательностей.
+    Совпадение означает лишь кандидата: КодОКВЭД встречается и среди
+    дополнительных видов деятельности, поэтому нужна точная проверка.
+    
+    Аргументы
+    ----------
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    
+    Возвращается
+    ----------
+    value_pattern, key_pattern: re.Pattern | None
+        Шаблон значения кода и шаблон ключа, оканчивающегося перед значением.
+        Если среди кодов сегментов нет цифровых (например, справочник
+        не загружен, а сегмент задан разделом), возвращается None.
+    """
+    okved_classes = sorted({
+        code.split('.')[0] for code, segments in okved_lookup.items()
+        if segments and code[:1].isdigit()
+        })
+    if not okved_classes:
+        return None
+    key = 'КодОКВЭД'
+    key_variants = [key.encode('utf-8'), json.dumps(key).strip('"').encode('ascii')]
+    key_pattern = re.compile(
+        rb'"(?:' + b'|'.join(re.escape(variant) for variant in key_variants) + rb')"\s*:\s*\Z',
+        re.IGNORECASE,
+        )
+    value_pattern = re.compile(
+        rb'"(?:' + b'|'.join(re.escape(code.encode('ascii')) for code in okved_classes) + rb')[."]'
+        )
+    return value_pattern, key_pattern
+
+def _find_record_start(buffer, position, backward=True):
+    """Позиция открывающей скобки записи {"ogrn": ...}:
+    ближайшей слева от position (backward=True) или справа от нее.
+    """
+    while True:
+        if backward:
+            i = buffer.rfind(b'"ogrn"', 0, position)
+        else:
+            i = buffer.find(b'"ogrn"', position)
+        if i < 0:
+            return None
+        j = i - 1
+        while j >= 0 and buffer[j] in b' \t\r\n':
+            j -= 1
+        if j >= 0 and buffer[j] == ord('{') and egrul_record_start_pattern.match(buffer, j):
+            return j
+        position = i if backward else i + 1
+
+class _ReplayReader():
+    """Файловый объект, возвращающий сначала уже прочитанные байты, затем остаток файла."""
+
+    def __init__(self, head, f):
+        self.head = head
+        self.f = f
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.f.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.f.read(), b''
+        else:
+            data, self.head = self.head[:size], self.head[size:]
+        return data
+
+def iter_egrul_records(f):
+    """Потоковый обход записей JSON-файла ЕГРЮЛ по событиям парсера.
+    Вложенные данные компании не собираются в словари:
+    из каждой записи извлекаются только поля egrul_field_prefixes.
+
+    Аргументы
+    ----------
+    f: file-like
+        Бинарный файловый объект с JSON-массивом записей ЕГРЮЛ.
+
+    Возвращается
+    ----------
+    Генератор словарей {ogrn, inn, kpp, name, okved_code}.
+    """
+    record = None
+    for prefix, event, value in ijson.parse(f):
+        if prefix == egrul_record_prefix:
+            if event == 'start_map':
+                record = dict.fromkeys(egrul_field_prefixes.values())
+            elif event == 'end_map':
+                yield record
+                record = None
+        elif record is not None:
+            field = egrul_field_prefixes.get(prefix)
+            if field is not None and event in ('string', 'number'):
+                record[field] = value
+
+def decode_egrul_record(raw_record):
+    """Декодирование одной записи ЕГРЮЛ из сырого фрагмента JSON-массива."""
+    raw_record = raw_record.rstrip()
+    if raw_record.endswith(b']'):
+        raw_record = raw_record[:-1].rstrip()
+    if raw_record.endswith(b','):
+        raw_record = raw_record[:-1]
+    try:
+        item = json.loads(raw_record)
+    except ValueError as error:
+        raise ValueError(
+            'Не удалось выделить запись ЕГРЮЛ по ключу "ogrn" - '
+            'используйте режим чтения "stream"'
+            ) from error
+    return {
+        'ogrn': item.get('ogrn'),
+        'inn': item.get('inn'),
+        'kpp': item.get('kpp'),
+        'name': item.get('name'),
+        'okved_code': get_okved_code(item.get('data') or {}),
+        }
+
+def iter_prefiltered_records(f, okved_lookup, chunk_size=egrul_prefilter_chunk_size):
+    """Потоковый обход записей JSON-файла ЕГРЮЛ с предфильтром по сырым байтам.
+    Файл читается блоками по chunk_size байт, границы записей определяются
+    по ключу "ogrn", и декодируются только записи, в байтах которых
+    встречается КодОКВЭД одного из сегментов. Если файл не начинается
+    с записи вида {"ogrn": ...} или по кодам сегментов нельзя построить
+    предфильтр, выполняется обычный разбор iter_egrul_records.
+
+    Аргументы
+    ----------
+    f: file-like
+        Бинарный файловый объект с JSON-массивом записей ЕГРЮЛ.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    chunk_size: int
+        Размер читаемого блока в байтах.
+
+    Возвращается
+    ----------
+    Генератор словарей {ogrn, inn, kpp, name, okved_code} для записей-кандидатов.
+    Кандидаты требуют точной проверки get_okved_segments.
+    """
+    patterns = get_okved_code_patterns(okved_lookup)
+    key_window = 64
+    buffer = f.read(chunk_size)
+    
+    first_record = egrul_record_start_pattern.search(buffer)
+    head = buffer.lstrip()
+    if head and head != b'[]' and (
+        patterns is None
+        or not head.startswith(b'[')
+        or first_record is None
+        or buffer[:first_record.start()].strip() != b'['
+        ):
+        yield from iter_egrul_records(_ReplayReader(buffer, f))
+        return
+    value_pattern, key_pattern = patterns
+    
+    eof = not buffer
+    while buffer:
+        chunk = b'' if eof else f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+        # Последняя запись может быть неполной - переносится в следующий блок
+        if eof:
+            last_start = len(buffer)
+        else:
+            last_start = _find_record_start(buffer, len(buffer))
+            if last_start is None:
+                continue
+        
+        record_end = 0
+        for match in value_pattern.finditer(buffer, 0, last_start):
+            position = match.start()
+            if position < record_end:
+                continue
+            if not key_pattern.search(buffer, max(position - key_window, 0), position):
+                continue
+            record_start = _find_record_start(buffer, position)
+            if record_start is None:
+                continue
+            record_end = _find_record_start(buffer, position, backward=False)
+            if record_end is None or record_end > last_start:
+                record_end = last_start
+            yield decode_egrul_record(buffer[record_start:record_end])
+        buffer = b'' if eof else buffer[last_start:]
+
+def split_by_segments(egrul, okved_lookup):
+    """Разбиение датафрейма компаний по сегментам загрузки.
+    Сегменты определяются один раз для каждого уникального кода ОКВЭД,
+    строки отбираются векторно.
+    
+    Аргументы
+    ----------
+    egrul: pandas.DataFrame
+        Компании с колонкой okved_code.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    
+    Возвращается
+    ----------
+    segments: dict[str, pandas.DataFrame]
+        Название таблицы сегмента - компании сегмента (только непустые).
+    """
+    segment_codes = {}
+    for okved_code in egrul['okved_code'].dropna().unique():
+        for segment in get_okved_segments(okved_code, okved_lookup):
+            segment_codes.setdefault(segment, []).append(okved_code)
+    return {
+        segment: egrul[egrul['okved_code'].isin(okved_codes)]
+        for segment, okved_codes in segment_codes.items()
+        }
+
+def iter_egrul_batches(f, filename, okved_lookup, batch_size, prefilter=False):
+    """Потоковое чтение JSON-файла ЕГРЮЛ с распределением компаний
+    по сегментам загрузки за один проход.
+    Память ограничена размером пачек, а не размером файла.
+    
+    Аргументы
+    ----------
+    f: file-like
+        Бинарный файловый объект с JSON-массивом записей ЕГРЮЛ.
+    filename: str
+        Название JSON-файла в архиве.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    batch_size: int
+        Максимальное количество строк в одной пачке.
+    prefilter: bool, default: False
+        Декодировать только записи, отобранные предфильтром
+        по сырым байтам (см. iter_prefiltered_records).
+    
+    Возвращается
+    ----------
+    Генератор пар (название таблицы сегмента, egrul_batch.EgrulBatch).
+    Количество разобранных записей (для prefilter - декодированных кандидатов)
+    добавляется к rows_in текущего этапа metrics.
+    """
+    if prefilter:
+        records = iter_prefiltered_records(f, okved_lookup)
+    else:
+        records = iter_egrul_records(f)
+    
+    segment_rows = {}
+    records_count = 0
+    for record in records:
+        records_count += 1
+        segments = get_okved_segments(record['okved_code'], okved_lookup)
+        if not segments:
+            continue
+        row = (
+            record['ogrn'],
+            record['inn'],
+            record['kpp'],
+            record['name'],
+            record['okved_code'],
+            filename,
+            )
+        for segment in segments:
+            rows = segment_rows.setdefault(segment, [])
+            rows.append(row)
+            if len(rows) >= batch_size:
+                yield segment, EgrulBatch.from_rows(rows)
+                segment_rows[segment] = []
+    metrics.add(rows_in=records_count)
+    for segment, rows in segment_rows.items():
+        if rows:
+            yield segment, EgrulBatch.from_rows(rows)
+
+def read_egrul_dataframe(f, filename, okved_lookup, dtypes):
+    """Чтение JSON-файла ЕГРЮЛ целиком в датафрейм с распределением
+    компаний по сегментам загрузки.
+    
+    Аргументы
+    ----------
+    f: file-like
+        Файловый объект JSON-файла в архиве.
+    filename: str
+        Название JSON-файла в архиве.
+    okved_lookup: dict[str, tuple[str]]
+        Таблица принадлежности кодов сегментам, см. get_okved_lookup.
+    dtypes: dict
+        Словарь-маппинг типов данных.
+    
+    Возвращается
+    ----------
+    segments: dict[str, pandas.DataFrame]
+        Название таблицы сегмента - компании сегмента, см. split_by_segments.
+    """
+    egrul = pd.read_json(f, dtype=dtypes)
+    metrics.add(rows_in=len(egrul))
+    egrul['okved_code'] = egrul['data'].map(get_okved_code)
+    egrul['source_filename'] = filename
+    return split_by_segments(egrul[egrul_columns], okved_lookup)
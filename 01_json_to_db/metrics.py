@@ -0,0 +1,245 @@
+"""Метрики этапов загрузки: время (wall и CPU), строки на входе и выходе,
+прочитанные байты, пиковый RSS и количество обращений к БД.
+
+Этап оборачивается в контекстный менеджер stage (или декоратор timed),
+записи этапов копятся в памяти процесса и выгружаются функцией export
+в файл JSON Lines (по строке на этап, в т.ч. на каждый файл архива или
+страницу) и в текстовый файл Prometheus для textfile collector node_exporter
+(суммы по этапам).
+"""
+import os
+import sys
+import json
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковый RSS не замеряется
+    resource = None
+
+metrics_prefix = 'middle_python_edu'
+metrics_counters = ['rows_in', 'rows_out', 'bytes_read', 'invalid_ids']
+
+_records = []
+_local = threading.local()
+_lock = threading.Lock()
+
+def get_peak_rss():
+    """Пиковый RSS текущего процесса в байтах или None, если замер недоступен.
+    На Linux берется VmHWM: ru_maxrss процесса, запущенного через fork и exec,
+    включает память родителя на момент fork.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss - в байтах на macOS и в килобайтах на Linux
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+def add_db_round_trips(count=1):
+    """Учет обращений к БД (вызывается из psql). Счетчик у каждого потока свой:
+    этапам, выполняющимся одновременно в других потоках (например, фоновой
+    загрузке), обращения этого потока не засчитываются."""
+    _local.db_round_trips = get_db_round_trips() + count
+
+def get_db_round_trips():
+    """Количество обращений к БД из текущего потока."""
+    return getattr(_local, 'db_round_trips', 0)
+
+def add(**counters):
+    """Добавление счетчиков metrics_counters (rows_in, rows_out, bytes_read, invalid_ids)
+    к текущему (самому вложенному) этапу потока. Вне этапа ничего не делает."""
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return
+    record = stack[-1]
+    for name, value in counters.items():
+        record[name] = (record[name] or 0) + value
+
+@contextmanager
+def context(**labels):
+    """Метки, добавляемые ко всем этапам внутри блока, например app='hh_api_parsing'.
+    В отличие от меток stage, по ним в Prometheus разделяются ряды метрик."""
+    previous = getattr(_local, 'context', {})
+    _local.context = {**previous, **labels}
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+@contextmanager
+def stage(name, **labels):
+    """Контекстный менеджер замера этапа.
+
+    Аргументы
+    ----------
+    name: str
+        Название этапа.
+    labels: dict
+        Метки записи, например member='1.json' или page=0.
+
+    Возвращается
+    ----------
+    record: dict
+        Запись этапа: счетчики rows_in, rows_out, bytes_read
+        можно задать в ней напрямую или через add.
+    """
+    record = {
+        'stage': name,
+        'context': dict(getattr(_local, 'context', {})),
+        'labels': labels,
+        'start_dttm': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'pid': os.getpid(),
+        **dict.fromkeys(metrics_counters),
+        }
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(record)
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_db_round_trips = get_db_round_trips()
+    record['status'] = 'error'
+    try:
+        yield record
+        record['status'] = 'ok'
+    finally:
+        _local.stack.pop()
+        record['wall_seconds'] = round(time.perf_counter() - start_wall, 6)
+        record['cpu_seconds'] = round(time.process_time() - start_cpu, 6)
+        record['db_round_trips'] = get_db_round_trips() - start_db_round_trips
+        record['peak_rss_bytes'] = get_peak_rss()
+        with _lock:
+            _records.append(record)
+
+def timed(func):
+    """Декоратор замера функции как этапа с выводом времени выполнения."""
+    @wraps(func)
+    def decorator(*args, **kwargs):
+        line_separator = '\n'
+        start_dttm = time.strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{start_dttm} - {func.__name__} - {(func.__doc__ or '').split(line_separator)[0]}")
+        with stage(func.__name__) as record:
+            result = func(*args, **kwargs)
+        print(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {func.__name__} - время выполнения: "
+            f"{round(record['wall_seconds'], 2)} с (CPU {round(record['cpu_seconds'], 2)} с), "
+            f"обращений к БД: {record['db_round_trips']}"
+            )
+        return result
+    return decorator
+
+def pop_records():
+    """Извлечение накопленных записей процесса (для передачи из воркера)."""
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+def extend(records):
+    """Добавление записей, полученных из воркеров."""
+    with _lock:
+        _records.extend(records)
+
+def run_with_metrics(func, *args, **kwargs):
+    """Запуск функции в воркере пула процессов с возвратом ее метрик.
+    Возвращаются только записи, созданные во время вызова: воркер,
+    запущенный через fork, наследует записи родительского процесса.
+
+    Возвращается
+    ----------
+    result, records: tuple
+        Результат функции и записи этапов, накопленные за время ее выполнения.
+    """
+    with _lock:
+        start = len(_records)
+    result = func(*args, **kwargs)
+    with _lock:
+        records = _records[start:]
+        del _records[start:]
+    return result, records
+
+def write_jsonl(path, records):
+    """Дозапись записей этапов в файл JSON Lines."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_prometheus(path, records):
+    """Запись сумм по этапам в текстовый файл Prometheus.
+    Файл пишется во временный и переименовывается, чтобы node_exporter
+    не прочитал его частично.
+    """
+    stages = {}
+    for record in records:
+        key = (('stage', record['stage']), *sorted(record.get('context', {}).items()))
+        totals = stages.setdefault(key, {
+            'runs': 0, 'errors': 0, 'wall_seconds': 0, 'cpu_seconds': 0, 'db_round_trips': 0,
+            **dict.fromkeys(metrics_counters, 0), 'peak_rss_bytes': 0,
+            })
+        totals['runs'] += 1
+        totals['errors'] += record['status'] != 'ok'
+        for name in ['wall_seconds', 'cpu_seconds', 'db_round_trips', *metrics_counters]:
+            totals[name] += record[name] or 0
+        totals['peak_rss_bytes'] = max(totals['peak_rss_bytes'], record['peak_rss_bytes'] or 0)
+
+    descriptions = {
+        'runs': 'Количество выполнений этапа',
+        'errors': 'Количество выполнений этапа с ошибкой',
+        'wall_seconds': 'Суммарное время выполнения этапа, с',
+        'cpu_seconds': 'Суммарное процессорное время этапа, с',
+        'db_round_trips': 'Количество обращений к БД',
+        'rows_in': 'Строк на входе этапа',
+        'rows_out': 'Строк на выходе этапа',
+        'bytes_read': 'Прочитано байт',
+        'invalid_ids': 'Нечисловых идентификаторов, загруженных как NULL',
+        'peak_rss_bytes': 'Максимальный пиковый RSS процессов этапа, байт',
+        }
+    lines = []
+    for name, description in descriptions.items():
+        metric = f'{metrics_prefix}_stage_{name}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} gauge')
+        for key, totals in stages.items():
+            labels = ','.join(f'{label}="{_escape_label(value)}"' for label, value in key)
+            lines.append(f'{metric}{{{labels}}} {totals[name]}')
+    metric = f'{metrics_prefix}_last_export_timestamp_seconds'
+    lines.append(f'# HELP {metric} Время выгрузки метрик, unix time')
+    lines.append(f'# TYPE {metric} gauge')
+    lines.append(f'{metric} {int(time.time())}')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+def export(jsonl_path=None, prometheus_path=None):
+    """Выгрузка и очистка накопленных записей этапов.
+
+    Аргументы
+    ----------
+    jsonl_path: str, default: None
+        Файл JSON Lines, в который дописываются записи.
+    prometheus_path: str, default: None
+        Текстовый файл Prometheus (перезаписывается).
+    """
+    records = pop_records()
+    if jsonl_path:
+        write_jsonl(jsonl_path, records)
+    if prometheus_path:
+        write_prometheus(prometheus_path, records)
+    return records
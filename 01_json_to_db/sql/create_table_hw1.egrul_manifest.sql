@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS hw1.egrul_manifest (
+	archive_path VARCHAR,
+	member_name VARCHAR,
+	crc32 BIGINT,
+	file_size BIGINT,
+	rows_count BIGINT,
+	okved_segments VARCHAR,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (archive_path, member_name)
+	);
\ No newline at end of file
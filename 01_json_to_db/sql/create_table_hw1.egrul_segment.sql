@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS hw1.$table (
+	ogrn BIGINT PRIMARY KEY,
+	inn BIGINT,
+	kpp	BIGINT,
+	name VARCHAR,
+	okved_code VARCHAR,
+	source_filename VARCHAR,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	);
+
+CREATE INDEX IF NOT EXISTS ${table}_source_filename_idx
+	ON hw1.$table (source_filename);
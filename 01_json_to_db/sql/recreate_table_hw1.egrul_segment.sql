@@ -1,7 +1,7 @@
 -- DROP TABLE IF EXISTS hw1.telecom_companies_okved_codes;	
-DROP TABLE IF EXISTS hw1.telecom_companies;
+DROP TABLE IF EXISTS hw1.$table;
 
-CREATE TABLE hw1.telecom_companies (
+CREATE TABLE hw1.$table (
 	ogrn BIGINT PRIMARY KEY,
 	inn BIGINT,
 	kpp	BIGINT,
@@ -9,4 +9,7 @@ CREATE TABLE hw1.telecom_companies (
 	okved_code VARCHAR,
 	source_filename VARCHAR,
 	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-	);
\ No newline at end of file
+	);
+
+CREATE INDEX ${table}_source_filename_idx
+	ON hw1.$table (source_filename);
@@ -0,0 +1,78 @@
+"""Бенчмарк присоединения дополнительной информации к вакансиям: присваивание
+по маске для каждой вакансии (как до helpers.merge_addnl_info) против одного
+слияния по идентификатору. Ответы API подменены заранее подготовленными,
+замеряется только работа pandas.
+
+Запуск из папки 02_html_and_api_parsing (нужна переменная среды подключения
+к БД, см. config.py; к БД бенчмарк не обращается):
+    python -m benchmarks.bench_addnl_info_merge --rows 10000
+"""
+import time
+import argparse
+
+import pandas as pd
+
+from helpers import merge_addnl_info, vacancy_addnl_info_columns
+
+def get_vacancies(rows_count):
+    """Вакансии в виде, который возвращает iter_vacancies в hh_api_parsing."""
+    ids = [str(10 ** 7 + i) for i in range(rows_count)]
+    return pd.DataFrame({
+        'id': ids,
+        'position': [f'Python developer {i}' for i in range(rows_count)],
+        'employer': [f'Employer {i % 500}' for i in range(rows_count)],
+        'city': 'Москва',
+        'url': [f'https://api.hh.ru/vacancies/{vacancy_id}' for vacancy_id in ids],
+        })
+
+def get_responses(vacancies):
+    """Подмена ответов API: описание и ключевые навыки по адресу вакансии."""
+    return {
+        url: (f'<p>Описание вакансии {url}</p>', 'Python|SQL|Git' if i % 3 else None)
+        for i, url in enumerate(vacancies['url'])
+        }
+
+def merge_by_mask(vacancies, responses):
+    vacancies = vacancies.copy()
+    for _, vacancy in vacancies.iterrows():
+        current_vacancy_mask = vacancies['id'] == vacancy['id']
+        vacancies.loc[current_vacancy_mask, vacancy_addnl_info_columns] = responses[vacancy['url']]
+    return vacancies
+
+def merge_once(vacancies, responses):
+    vacancy_urls = vacancies[['id', 'url']].drop_duplicates('id')
+    addnl_info = [responses[url] for url in vacancy_urls['url']]
+    return merge_addnl_info(vacancies, 'id', vacancy_urls['id'], addnl_info)
+
+def timed(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f'{"вакансий":>9} {"по маске, с":>12} {"слияние, с":>11} {"ускорение":>10}')
+    # Размеры с удвоением: время по маске растет быстрее линейного (квадратичный член), время слияния - линейно
+    for rows_count in [args.rows // 4, args.rows // 2, args.rows]:
+        vacancies = get_vacancies(rows_count)
+        responses = get_responses(vacancies)
+        by_mask, mask_seconds = timed(lambda: merge_by_mask(vacancies, responses), args.repeat)
+        merged, merge_seconds = timed(lambda: merge_once(vacancies, responses), args.repeat)
+        print(
+            f'{rows_count:>9} {mask_seconds:>12.3f} {merge_seconds:>11.4f} '
+            f'{mask_seconds / merge_seconds:>9.0f}x'
+            )
+        pd.testing.assert_frame_equal(
+            by_mask[vacancy_addnl_info_columns].reset_index(drop=True).astype(object),
+            merged[vacancy_addnl_info_columns].astype(object),
+            )
+
+if __name__ == '__main__':
+    main()
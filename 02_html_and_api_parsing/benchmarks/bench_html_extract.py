@@ -0,0 +1,124 @@
+"""Бенчмарк разбора HTML-страниц hh.ru: BeautifulSoup (html.parser) против
+быстрого извлечения html_extract - страниц в секунду на одно ядро (время CPU)
+для страниц списка вакансий и страниц вакансий. Результаты обоих способов сравниваются.
+
+Страницы берутся из папки --pages-dir (подпапки search и vacancy с сохраненными
+*.html), по умолчанию - синтетические страницы со структурой hh.ru.
+
+Запуск из папки 02_html_and_api_parsing (нужна переменная среды подключения
+к БД, см. config.py; к БД бенчмарк не обращается):
+    python -m benchmarks.bench_html_extract --pages 50
+    python -m benchmarks.bench_html_extract --pages-dir saved_pages
+"""
+import os
+import glob
+import json
+import time
+import random
+import argparse
+
+import config
+import hh_html_parsing
+
+words = ['Python', 'разработка', 'сервисов', 'команда', 'опыт', 'Django', 'PostgreSQL', 'задачи', 'проект', 'API']
+
+def get_layout(rnd, blocks):
+    """Обвязка страницы: вложенные div со ссылками и текстом, как в шапке и подвале hh.ru."""
+    return ''.join(
+        f'<div class="supernova-navi-item supernova-navi-item_{i}" data-qa="navi-{i}">'
+        f'<a class="supernova-link" href="/search/vacancy?page={i}"><span>{rnd.choice(words)}</span></a>'
+        f'<div class="bloko-column bloko-column_xs-4"><span class="bloko-text">{" ".join(rnd.choices(words, k=8))}</span></div>'
+        f'</div>'
+        for i in range(blocks)
+        )
+
+def get_page(rnd, body, state):
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>hh.ru</title>'
+        '<script>window.globalVars = {"lang": "RU"}; if (a < b) { document.write("<div>"); }</script>'
+        '<style>.bloko-tag-list { display: flex; }</style></head><body>'
+        f'{get_layout(rnd, 300)}{body}'
+        f'<template id="HH-Lux-InitialState">{json.dumps(state, ensure_ascii=False).replace("<", chr(92) + "u003c")}</template>'
+        f'{get_layout(rnd, 300)}</body></html>'
+        ).encode('utf-8')
+
+def get_search_page(rnd, page):
+    vacancies = [
+        {
+            'vacancyId': page * 20 + i, 'name': f'Python developer {page * 20 + i}',
+            'company': {'name': f'Компания &amp; {i}'}, 'area': {'name': 'Москва'},
+            'links': {'desktop': f'https://hh.ru/vacancy/{page * 20 + i}'},
+            'snippet': {'requirement': ' '.join(rnd.choices(words, k=40))},
+            }
+        for i in range(20)
+        ]
+    state = {'vacancySearchResult': {'vacancies': vacancies, 'totalResults': 2000, 'paging': {'lastPage': {'page': 99}}}}
+    return get_page(rnd, '<div class="vacancy-serp">' + get_layout(rnd, 200) + '</div>', state)
+
+def get_vacancy_page(rnd, vacancy_id):
+    description = ''.join(
+        f'<p><strong>{rnd.choice(words)}:</strong></p><ul>'
+        + ''.join(f'<li>{" ".join(rnd.choices(words, k=10))} &laquo;{rnd.choice(words)}&raquo;</li>' for _ in range(6))
+        + '</ul>'
+        for _ in range(4)
+        )
+    skills = ''.join(
+        f'<div class="bloko-tag bloko-tag_inline" data-qa="bloko-tag bloko-tag_inline skills-element">'
+        f'<span class="bloko-tag__section" data-qa="bloko-tag__text">{skill}</span></div>'
+        for skill in rnd.sample(words, 5)
+        )
+    body = (
+        f'<div class="vacancy-section"><div class="g-user-content" data-qa="vacancy-description">{description}</div></div>'
+        f'<div class="bloko-tag-list">{skills}</div>'
+        )
+    return get_page(rnd, body, {'vacancyView': {'vacancyId': vacancy_id}})
+
+def get_pages(args):
+    if args.pages_dir:
+        return {
+            kind: [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(args.pages_dir, kind, '*.html')))]
+            for kind in ['search', 'vacancy']
+            }
+    rnd = random.Random(args.seed)
+    return {
+        'search': [get_search_page(rnd, page) for page in range(args.pages)],
+        'vacancy': [get_vacancy_page(rnd, vacancy_id) for vacancy_id in range(args.pages)],
+        }
+
+def parse_all(kind, pages):
+    parse = hh_html_parsing.parse_vacancies_page if kind == 'search' else hh_html_parsing.parse_vacancy_addnl_info
+    return [parse(page) for page in pages]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, default=50, help='количество синтетических страниц каждого вида')
+    parser.add_argument('--pages-dir', help='папка с сохраненными страницами (подпапки search и vacancy)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = get_pages(args)
+    print(f'{"страницы":<9} {"разбор":<6} {"страниц":>8} {"МБ":>6} {"CPU, с":>8} {"страниц/с":>10} {"ускорение":>10}')
+    for kind, kind_pages in pages.items():
+        if not kind_pages:
+            continue
+        size = sum(len(page) for page in kind_pages) / 2 ** 20
+        results = {}
+        for engine in ['bs4', 'fast']:
+            config.html_parser_engine = engine
+            cpu_times = []
+            for _ in range(args.repeat):
+                start_cpu = time.process_time()
+                parsed = parse_all(kind, kind_pages)
+                cpu_times.append(time.process_time() - start_cpu)
+            results[engine] = parsed, min(cpu_times)
+        for engine, (_, cpu_time) in results.items():
+            print(
+                f'{kind:<9} {engine:<6} {len(kind_pages):>8} {size:>6.1f} {cpu_time:>8.3f} '
+                f'{len(kind_pages) / cpu_time:>10.1f} {results["bs4"][1] / cpu_time:>9.1f}x'
+                )
+        if results['bs4'][0] != results['fast'][0]:
+            raise AssertionError(f'Результаты разбора страниц {kind} различаются')
+
+if __name__ == '__main__':
+    main()
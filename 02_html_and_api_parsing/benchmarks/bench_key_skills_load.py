@@ -0,0 +1,75 @@
+"""Бенчмарк загрузки ключевых навыков вакансий (refresh_key_skills в hh_api_parsing):
+'values' - id навыков из словаря и связи через INSERT ... VALUES, против 'copy' -
+пары "вакансия - навык" через COPY во временную таблицу и запросы над множествами
+(helpers.load_vacancies_key_skills). Каждый способ загружается в заново созданную
+схему (--schema, удаляется перед каждым замером), повторно - с заменой связей тех же вакансий.
+
+Запуск из папки 02_html_and_api_parsing (нужна переменная среды подключения к БД, см. config.py):
+    python -m benchmarks.bench_key_skills_load --vacancies 20000 --skills-per-vacancy 5
+"""
+import time
+import random
+import argparse
+
+import pandas as pd
+
+import config
+import helpers
+import hh_api_parsing
+
+def get_vacancies(vacancies_count, skills_count, skills_per_vacancy, seed):
+    """Вакансии в виде, который получает refresh_key_skills"""
+    rnd = random.Random(seed)
+    skills = [f'Skill {i}' for i in range(skills_count)]
+    return pd.DataFrame({
+        'id': [str(10 ** 7 + i) for i in range(vacancies_count)],
+        'position': 'Python developer',
+        'employer': 'Employer',
+        'city': 'Москва',
+        'description': '<p>Описание</p>',
+        'key_skills': [rnd.sample(skills, skills_per_vacancy) for _ in range(vacancies_count)],
+        })
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--vacancies', type=int, default=20000)
+    parser.add_argument('--skills', type=int, default=2000, help='количество различных навыков')
+    parser.add_argument('--skills-per-vacancy', type=int, default=5)
+    parser.add_argument('--schema', default='bench_key_skills_load')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    vacancies = get_vacancies(args.vacancies, args.skills, args.skills_per_vacancy, args.seed)
+    links_count = args.vacancies * args.skills_per_vacancy
+    # Словарь навыков не используется: замеряется загрузка в пустую схему
+    helpers.skills_cache = None
+    hh_api_parsing.schema = args.schema
+    print(f'{"способ":<7} {"связей":>8} {"загрузка, с":>12} {"замена, с":>10} {"связей/с":>10}')
+    try:
+        for method in ['values', 'copy']:
+            config.key_skills_load_method = method
+            helpers.create_db_schema(args.schema)
+            helpers.db.insert_values(
+                vacancies.drop(columns=['key_skills']), args.schema, config.vacancies_table, method='copy',
+                )
+            load_seconds = timed(lambda: hh_api_parsing.refresh_key_skills(vacancies))
+            reload_seconds = timed(lambda: hh_api_parsing.refresh_key_skills(vacancies))
+            loaded_count = helpers.db.read_query(
+                f'SELECT count(*) AS links_count FROM {args.schema}.{config.vacancies_key_skills_table}'
+                )['links_count'][0]
+            if loaded_count != links_count:
+                raise AssertionError(f'{method}: загружено связей {loaded_count} из {links_count}')
+            print(
+                f'{method:<7} {links_count:>8} {load_seconds:>12.2f} {reload_seconds:>10.2f} '
+                f'{links_count / load_seconds:>10.0f}'
+                )
+    finally:
+        helpers.db.execute_query(f'DROP SCHEMA IF EXISTS {args.schema} CASCADE')
+
+if __name__ == '__main__':
+    main()
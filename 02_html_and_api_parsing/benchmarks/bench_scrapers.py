@@ -0,0 +1,124 @@
+"""Бенчмарк пропускной способности скриптов на локальном стенде HeadHunter
+(benchmarks/hh_stub_server.py, запускается бенчмарком): получение списка вакансий
+и дополнительной информации с трансформацией, как в app скриптов, но без загрузки
+в БД, при разных config.hh_concurrency и начальной частоте запросов
+(config.hh_throttle_params['rate']). Кэш ответов отключается.
+
+Запуск из папки 02_html_and_api_parsing (нужна переменная среды подключения
+к БД, см. config.py; к БД бенчмарк не обращается):
+    python -m benchmarks.bench_scrapers --vacancies 2000 --limit 100 --quota 20 --latency 0.1
+    python -m benchmarks.bench_scrapers --scripts api --concurrency 4,8,16 --rate 5,20 --error-rate 0.02
+"""
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+from contextlib import redirect_stdout
+
+import config
+import hh_client
+import hh_api_parsing
+import hh_html_parsing
+from helpers import iter_enriched_vacancies
+
+scripts = {
+    'api': (hh_api_parsing, 'id'),
+    'html': (hh_html_parsing, 'vacancyId'),
+    }
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_stub_server(args, port):
+    """Запуск стенда в отдельном процессе и ожидание его готовности"""
+    server = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.hh_stub_server', '--port', str(port),
+        '--vacancies', str(args.vacancies), '--per-page', str(args.per_page),
+        '--latency', str(args.latency), '--latency-jitter', str(args.latency_jitter),
+        '--error-rate', str(args.error_rate), '--quota', str(args.quota), '--html-kb', str(args.html_kb),
+        ])
+    for _ in range(100):
+        try:
+            get_stub_stats(port)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('Стенд HeadHunter не запустился')
+
+def get_stub_stats(port):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/stats') as response:
+        return json.load(response)
+
+def configure(module, concurrency, rate):
+    """Параметры запуска: новый ограничитель частоты запросов, без кэша ответов"""
+    config.hh_concurrency = concurrency
+    config.hh_throttle_params = {
+        **config.hh_throttle_params,
+        'rate': rate,
+        'max_rate': max(rate, config.hh_throttle_params['max_rate']),
+        }
+    module.throttle = hh_client.AdaptiveThrottle(**config.hh_throttle_params)
+    module.client.throttle = module.throttle
+    module.client.cache = None
+    module.hh_cache = None
+
+def run_script(module, id_column, limit):
+    """Список вакансий и дополнительная информация до limit вакансий, годных к загрузке"""
+    batches = iter_enriched_vacancies(module.iter_vacancies(), module.enrich_vacancies, id_column, limit=limit)
+    # Этапы metrics печатают время выполнения - в выводе бенчмарка они не нужны
+    with redirect_stdout(io.StringIO()):
+        return sum(len(batch) for batch in batches)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scripts', default='api,html', help='скрипты через запятую: api, html')
+    parser.add_argument('--concurrency', default='4,8,16', help='значения config.hh_concurrency через запятую')
+    parser.add_argument('--rate', default='5,20', help='начальные частоты запросов через запятую')
+    parser.add_argument('--limit', type=int, default=100, help='config.vacancies_limit')
+    parser.add_argument('--vacancies', type=int, default=2000)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--latency-jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--quota', type=float, default=20)
+    parser.add_argument('--html-kb', type=int, default=100)
+    args = parser.parse_args()
+
+    port = get_free_port()
+    config.base_api_url = f'http://127.0.0.1:{port}/vacancies'
+    config.base_url = f'http://127.0.0.1:{port}/search/vacancy'
+    config.vacancies_limit = args.limit
+    server = start_stub_server(args, port)
+    try:
+        print(
+            f'{"скрипт":<6} {"потоков":>7} {"частота":>7} {"вакансий":>8} {"время, с":>9} {"вакансий/с":>10} '
+            f'{"запросов":>8} {"запросов/с":>10} {"429":>5} {"502":>5} {"частота в конце":>15}'
+            )
+        for script in args.scripts.split(','):
+            module, id_column = scripts[script]
+            for concurrency in map(int, args.concurrency.split(',')):
+                for rate in map(float, args.rate.split(',')):
+                    configure(module, concurrency, rate)
+                    stats_before = get_stub_stats(port)
+                    start = time.perf_counter()
+                    vacancies_count = run_script(module, id_column, args.limit)
+                    seconds = time.perf_counter() - start
+                    stats = {name: value - stats_before[name] for name, value in get_stub_stats(port).items()}
+                    print(
+                        f'{script:<6} {concurrency:>7} {rate:>7.1f} {vacancies_count:>8} {seconds:>9.2f} '
+                        f'{vacancies_count / seconds:>10.1f} {stats["requests"]:>8} {stats["requests"] / seconds:>10.1f} '
+                        f'{stats["throttled"]:>5} {stats["errors"]:>5} {module.throttle.rate:>15.2f}'
+                        )
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == '__main__':
+    main()
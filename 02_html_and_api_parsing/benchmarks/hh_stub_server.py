@@ -0,0 +1,278 @@
+"""Локальный стенд HeadHunter для нагрузочного тестирования скриптов без обращения
+к hh.ru и расхода квоты API. Отдает:
+    - /vacancies - страницы списка вакансий API (items, found, pages, page, per_page);
+    - /vacancies/<id> - вакансию API (description, key_skills), с ETag и ответом 304;
+    - /search/vacancy - HTML-страницу поиска с JSON в <template id="HH-Lux-InitialState">;
+    - /vacancy/<id> - HTML-страницу вакансии (vacancy-description, bloko-tag-list);
+    - /stats - счетчики ответов стенда.
+Ответы синтетические (--vacancies вакансий, --per-page на странице) или записанные
+(--replay-dir: vacancies/page_<n>.json, vacancies/<id>.json, search/page_<n>.html,
+vacancy/<id>.html; адреса hh.ru в них заменяются адресом стенда). С --record
+недостающие записи запрашиваются у hh.ru и сохраняются в --replay-dir.
+Задержка ответа (--latency, --latency-jitter), ошибки 502 (--error-rate) и квота
+запросов в секунду с ответами 429 и Retry-After (--quota) настраиваются.
+
+Запуск из папки 02_html_and_api_parsing (к БД стенд не обращается):
+    python -m benchmarks.hh_stub_server --port 8080 --vacancies 2000 --latency 0.05 --quota 20
+Скрипты переключаются на стенд адресами в config.py (в DAG - в top_key_skills/config.py):
+    base_api_url = 'http://127.0.0.1:8080/vacancies'
+    base_url = 'http://127.0.0.1:8080/search/vacancy'
+"""
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+
+from aiohttp import web, ClientSession
+
+upstream_urls = {'api': 'https://api.hh.ru', 'site': 'https://hh.ru'}
+skills = ['Python', 'SQL', 'PostgreSQL', 'Django', 'FastAPI', 'Git', 'Docker', 'Linux', 'Redis', 'Kafka']
+cities = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань']
+published_from = 1672531200  # 2023-01-01 00:00:00 UTC
+
+class StubServer:
+    """Стенд HeadHunter: синтетические или записанные ответы с задержкой,
+    ошибками и квотой запросов.
+
+    Аргументы
+    ----------
+    args: argparse.Namespace
+        Параметры стенда, см. get_parser.
+    """
+    def __init__(self, args):
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.tokens = args.quota
+        self.tokens_updated = time.monotonic()
+        self.stats = dict.fromkeys(['requests', 'ok', 'errors', 'throttled', 'not_modified', 'recorded'], 0)
+        self.filler = self.get_filler(args.html_kb)
+
+    def get_app(self):
+        app = web.Application(middlewares=[self.inject_faults])
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_get('/vacancies', self.handle_api_vacancies)
+        app.router.add_get('/vacancies/{id}', self.handle_api_vacancy)
+        app.router.add_get('/search/vacancy', self.handle_search_page)
+        app.router.add_get('/vacancy/{id}', self.handle_vacancy_page)
+        return app
+
+    def get_origin(self, request):
+        return f'{request.scheme}://{request.host}'
+
+    @web.middleware
+    async def inject_faults(self, request, handler):
+        """Квота запросов (429 с Retry-After), задержка и ошибки 502"""
+        if request.path == '/stats':
+            return await handler(request)
+        self.stats['requests'] += 1
+        if self.args.quota:
+            now = time.monotonic()
+            self.tokens = min(self.args.quota, self.tokens + (now - self.tokens_updated) * self.args.quota)
+            self.tokens_updated = now
+            if self.tokens < 1:
+                self.stats['throttled'] += 1
+                retry_after = math.ceil((1 - self.tokens) / self.args.quota)
+                return web.Response(status=429, headers={'Retry-After': str(retry_after)}, text='quota exceeded')
+            self.tokens -= 1
+        latency = self.args.latency + self.rnd.uniform(-1, 1) * self.args.latency_jitter
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if self.rnd.random() < self.args.error_rate:
+            self.stats['errors'] += 1
+            return web.Response(status=502, text='bad gateway')
+        response = await handler(request)
+        if response.status == 200:
+            self.stats['ok'] += 1
+        return response
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+    def get_pages(self, per_page):
+        return math.ceil(self.args.vacancies / per_page)
+
+    def get_page_ids(self, page, per_page):
+        return range(page * per_page, min(self.args.vacancies, (page + 1) * per_page))
+
+    def get_published_at(self, vacancy_id):
+        """Дата публикации: новые вакансии - в начале списка, как при сортировке по дате"""
+        published_at = published_from + (self.args.vacancies - vacancy_id) * 600
+        return time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(published_at))
+
+    def get_vacancy_skills(self, vacancy_id):
+        """Ключевые навыки вакансии (у каждой третьей - нет)"""
+        if vacancy_id % 3 == 0:
+            return []
+        return [skills[(vacancy_id + i) % len(skills)] for i in range(1 + vacancy_id % 4)]
+
+    @staticmethod
+    def get_filler(size_kb):
+        """Разметка-наполнитель страницы (шапка, подвал) размером около size_kb КБ"""
+        block = (
+            '<div class="supernova-navi-item" data-qa="navi-item"><a class="supernova-link" href="/search/vacancy">'
+            '<span>Вакансии</span></a><div class="bloko-column"><span class="bloko-text">Работа найдется для каждого'
+            '</span></div></div>'
+            )
+        return block * (size_kb * 1024 // len(block.encode('utf-8')))
+
+    def get_html(self, body, state=None):
+        template = ''
+        if state is not None:
+            state_json = json.dumps(state, ensure_ascii=False).replace('<', '\\u003c')
+            template = f'<template id="HH-Lux-InitialState">{state_json}</template>'
+        return (
+            '<!DOCTYPE html><html><head><meta charset="utf-8"><title>hh.ru</title></head><body>'
+            f'{self.filler}{body}{template}{self.filler}</body></html>'
+            )
+
+    def get_per_page(self, request, name):
+        # Как в API hh.ru: не больше 100 вакансий на странице
+        return min(int(request.query.get(name, self.args.per_page)), 100)
+
+    async def handle_api_vacancies(self, request):
+        page = int(request.query.get('page', 0))
+        if self.args.replay_dir:
+            return await self.replay(request, 'api', f'vacancies/page_{page}.json')
+        per_page = self.get_per_page(request, 'per_page')
+        origin = self.get_origin(request)
+        items = [
+            {
+                'id': str(vacancy_id),
+                'name': f'Python developer {vacancy_id}',
+                'area': {'name': cities[vacancy_id % len(cities)]},
+                'employer': {'name': f'Employer {vacancy_id % 50}'},
+                'url': f'{origin}/vacancies/{vacancy_id}',
+                'alternate_url': f'{origin}/vacancy/{vacancy_id}',
+                'published_at': self.get_published_at(vacancy_id),
+                }
+            for vacancy_id in self.get_page_ids(page, per_page)
+            ]
+        return web.json_response({
+            'items': items, 'found': self.args.vacancies, 'pages': self.get_pages(per_page),
+            'page': page, 'per_page': per_page,
+            })
+
+    async def handle_api_vacancy(self, request):
+        vacancy_id = request.match_info['id']
+        if self.args.replay_dir:
+            return await self.replay(request, 'api', f'vacancies/{vacancy_id}.json')
+        vacancy_id = int(vacancy_id)
+        if vacancy_id >= self.args.vacancies:
+            raise web.HTTPNotFound()
+        data = {
+            'id': str(vacancy_id),
+            'name': f'Python developer {vacancy_id}',
+            'description': f'<p>Вакансия {vacancy_id}: разработка сервисов на Python.</p>' * 5,
+            'key_skills': [{'name': skill} for skill in self.get_vacancy_skills(vacancy_id)],
+            'published_at': self.get_published_at(vacancy_id),
+            }
+        return self.get_cacheable_response(request, json.dumps(data, ensure_ascii=False), 'application/json')
+
+    async def handle_search_page(self, request):
+        page = int(request.query.get('page', 0))
+        if self.args.replay_dir:
+            return await self.replay(request, 'site', f'search/page_{page}.html')
+        per_page = self.get_per_page(request, 'items_on_page')
+        origin = self.get_origin(request)
+        vacancies = [
+            {
+                'vacancyId': vacancy_id,
+                'name': f'Python developer {vacancy_id}',
+                'company': {'name': f'Employer {vacancy_id % 50}'},
+                'area': {'name': cities[vacancy_id % len(cities)]},
+                'links': {'desktop': f'{origin}/vacancy/{vacancy_id}'},
+                }
+            for vacancy_id in self.get_page_ids(page, per_page)
+            ]
+        pages = self.get_pages(per_page)
+        state = {'vacancySearchResult': {
+            'vacancies': vacancies,
+            'totalResults': self.args.vacancies,
+            'paging': {'lastPage': {'page': pages - 1}} if pages > 1 else None,
+            }}
+        body = '<div class="vacancy-serp-content"><h1>Найдено вакансий</h1></div>'
+        return web.Response(text=self.get_html(body, state), content_type='text/html')
+
+    async def handle_vacancy_page(self, request):
+        vacancy_id = request.match_info['id']
+        if self.args.replay_dir:
+            return await self.replay(request, 'site', f'vacancy/{vacancy_id}.html')
+        vacancy_id = int(vacancy_id)
+        if vacancy_id >= self.args.vacancies:
+            raise web.HTTPNotFound()
+        description = ''.join(
+            f'<p><strong>Задачи {i}:</strong></p><ul><li>разработка сервисов на Python</li><li>работа с БД</li></ul>'
+            for i in range(5)
+            )
+        body = f'<div class="vacancy-section"><div class="g-user-content" data-qa="vacancy-description">{description}</div></div>'
+        vacancy_skills = self.get_vacancy_skills(vacancy_id)
+        if vacancy_skills:
+            body += '<div class="bloko-tag-list">' + ''.join(
+                '<div class="bloko-tag bloko-tag_inline" data-qa="bloko-tag bloko-tag_inline skills-element">'
+                f'<span class="bloko-tag__section" data-qa="bloko-tag__text">{skill}</span></div>'
+                for skill in vacancy_skills
+                ) + '</div>'
+        return self.get_cacheable_response(request, self.get_html(body), 'text/html')
+
+    def get_cacheable_response(self, request, text, content_type):
+        """Ответ с ETag: на If-None-Match с тем же ETag - 304 без тела"""
+        etag = '"' + hashlib.md5(text.encode('utf-8')).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.stats['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=text, content_type=content_type, headers={'ETag': etag})
+
+    async def replay(self, request, upstream, filename):
+        """Записанный ответ из --replay-dir (с --record - запрос к hh.ru при отсутствии записи)"""
+        path = os.path.join(self.args.replay_dir, filename)
+        if not os.path.exists(path):
+            if not self.args.record:
+                raise web.HTTPNotFound()
+            await self.record(request, upstream, path)
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        origin = self.get_origin(request)
+        for upstream_url in upstream_urls.values():
+            text = text.replace(upstream_url, origin)
+        content_type = 'application/json' if filename.endswith('.json') else 'text/html'
+        return self.get_cacheable_response(request, text, content_type)
+
+    async def record(self, request, upstream, path):
+        async with ClientSession(headers={'User-agent': 'Mozilla/5.0'}) as session:
+            url = upstream_urls[upstream] + request.path
+            async with session.get(url, params=request.query) as response:
+                if response.status != 200:
+                    raise web.HTTPBadGateway(text=f'{url}: {response.status}')
+                text = await response.text()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        self.stats['recorded'] += 1
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--vacancies', type=int, default=2000, help='количество синтетических вакансий')
+    parser.add_argument('--per-page', type=int, default=20, help='вакансий на странице списка по умолчанию')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка ответа, с')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='разброс задержки (+-), с')
+    parser.add_argument('--error-rate', type=float, default=0, help='доля ответов 502')
+    parser.add_argument('--quota', type=float, default=0, help='квота запросов в секунду (0 - без квоты)')
+    parser.add_argument('--html-kb', type=int, default=100, help='размер наполнителя HTML-страниц, КБ')
+    parser.add_argument('--replay-dir', help='папка с записанными ответами')
+    parser.add_argument('--record', action='store_true', help='запрашивать недостающие записи у hh.ru')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+def main():
+    args = get_parser().parse_args()
+    print(f'Стенд HeadHunter: http://{args.host}:{args.port}')
+    web.run_app(StubServer(args).get_app(), host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
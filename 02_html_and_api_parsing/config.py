@@ -21,6 +21,12 @@ DB_CREDENTIALS = dict(
     user=db_dict.username,
     password=db_dict.password,
     )
+# Размер пула соединений PsqlConnector (на процесс). Одновременно соединения держат основной поток
+# и поток фоновой загрузки, поэтому maxconn не меньше количества потоков, работающих с БД;
+# при занятых maxconn соединениях getconn ждет возврата соединения не дольше db_pool_timeout секунд
+db_pool_minconn = 1
+db_pool_maxconn = 4
+db_pool_timeout = 60
     
 html_schema = 'hw2_html_parsing'
 api_schema = 'hw2_api_parsing'
@@ -29,6 +35,9 @@ vacancies_table = 'vacancies'
 key_skills_table = 'key_skills'
 vacancies_key_skills_table = 'vacancies_key_skills'
 
+# Данные скриптов (кэши), в git не хранятся (см. .gitignore)
+bulk_data_dir = 'bulk_data'
+
 base_url = r'https://hh.ru/search/vacancy'
 base_api_url = r'https://api.hh.ru/vacancies'
 
@@ -37,5 +46,77 @@ url_params = {
     'text': 'middle python developer',
     'search_field': 'name',
     }
+# Поисковые запросы - параметры запроса списка вакансий (text, search_field, area и др.), например
+# [url_params, {**url_params, 'area': 2}]. Страницы всех запросов запрашиваются параллельно в рамках
+# общего ограничения частоты запросов; вакансия, найденная несколькими запросами, обрабатывается один раз
+search_specs = [url_params]
+
+vacancies_limit = 100
+# Потоковая обработка вакансий: количество готовых пачек вакансий, ожидающих загрузки в БД
+# (загрузка идет в отдельном потоке параллельно с запросами следующих пачек)
+pipeline_buffer_size = 2
+
+# Синхронизация вакансий в hh_api_parsing.py: 'full' - схема пересоздается, дополнительная информация
+# запрашивается по всем найденным вакансиям; 'incremental' - таблицы сохраняются, дополнительная
+# информация запрашивается только по новым вакансиям и вакансиям с изменившейся датой публикации
+hh_sync_mode = 'full'
+# Сокращение списка вакансий в режиме 'incremental' параметром API date_from: запрашиваются вакансии,
+# опубликованные не раньше последней сохраненной даты публикации минус hh_sync_overlap секунд;
+# None - список не сокращается (вакансии, не попавшие в vacancies_limit, будут запрошены в следующий раз)
+hh_sync_overlap = None
+
+# Разбор HTML-страниц в hh_html_parsing.py: 'fast' - поиск нужных блоков по разметке (html_extract.py),
+# при нераспознанной разметке - BeautifulSoup; 'bs4' - только BeautifulSoup
+html_parser_engine = 'fast'
+
+# Получение дополнительной информации по вакансиям через API:
+# 'async' - параллельные запросы (hh_client.py), 'sync' - последовательные запросы
+hh_fetch_mode = 'async'
+# Максимальное количество одновременных запросов
+hh_concurrency = 8
+# Адаптивное ограничение частоты запросов (hh_client.AdaptiveThrottle): начальная частота
+# и запросов подряд без ожидания; на ответы 429/503 частота уменьшается вдвое (не ниже min_rate),
+# после increase_after успешных ответов подряд - увеличивается на increase_step (не выше max_rate)
+hh_throttle_params = dict(
+    rate=5,
+    burst=10,
+    min_rate=0.5,
+    max_rate=20,
+    increase_step=0.5,
+    increase_after=20,
+    backoff_base=1,
+    backoff_max=60,
+    )
+# Максимальное количество повторов запроса (429, 5xx, сетевые ошибки)
+hh_max_retries = 5
+# Таймаут запроса, с
+hh_request_timeout = 30
+# Постоянный кэш ответов HeadHunter (http_cache.py), None - без кэша: дополнительная информация
+# по вакансиям моложе ttl отдается без запроса, более старая проверяется условным запросом
+# (If-None-Match / If-Modified-Since); страницы списка вакансий условным запросом проверяются всегда,
+# в режиме hh_sync_mode='incremental' - и дополнительная информация по вакансиям (запрашивается
+# только по изменившимся вакансиям); записи старше max_age и давно использованные сверх max_entries удаляются
+hh_cache_path = os.path.join(bulk_data_dir, 'hh_http_cache.sqlite')
+hh_cache_params = dict(
+    ttl=12 * 3600,
+    max_age=7 * 24 * 3600,
+    max_entries=100000,
+    )
+# Загрузка ключевых навыков вакансий: 'copy' - пары "вакансия - навык" копируются во временную таблицу,
+# навыки и связи добавляются запросами над множествами в одной транзакции (helpers.load_vacancies_key_skills);
+# 'values' - связи загружаются INSERT ... VALUES; оба способа берут id навыков из словаря skills_cache
+key_skills_load_method = 'copy'
+# Постоянный словарь ключевых навыков "название - id" (skills_cache.py), None - без словаря:
+# id навыков берутся из словаря, в key_skills добавляются только навыки, которых в словаре нет
+# (key_skills не пересоздается и при hh_sync_mode='full', поэтому словарь действует между запусками);
+# самые давно использованные записи сверх max_entries удаляются
+skills_cache_path = os.path.join(bulk_data_dir, 'key_skills.sqlite')
+skills_cache_params = dict(
+    max_entries=100000,
+    )
 
-vacancies_limit = 100
\ No newline at end of file
+# Метрики этапов (см. metrics.py): записи этапов дописываются в файл JSON Lines,
+# суммы по этапам - в текстовый файл Prometheus для textfile collector node_exporter
+metrics_dir = 'metrics'
+metrics_jsonl_path = os.path.join(metrics_dir, 'html_and_api_parsing.jsonl')
+metrics_prometheus_path = os.path.join(metrics_dir, 'html_and_api_parsing.prom')
\ No newline at end of file
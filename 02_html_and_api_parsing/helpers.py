@@ -1,22 +1,308 @@
+import queue
+import threading
+
 import pandas as pd
+
+import config
+import metrics
 import psql
+import http_cache
+import skills_cache as skills_cache_module
 
 db = psql.PsqlConnector()
+# Кэш ответов HeadHunter, общий для скриптов (соединение открывается при первом обращении)
+hh_cache = http_cache.HttpCache(config.hh_cache_path, **config.hh_cache_params) if config.hh_cache_path else None
+# Словарь ключевых навыков, общий для скриптов (соединение открывается при первом обращении)
+skills_cache = (
+    skills_cache_module.SkillsCache(config.skills_cache_path, **config.skills_cache_params)
+    if config.skills_cache_path else None
+    )
+vacancy_addnl_info_columns = ['description', 'key_skills']
 
-def time_decorator(func):
-    """Декоратор для отображения времени исполнения функции"""
-    def decorator(*args, **kwargs):
-        start_dttm = pd.to_datetime('today')
-        line_separator = '\n'
-        print(f'{start_dttm} - {func.__name__} - {func.__doc__.split(line_separator)[0]}')
-        result = func(*args, **kwargs)
-        end_dttm = pd.to_datetime('today')
-        diff = end_dttm - start_dttm
-        print(f'{end_dttm} - {func.__name__} - время выполнения: {round(diff.total_seconds(), 2)} с')
-        return result
-    return decorator
-
-@time_decorator
+@metrics.timed
 def create_db_schema(schema):
-    """Создание структура базы данных"""
-    db.execute_sql('sql/recreate_tables.sql', schema=schema)
\ No newline at end of file
+    """Создание структура базы данных (таблицы вакансий пересоздаются, словарь key_skills сохраняется)"""
+    db.execute_sql('sql/recreate_tables.sql', schema=schema)
+
+@metrics.timed
+def create_db_tables(schema):
+    """Создание структуры базы данных, если ее нет (существующие таблицы сохраняются)"""
+    db.execute_sql('sql/create_tables.sql', schema=schema)
+
+def run_apps(**apps):
+    """Запуск скриптов с выгрузкой метрик этапов (в т.ч. при ошибке).
+    Этапы каждого скрипта получают метку app с его названием.
+
+    Аргументы
+    ----------
+    apps: dict
+        Функции app скриптов по названиям, например hh_api_parsing=hh_api_parsing.app.
+    """
+    try:
+        for name, app in apps.items():
+            with metrics.context(app=name):
+                app()
+    finally:
+        metrics.export(config.metrics_jsonl_path, config.metrics_prometheus_path)
+
+def add_http_metrics(stats, throttle):
+    """Запись счетчиков клиента HeadHunter (см. hh_client) и текущей
+    частоты запросов в метрики текущего этапа.
+
+    Аргументы
+    ----------
+    stats: dict
+        Счетчики клиента, см. hh_client.HhClient.pop_stats.
+    throttle: hh_client.AdaptiveThrottle
+        Ограничитель частоты запросов клиента.
+    """
+    metrics.add(**stats)
+    metrics.set_gauges(http_rate=round(throttle.rate, 3))
+
+def merge_addnl_info(vacancies, id_column, ids, addnl_info):
+    """Присоединение дополнительной информации к вакансиям одним слиянием
+    по идентификатору (вместо присваивания по маске для каждой вакансии).
+
+    Аргументы
+    ----------
+    vacancies: pandas.DataFrame
+        Вакансии.
+    id_column: str
+        Колонка с идентификатором вакансии.
+    ids: list-like
+        Идентификаторы вакансий, по которым получена информация (без повторов).
+    addnl_info: list[tuple]
+        Описание и ключевые навыки (через '|') в порядке ids.
+
+    Возвращается
+    ----------
+    vacancies: pandas.DataFrame
+        Вакансии с колонками description и key_skills.
+    """
+    addnl_info = pd.DataFrame(list(addnl_info), columns=vacancy_addnl_info_columns)
+    addnl_info.insert(0, id_column, list(ids))
+    return vacancies.merge(addnl_info, how='left', on=id_column, validate='many_to_one')
+
+def interleave_search_pages(specs, pages_counts, first_page=1):
+    """Страницы поисковых запросов по очереди: страница first_page каждого запроса,
+    затем следующая и т.д. - при остановке после config.vacancies_limit вакансий
+    запросы представлены в полученных вакансиях поровну.
+
+    Аргументы
+    ----------
+    specs: list[dict]
+        Параметры поисковых запросов, см. config.search_specs.
+    pages_counts: list[int]
+        Количество страниц каждого запроса.
+
+    Возвращается
+    ----------
+    pages: list[tuple[dict, int]]
+        Параметры запроса и номер страницы.
+    """
+    return [
+        (params, page)
+        for page in range(first_page, max(pages_counts, default=0))
+        for params, pages_count in zip(specs, pages_counts)
+        if page < pages_count
+        ]
+
+def iter_enriched_vacancies(batches, enrich, id_column, limit=None, min_chunk_size=None):
+    """Поток вакансий, готовых к загрузке: дополнительная информация по вакансиям
+    из пачек списка запрашивается порциями по количеству недостающих до limit
+    вакансий (не меньше min_chunk_size). Как только набрано limit вакансий,
+    поток останавливается, и следующие пачки списка не запрашиваются.
+
+    Аргументы
+    ----------
+    batches: iterable[pandas.DataFrame]
+        Пачки списка вакансий (например, группы страниц поиска).
+    enrich: callable
+        Обработка порции вакансий: получение дополнительной информации
+        и трансформация, возвращает вакансии, годные к загрузке.
+    id_column: str
+        Колонка с идентификатором вакансии в batches: повторы отбрасываются.
+    limit: int, default: None
+        Количество вакансий, по умолчанию config.vacancies_limit.
+    min_chunk_size: int, default: None
+        Минимальный размер порции, по умолчанию config.hh_concurrency.
+
+    Возвращается
+    ----------
+    vacancies: generator[pandas.DataFrame]
+        Пачки вакансий, в сумме не больше limit.
+    """
+    remaining = config.vacancies_limit if limit is None else limit
+    min_chunk_size = min_chunk_size or config.hh_concurrency
+    batches = iter(batches)
+    seen_ids = set()
+    pending = pd.DataFrame()
+    while remaining > 0:
+        chunk_size = max(remaining, min_chunk_size)
+        if len(pending) < chunk_size:
+            batch = next(batches, None)
+            if batch is not None:
+                batch = batch.drop_duplicates(id_column)
+                batch = batch[~batch[id_column].isin(seen_ids)]
+                seen_ids.update(batch[id_column])
+                pending = batch if pending.empty else pd.concat([pending, batch], ignore_index=True)
+                continue
+            if pending.empty:
+                break
+        chunk, pending = pending.iloc[:chunk_size], pending.iloc[chunk_size:]
+        vacancies = enrich(chunk).head(remaining)
+        remaining -= len(vacancies)
+        if len(vacancies):
+            yield vacancies
+
+def load_in_background(batches, *loaders, buffer_size=None):
+    """Загрузка пачек в отдельном потоке параллельно с получением следующих:
+    каждая пачка по очереди передается функциям loaders. Между потоками -
+    очередь не больше buffer_size пачек (по умолчанию config.pipeline_buffer_size),
+    при ее заполнении получение пачек ждет загрузку.
+    Ошибка загрузки останавливает получение пачек и передается вызывающему.
+
+    Аргументы
+    ----------
+    batches: iterable[pandas.DataFrame]
+        Пачки вакансий, см. iter_enriched_vacancies.
+    loaders: callable
+        Функции загрузки пачки, например load_vacancies и refresh_key_skills.
+    """
+    batches_queue = queue.Queue(maxsize=buffer_size or config.pipeline_buffer_size)
+    errors = []
+    labels = metrics.get_context()
+
+    def load():
+        with metrics.context(**labels):
+            while True:
+                batch = batches_queue.get()
+                if batch is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    for loader in loaders:
+                        loader(batch)
+                except BaseException as error:
+                    errors.append(error)
+
+    thread = threading.Thread(target=load, name='load_in_background', daemon=True)
+    thread.start()
+    try:
+        for batch in batches:
+            if errors:
+                break
+            batches_queue.put(batch)
+    finally:
+        batches_queue.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def get_key_skills_namespace(schema, conn=None):
+    """Пространство словаря skills_cache для таблицы key_skills схемы schema: БД, схема,
+    OID и файл таблицы. После пересоздания или очистки таблицы (id навыков начинаются заново)
+    пространство меняется; полная синхронизация (sql/recreate_tables.sql) key_skills
+    не пересоздает, поэтому словарь используется и между запусками."""
+    table = f'{schema}.{config.key_skills_table}'
+    return '.'.join(map(str, db.fetch_query(
+        'SELECT current_database(), %s, %s::regclass::oid, pg_relation_filenode(%s::regclass)',
+        (schema, table, table),
+        conn=conn,
+        )[0]))
+
+def get_key_skill_ids(schema, skills):
+    """id ключевых навыков: из словаря skills_cache, навыки, которых в нем нет,
+    добавляются в таблицу key_skills (или находятся в ней) одним запросом
+    INSERT ... ON CONFLICT ... RETURNING id, без чтения таблицы целиком.
+
+    Аргументы
+    ----------
+    schema: str
+        Название схемы БД.
+    skills: list-like
+        Названия навыков (без повторов).
+
+    Возвращается
+    ----------
+    ids: dict
+        id по названию навыка.
+    """
+    skills = list(skills)
+    ids = {}
+    if skills_cache is not None and skills:
+        namespace = get_key_skills_namespace(schema)
+        ids = skills_cache.get_many(namespace, skills)
+    missing_skills = [skill for skill in skills if skill not in ids]
+    if missing_skills:
+        # DO UPDATE вместо DO NOTHING: RETURNING возвращает и уже существующие навыки
+        new_ids = dict(db.fetch_query(
+            f'INSERT INTO {schema}.{config.key_skills_table} (skill) SELECT unnest(%s::varchar[]) '
+            'ON CONFLICT (skill) DO UPDATE SET skill = EXCLUDED.skill RETURNING skill, id',
+            (missing_skills,),
+            ))
+        if skills_cache is not None:
+            skills_cache.put_many(namespace, new_ids)
+        ids.update(new_ids)
+    return ids
+
+def load_vacancies_key_skills(schema, vacancy_ids, vacancies_key_skills):
+    """Загрузка ключевых навыков вакансий запросами над множествами в одной транзакции:
+    тройки (vacancy_id, skill, key_skill_id) копируются (COPY) во временную staging-таблицу
+    (key_skill_id - из словаря skills_cache, для навыков не из словаря - NULL), навыки
+    не из словаря добавляются в key_skills (или находятся в ней) с возвратом их id
+    в словарь, а связи - в vacancies_key_skills; id навыков не из словаря ищутся
+    соединением в БД (без чтения key_skills и без запроса на каждую строку).
+    Загруженные ранее связи вакансий vacancy_ids заменяются.
+
+    Аргументы
+    ----------
+    schema: str
+        Название схемы БД.
+    vacancy_ids: list-like
+        Идентификаторы загружаемых вакансий, в т.ч. без ключевых навыков.
+    vacancies_key_skills: pandas.DataFrame
+        Пары vacancy_id, skill (без повторов).
+    """
+    staging_table = f'{config.vacancies_key_skills_table}_staging'
+    vacancies_key_skills = vacancies_key_skills[['vacancy_id', 'skill']]
+    with db.connection() as conn:
+        cached_ids = {}
+        if skills_cache is not None and not vacancies_key_skills.empty:
+            namespace = get_key_skills_namespace(schema, conn=conn)
+            cached_ids = skills_cache.get_many(namespace, vacancies_key_skills['skill'].unique())
+        vacancies_key_skills = vacancies_key_skills.assign(
+            key_skill_id=vacancies_key_skills['skill'].map(cached_ids).astype('Int64'),
+            )
+        db.execute_query(
+            f'CREATE TEMP TABLE {staging_table} (vacancy_id BIGINT, skill VARCHAR, key_skill_id BIGINT) '
+            'ON COMMIT DROP',
+            conn=conn,
+            )
+        db.copy_values(vacancies_key_skills, 'pg_temp', staging_table, conn=conn)
+        # DO UPDATE вместо DO NOTHING: RETURNING возвращает и уже существующие навыки
+        new_ids = dict(db.fetch_query(
+            f'INSERT INTO {schema}.{config.key_skills_table} (skill) '
+            f'SELECT DISTINCT skill FROM {staging_table} WHERE key_skill_id IS NULL ORDER BY skill '
+            'ON CONFLICT (skill) DO UPDATE SET skill = EXCLUDED.skill RETURNING skill, id',
+            conn=conn,
+            ))
+        db.execute_query(
+            f'DELETE FROM {schema}.{config.vacancies_key_skills_table} WHERE vacancy_id = ANY(%s)',
+            ([int(vacancy_id) for vacancy_id in vacancy_ids],),
+            conn=conn,
+            )
+        db.execute_query(
+            f'INSERT INTO {schema}.{config.vacancies_key_skills_table} (vacancy_id, key_skill_id) '
+            f'SELECT vacancy_id, key_skill_id FROM {staging_table} WHERE key_skill_id IS NOT NULL '
+            'UNION ALL '
+            f'SELECT staging.vacancy_id, key_skills.id FROM {staging_table} AS staging '
+            f'JOIN {schema}.{config.key_skills_table} AS key_skills USING (skill) '
+            'WHERE staging.key_skill_id IS NULL '
+            'ON CONFLICT DO NOTHING',
+            conn=conn,
+            )
+    # В словарь - только после фиксации транзакции: при откате добавленных навыков в БД нет
+    if skills_cache is not None and new_ids:
+        skills_cache.put_many(namespace, new_ids)
@@ -1,64 +1,164 @@
-import requests
 import pandas as pd
-import json
-import time
 
 import config
 import psql
-from helpers import time_decorator, create_db_schema
+import metrics
+import hh_client
+from helpers import (
+    create_db_schema, create_db_tables, run_apps, add_http_metrics, merge_addnl_info, hh_cache,
+    iter_enriched_vacancies, load_in_background, get_key_skill_ids, load_vacancies_key_skills,
+    interleave_search_pages,
+    )
 
 db = psql.PsqlConnector()
 schema = config.api_schema
+# Общий ограничитель частоты запросов к API для синхронного и асинхронного клиентов
+throttle = hh_client.AdaptiveThrottle(**config.hh_throttle_params)
+client = hh_client.HhSyncClient(
+    headers=config.headers,
+    throttle=throttle,
+    max_retries=config.hh_max_retries,
+    timeout=config.hh_request_timeout,
+    cache=hh_cache,
+    )
 
 def get_vacancies_by_page(page, params=config.url_params):
-    """Получение списка вакансий из страницы № page"""
+    """Получение страницы № page списка вакансий (ответ API: items, found, pages и др.).
+    Ответ из кэша всегда проверяется условным запросом: устаревший список пропустил бы
+    новые и переопубликованные вакансии"""
     params = params.copy()
     params['page'] = page
-    response = requests.get(
-        config.base_api_url,
-        headers=config.headers,
-        params=params,
-        )
+    with metrics.stage('get_vacancies_by_page', page=page) as record:
+        data = client.get_json(config.base_api_url, params=params, revalidate=True)
+        add_http_metrics(client.pop_stats(), throttle)
+        record['rows_out'] = len(data['items'])
     
-    if response.status_code != 200:
-        raise Exception(f'Не удалось получить список вакансий - "{response.url}"')
+    return data
+
+@metrics.timed
+def fetch_vacancies_pages(pages):
+    """Параллельное получение страниц списка вакансий
+    в рамках общего ограничения частоты запросов (см. hh_client);
+    ответы из кэша проверяются условным запросом, см. get_vacancies_by_page
     
-    data = json.loads(response.text)
-    vacancies_by_page = pd.DataFrame(data['items'])
+    Аргументы
+    ----------
+    pages: list[tuple[dict, int]]
+        Параметры поискового запроса и номер страницы.
     
-    return vacancies_by_page
-
-@time_decorator
-def get_vacancies():
-    """Получение списка вакансий"""
-    vacancies = pd.DataFrame()
-    page = 0
-    while True:
-        vacancies_by_page = get_vacancies_by_page(page)
-        if len(vacancies_by_page) > 0:
-            temp = pd.DataFrame(vacancies_by_page)
-            vacancies = pd.concat([vacancies, temp])
-            page += 1
-        else:
-            break
-            
+    Возвращается
+    ----------
+    responses: list[dict]
+        Ответы API в порядке pages.
+    """
+    responses, stats = hh_client.get_json_many(
+        [config.base_api_url] * len(pages),
+        params=[{**params, 'page': page} for params, page in pages],
+        revalidate=True,
+        headers=config.headers,
+        throttle=throttle,
+        concurrency=config.hh_concurrency,
+        max_retries=config.hh_max_retries,
+        timeout=config.hh_request_timeout,
+        cache=hh_cache,
+        )
+    metrics.add(rows_out=sum(len(data['items']) for data in responses))
+    add_http_metrics(stats, throttle)
+    return responses
+
+def get_vacancies_pages(pages):
+    """Получение страниц списка вакансий (pages - см. fetch_vacancies_pages)
+    в режиме config.hh_fetch_mode"""
+    if config.hh_fetch_mode == 'async':
+        return fetch_vacancies_pages(pages)
+    elif config.hh_fetch_mode == 'sync':
+        return [get_vacancies_by_page(page, params) for params, page in pages]
+    else:
+        raise ValueError(f'Неизвестный режим получения вакансий: "{config.hh_fetch_mode}"')
+
+def iter_vacancies(specs=None):
+    """Получение списка вакансий по поисковым запросам specs (по умолчанию config.search_specs)
+    пачками: первые страницы всех запросов запрашиваются параллельно, количество страниц -
+    из ответов на них, остальные страницы всех запросов - по очереди (см. helpers.interleave_search_pages)
+    параллельно группами по config.hh_concurrency. Следующая группа запрашивается, только когда
+    нужны следующие вакансии. Вакансия, найденная несколькими запросами, повторяется в пачках -
+    повторы отбрасываются до запроса дополнительной информации (см. helpers.iter_enriched_vacancies)"""
+    specs = config.search_specs if specs is None else specs
+    first_pages = get_vacancies_pages([(params, 0) for params in specs])
+    yield get_vacancies_frame(first_pages)
+    pages = interleave_search_pages(specs, [data['pages'] for data in first_pages])
+    for start in range(0, len(pages), config.hh_concurrency):
+        yield get_vacancies_frame(get_vacancies_pages(pages[start:start + config.hh_concurrency]))
+
+def get_vacancies_frame(responses):
+    """Вакансии из ответов API на страницы списка (записи страниц собираются в датафрейм один раз)"""
+    vacancies = pd.DataFrame(
+        [item for data in responses for item in data['items']],
+        columns=['id', 'name', 'employer', 'area', 'url', 'published_at'],
+        )
     vacancies['city'] = vacancies['area'].str['name']
     vacancies['employer'] = vacancies['employer'].str['name']
     vacancies['position'] = vacancies['name']
     
-    return vacancies[['id', 'position', 'employer', 'city', 'url']]
+    return vacancies[['id', 'position', 'employer', 'city', 'url', 'published_at']]
 
-def get_vacancy_addnl_info(vacancy_url):
-    """Получение дополнительной информации по вакансии"""
-    response = requests.get(
-        vacancy_url,
-        headers=config.headers,
+@metrics.timed
+def get_stored_vacancies():
+    """Загруженные ранее вакансии с описанием: id и дата публикации"""
+    stored = db.read_query(
+        f'SELECT id, published_at FROM {schema}.{config.vacancies_table} WHERE description IS NOT NULL'
         )
+    stored['id'] = stored['id'].astype(str)
+    metrics.add(rows_out=len(stored))
+    return stored
+
+def get_sync_specs(stored):
+    """Поисковые запросы config.search_specs: при заданном config.hh_sync_overlap - с date_from
+    по последней сохраненной дате публикации (минус hh_sync_overlap секунд)"""
+    published_at = pd.to_datetime(stored['published_at'], utc=True)
+    if config.hh_sync_overlap is None or published_at.isna().all():
+        return config.search_specs
+    date_from = published_at.max() - pd.Timedelta(seconds=config.hh_sync_overlap)
+    return [{**params, 'date_from': date_from.strftime('%Y-%m-%dT%H:%M:%S%z')} for params in config.search_specs]
+
+@metrics.timed
+def select_changed_vacancies(vacancies, stored):
+    """Отбор новых вакансий и вакансий с изменившейся датой публикации
     
-    if response.status_code != 200:
-        raise Exception(f'{response.status_code = } - Не удалось получить дополнительную информацию по вакансии "{vacancy_url}". {response.text = }')
+    Аргументы
+    ----------
+    vacancies: pandas.DataFrame
+        Найденные вакансии, см. iter_vacancies.
+    stored: pandas.DataFrame
+        Загруженные ранее вакансии, см. get_stored_vacancies.
+    """
+    metrics.add(rows_in=len(vacancies))
+    vacancies = vacancies.merge(
+        stored.rename(columns={'published_at': 'stored_published_at'}),
+        how='left',
+        on='id',
+        validate='many_to_one',
+        )
+    # У новых вакансий stored_published_at пустая (NaT), сравнение с ней дает True
+    is_changed = (
+        pd.to_datetime(vacancies['published_at'], utc=True)
+        != pd.to_datetime(vacancies['stored_published_at'], utc=True)
+        )
+    vacancies = vacancies.loc[is_changed].drop(columns=['stored_published_at'])
+    metrics.add(rows_out=len(vacancies))
+    return vacancies
+
+def get_vacancy_addnl_info(vacancy_url, revalidate=False):
+    """Получение дополнительной информации по вакансии
+    (revalidate - ответ из кэша проверяется условным запросом, см. hh_client)"""
+    with metrics.stage('get_vacancy_addnl_info', url=vacancy_url):
+        data = client.get_json(vacancy_url, revalidate=revalidate)
+        add_http_metrics(client.pop_stats(), throttle)
     
-    data = json.loads(response.text)
+    return parse_vacancy_addnl_info(data)
+
+def parse_vacancy_addnl_info(data):
+    """Описание и ключевые навыки (через '|') из ответа API по вакансии"""
     description = data['description']
 
     key_skills_dict = data.get('key_skills')
@@ -69,41 +169,75 @@ def get_vacancy_addnl_info(vacancy_url):
     
     return description, key_skills
 
-@time_decorator
-def get_vacancies_addnl_info(vacancies, cooldown_timeout=60):
+def fetch_vacancies_addnl_info(vacancy_urls, revalidate=False):
+    """Параллельное получение дополнительной информации по вакансиям
+    с ограничением количества одновременных запросов и их частоты (см. hh_client;
+    revalidate - ответы из кэша проверяются условным запросом)
+    
+    Возвращается
+    ----------
+    addnl_info: list[tuple]
+        Описание и ключевые навыки в порядке vacancy_urls.
+    """
+    responses, stats = hh_client.get_json_many(
+        list(vacancy_urls),
+        revalidate=revalidate,
+        headers=config.headers,
+        throttle=throttle,
+        concurrency=config.hh_concurrency,
+        max_retries=config.hh_max_retries,
+        timeout=config.hh_request_timeout,
+        cache=hh_cache,
+        )
+    metrics.add(rows_out=len(responses))
+    add_http_metrics(stats, throttle)
+    return [parse_vacancy_addnl_info(data) for data in responses]
+
+@metrics.timed
+def get_vacancies_addnl_info(vacancies):
     """Получение дополнительной информации по вакансиям"""
-    vacancy_addnl_info_columns = ['description', 'key_skills']
-    for i, vacancy_tuple in enumerate(vacancies.iterrows()):
-        _, vacancy = vacancy_tuple
-        
-        if i % 119 == 0 and i > 0:
-            time.sleep(cooldown_timeout)
-        current_vacancy_mask = vacancies['id'] == vacancy['id']
-        description, key_skills = get_vacancy_addnl_info(vacancy['url'])
-        vacancies.loc[current_vacancy_mask, vacancy_addnl_info_columns] = description, key_skills
+    vacancy_urls = vacancies[['id', 'url']].drop_duplicates('id')
+    # В режиме incremental сюда попадают только новые и изменившиеся вакансии (select_changed_vacancies):
+    # свежий ответ из кэша мог быть получен до изменения, поэтому он проверяется условным запросом
+    revalidate = config.hh_sync_mode == 'incremental'
+    if config.hh_fetch_mode == 'async':
+        addnl_info = fetch_vacancies_addnl_info(vacancy_urls['url'], revalidate)
+    elif config.hh_fetch_mode == 'sync':
+        addnl_info = [get_vacancy_addnl_info(vacancy_url, revalidate) for vacancy_url in vacancy_urls['url']]
+    else:
+        raise ValueError(f'Неизвестный режим получения вакансий: "{config.hh_fetch_mode}"')
+    vacancies = merge_addnl_info(vacancies, 'id', vacancy_urls['id'], addnl_info)
 
     vacancies['key_skills'] = vacancies['key_skills'].str.split('|')
     
-    return vacancies[['id', 'position', 'employer', 'city', 'description', 'key_skills']]
+    return vacancies[['id', 'position', 'employer', 'city', 'published_at', 'description', 'key_skills']]
 
-@time_decorator
+@metrics.timed
 def transform_vacancies_data(vacancies):
     """Трансформация данных по вакансиям"""
+    metrics.add(rows_in=len(vacancies))
     vacancies = vacancies.dropna()
+    # Вакансия может попасть на две страницы списка (при сдвиге выдачи), а загрузка - обновление по id
+    vacancies = vacancies.drop_duplicates('id')
     vacancies = vacancies.head(config.vacancies_limit)
+    metrics.add(rows_out=len(vacancies))
     return vacancies
 
-@time_decorator    
+@metrics.timed
 def load_vacancies(vacancies):
-    """Загрузка данных по вакансиям в базу данных"""
+    """Загрузка данных по вакансиям в базу данных
+    (загруженные ранее вакансии обновляются)"""
+    metrics.add(rows_in=len(vacancies), rows_out=len(vacancies))
+    vacancies = vacancies.drop(columns=['key_skills'])
+    update_columns = [f'{column} = EXCLUDED.{column}' for column in vacancies.columns.drop('id')]
     db.insert_values(
-        vacancies.drop(columns=['key_skills']),
+        vacancies,
         schema,
         config.vacancies_table,
-        on_conflict_clause='ON CONFLICT DO NOTHING',
+        on_conflict_clause=f'ON CONFLICT (id) DO UPDATE SET {", ".join(update_columns)}, load_dttm = CURRENT_TIMESTAMP',
         )
     
-@time_decorator
+@metrics.timed
 def refresh_key_skills(vacancies):
     """Обновление данных по ключевым скиллам в связанных таблицах"""
     vacancies_key_skills = vacancies.explode(['key_skills'])[['id', 'key_skills']]
@@ -111,15 +245,24 @@ def refresh_key_skills(vacancies):
     vacancies_key_skills = vacancies_key_skills.dropna()
     vacancies_key_skills['skill'] = vacancies_key_skills['skill'].str.lower()
     vacancies_key_skills = vacancies_key_skills.drop_duplicates()
-    db.insert_values(
-        vacancies_key_skills[['skill']],
-        schema,
-        config.key_skills_table,
-        on_conflict_clause='ON CONFLICT (skill) DO NOTHING',
-        )
-    key_skills = db.read_query(f'SELECT id AS key_skill_id, skill FROM {schema}.{config.key_skills_table}')
-    vacancies_key_skills = vacancies_key_skills.merge(key_skills, how='left', on='skill')
+    metrics.add(rows_in=len(vacancies), rows_out=len(vacancies_key_skills))
+    if config.key_skills_load_method == 'copy':
+        load_vacancies_key_skills(schema, vacancies['id'], vacancies_key_skills)
+    elif config.key_skills_load_method == 'values':
+        insert_vacancies_key_skills(vacancies, vacancies_key_skills)
+    else:
+        raise ValueError(f'Неизвестный способ загрузки ключевых навыков: "{config.key_skills_load_method}"')
+
+def insert_vacancies_key_skills(vacancies, vacancies_key_skills):
+    """Загрузка ключевых навыков вакансий с id навыков из словаря (см. helpers.get_key_skill_ids)"""
+    key_skill_ids = get_key_skill_ids(schema, vacancies_key_skills['skill'].unique())
+    vacancies_key_skills['key_skill_id'] = vacancies_key_skills['skill'].map(key_skill_ids)
     vacancies_key_skills = vacancies_key_skills[['vacancy_id', 'key_skill_id']]
+    # Ключевые навыки обновленных вакансий заменяются полностью
+    db.execute_query(
+        f'DELETE FROM {schema}.{config.vacancies_key_skills_table} WHERE vacancy_id = ANY(%s)',
+        (vacancies['id'].astype('int64').tolist(),),
+        )
     db.insert_values(
         vacancies_key_skills,
         schema,
@@ -127,15 +270,26 @@ def refresh_key_skills(vacancies):
         on_conflict_clause='ON CONFLICT DO NOTHING',
         )
     
-@time_decorator
+def enrich_vacancies(vacancies):
+    """Дополнительная информация и трансформация порции вакансий"""
+    return transform_vacancies_data(get_vacancies_addnl_info(vacancies))
+
+@metrics.timed
 def app():
-    """Запуск скрипта hh_api_parsing.py"""
-    create_db_schema(schema)
-    vacancies = get_vacancies()
-    vacancies = get_vacancies_addnl_info(vacancies)
-    vacancies = transform_vacancies_data(vacancies)
-    load_vacancies(vacancies)
-    refresh_key_skills(vacancies)
+    """Запуск скрипта hh_api_parsing.py: список вакансий, дополнительная информация
+    и загрузка обрабатываются пачками, запросы прекращаются после config.vacancies_limit
+    вакансий, годных к загрузке (см. helpers.iter_enriched_vacancies)"""
+    if config.hh_sync_mode == 'full':
+        create_db_schema(schema)
+        vacancies = iter_vacancies()
+    elif config.hh_sync_mode == 'incremental':
+        create_db_tables(schema)
+        stored = get_stored_vacancies()
+        vacancies = (select_changed_vacancies(batch, stored) for batch in iter_vacancies(get_sync_specs(stored)))
+    else:
+        raise ValueError(f'Неизвестный режим синхронизации вакансий: "{config.hh_sync_mode}"')
+    vacancies = iter_enriched_vacancies(vacancies, enrich_vacancies, 'id')
+    load_in_background(vacancies, load_vacancies, refresh_key_skills)
     
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    run_apps(hh_api_parsing=app)
\ No newline at end of file
@@ -0,0 +1,438 @@
+"""Клиенты HeadHunter с адаптивным ограничением частоты запросов.
+
+AdaptiveThrottle - ограничитель частоты (token bucket), подстраивающийся
+под квоту API: на ответы 429/503 частота уменьшается вдвое, а при
+заголовке Retry-After запросы всех клиентов ограничителя приостанавливаются
+на указанное время; пока ответы успешные, частота постепенно увеличивается
+до max_rate. Ответы 5xx и сетевые ошибки повторяются с экспоненциальной
+паузой со случайным разбросом (jitter).
+
+HhClient - асинхронный клиент: общая keep-alive сессия aiohttp и
+ограничение количества одновременных запросов. Синхронный код вызывает
+get_many / get_json_many, которые запускают цикл событий и возвращают
+ответы в порядке url.
+
+HhSyncClient - синхронный клиент на requests.Session с тем же ограничителем.
+
+Оба клиента могут использовать постоянный кэш ответов (параметр cache,
+см. http_cache.HttpCache): свежие ответы отдаются без запроса, устаревшие
+проверяются условным запросом (ответ 304 - тело берется из кэша).
+С revalidate=True условным запросом проверяются и свежие ответы - для
+ресурсов, о которых известно, что они могли измениться.
+"""
+import json
+import time
+import random
+import asyncio
+import datetime
+import email.utils
+
+import aiohttp
+import requests
+
+# Ответы, после которых запрос повторяется
+retry_statuses = {429, 500, 502, 503, 504}
+# Ответы "превышена квота": уменьшение частоты запросов
+throttle_statuses = {429, 503}
+
+class HhApiError(Exception):
+    """Неуспешный ответ HeadHunter (в т.ч. после всех повторов)."""
+    def __init__(self, message, status=None, url=None):
+        super().__init__(message)
+        self.status = status
+        self.url = url
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After (секунды или HTTP-дата) в секундах, None - нет или не разобрано."""
+    if not value:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0., (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Ограничитель частоты запросов: в "ведре" копятся токены со скоростью
+    rate в секунду, но не больше capacity; каждый запрос забирает токен
+    или ждет его появления. Ожидающие запросы резервируют токены по очереди
+    ("в долг"), поэтому ограничитель не использует примитивы asyncio
+    и подходит и для синхронного, и для асинхронного кода.
+
+    Аргументы
+    ----------
+    rate: float
+        Средняя частота запросов, запросов/с.
+    capacity: float, default: None
+        Количество запросов, которые можно выполнить подряд без ожидания,
+        по умолчанию max(1, rate).
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + max(0., now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def set_rate(self, rate):
+        """Смена частоты: накопленные по старой частоте токены сохраняются."""
+        self._refill()
+        self.rate = rate
+
+    def pause(self, seconds):
+        """Приостановка выдачи токенов на seconds секунд (токены за паузу не копятся)."""
+        self._refill()
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.)
+        self.updated = max(self.updated, self.paused_until)
+
+    def reserve(self):
+        """Резервирование токена, возвращается время ожидания до его появления, с.
+        Во время паузы токены копятся только с ее окончания (updated - в будущем)."""
+        now = time.monotonic()
+        self._refill()
+        self.tokens -= 1
+        return max(0., self.updated - now) + max(0., -self.tokens / self.rate)
+
+    def is_paused(self):
+        return self.paused_until > time.monotonic()
+
+    def acquire_sync(self):
+        # Если пауза началась, пока запрос ждал своего токена, токен резервируется заново
+        time.sleep(self.reserve())
+        while self.is_paused():
+            time.sleep(self.reserve())
+
+    async def acquire(self):
+        await asyncio.sleep(self.reserve())
+        while self.is_paused():
+            await asyncio.sleep(self.reserve())
+
+class AdaptiveThrottle(TokenBucket):
+    """Ограничитель частоты запросов, подстраивающийся под ответы API
+    (аддитивное увеличение, мультипликативное уменьшение).
+
+    Аргументы
+    ----------
+    rate: float
+        Начальная частота запросов, запросов/с.
+    burst: float, default: None
+        Количество запросов подряд без ожидания, см. TokenBucket.
+    min_rate: float, default: None
+        Минимальная частота, по умолчанию rate / 10.
+    max_rate: float, default: None
+        Максимальная частота, по умолчанию rate (без увеличения).
+    increase_step: float, default: None
+        Шаг увеличения частоты, по умолчанию 10% от rate.
+    increase_after: int, default: 20
+        Количество успешных ответов подряд, после которого частота увеличивается.
+    decrease_factor: float, default: 0.5
+        Множитель частоты при ответе 429/503.
+    backoff_base: float, default: 1
+        Пауза перед первым повтором, с; каждый следующий повтор - вдвое дольше.
+    backoff_max: float, default: 60
+        Максимальная пауза перед повтором, с.
+    """
+    def __init__(
+            self, rate, burst=None, min_rate=None, max_rate=None, increase_step=None,
+            increase_after=20, decrease_factor=0.5, backoff_base=1, backoff_max=60,
+            ):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate or rate / 10
+        self.max_rate = max(rate, max_rate or rate)
+        self.increase_step = increase_step or rate / 10
+        self.increase_after = increase_after
+        self.decrease_factor = decrease_factor
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.successes = 0
+
+    def on_success(self):
+        self.successes += 1
+        if self.successes >= self.increase_after and self.rate < self.max_rate:
+            self.set_rate(min(self.max_rate, self.rate + self.increase_step))
+            self.successes = 0
+
+    def get_backoff(self, attempt):
+        """Экспоненциальная пауза перед повтором № attempt (с 0) с полным случайным разбросом."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def on_failure(self, status, retry_after, attempt):
+        """Учет неуспешного ответа (status None - сетевая ошибка).
+
+        Возвращается
+        ----------
+        delay: float
+            Пауза этого запроса перед повтором, с. При 429/503 пауза
+            применяется ко всему ограничителю, и запрос ждет ее в reserve.
+        """
+        self.successes = 0
+        if status in throttle_statuses:
+            # Одновременные запросы получают 429 пачкой: частота уменьшается один раз на паузу
+            if not self.is_paused():
+                self.set_rate(max(self.min_rate, self.rate * self.decrease_factor))
+            if retry_after is None:
+                retry_after = self.get_backoff(attempt)
+            self.pause(retry_after + random.uniform(0, self.backoff_base))
+            return 0.
+        return self.get_backoff(attempt)
+
+class _HhClientBase:
+    """Общая часть клиентов: счетчики, кэш и обработка неуспешных ответов."""
+    stats_names = [
+        'http_requests', 'http_retries', 'http_throttled', 'http_cache_hits', 'http_not_modified', 'bytes_read',
+        ]
+
+    def __init__(self, headers=None, throttle=None, max_retries=5, timeout=30, cache=None):
+        self.headers = headers
+        self.throttle = throttle or AdaptiveThrottle(5)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache = cache
+        self.stats = {}
+        self.pop_stats()
+
+    def pop_stats(self):
+        """Счетчики с последнего вызова (названия - как счетчики metrics.py):
+        http_requests, http_retries, http_throttled, http_cache_hits, http_not_modified, bytes_read."""
+        stats = self.stats
+        self.stats = dict.fromkeys(self.stats_names, 0)
+        return stats
+
+    def _lookup_cache(self, url, params, revalidate=False):
+        """Поиск ответа в кэше (revalidate - свежая запись тоже проверяется условным запросом).
+
+        Возвращается
+        ----------
+        entry, request_headers: tuple
+            Запись кэша (None - нет) и заголовки условного запроса;
+            request_headers None - запись свежая, запрос не нужен.
+        """
+        if self.cache is None:
+            return None, {}
+        entry = self.cache.get(url, params)
+        if entry is None:
+            return None, {}
+        if self.cache.is_fresh(entry) and not revalidate:
+            self.stats['http_cache_hits'] += 1
+            return entry, None
+        return entry, self.cache.get_conditional_headers(entry)
+
+    def _store_cache(self, url, params, entry, status, body, response_headers):
+        """Сохранение успешного ответа в кэш, возвращается тело ответа (при 304 - из кэша)."""
+        if status == 304:
+            self.stats['http_not_modified'] += 1
+            self.cache.refresh(entry, response_headers)
+            return entry.body
+        if self.cache is not None:
+            self.cache.put(url, params, body, response_headers)
+        return body
+
+    def _on_response(self, url, status, body, retry_after, attempt):
+        """Учет ответа (status None - сетевая ошибка, body - ее описание).
+
+        Возвращается
+        ----------
+        delay: float | None
+            Пауза перед повтором, с; None - ответ успешный.
+        """
+        self.stats['http_requests'] += 1
+        if status in (200, 304):
+            self.stats['bytes_read'] += len(body)
+            self.throttle.on_success()
+            return None
+        if status in throttle_statuses:
+            self.stats['http_throttled'] += 1
+        if status is not None and status not in retry_statuses or attempt >= self.max_retries:
+            if isinstance(body, bytes):
+                body = body[:1000].decode('utf-8', 'replace')
+            raise HhApiError(
+                f'status = {status} - Не удалось получить данные "{url}" '
+                f'(попыток: {attempt + 1}). response = {body}',
+                status=status, url=url,
+                )
+        self.stats['http_retries'] += 1
+        return self.throttle.on_failure(status, retry_after, attempt)
+
+class HhClient(_HhClientBase):
+    """Асинхронный клиент API: используется как async with HhClient(...) as client.
+
+    Аргументы
+    ----------
+    headers: dict, default: None
+        Заголовки всех запросов сессии.
+    throttle: AdaptiveThrottle, default: None
+        Ограничитель частоты запросов, по умолчанию - 5 запросов/с без адаптации.
+        Один ограничитель можно передать нескольким клиентам.
+    concurrency: int, default: 8
+        Максимальное количество одновременных запросов.
+    max_retries: int, default: 5
+        Максимальное количество повторов запроса.
+    timeout: float, default: 30
+        Таймаут запроса, с.
+    cache: http_cache.HttpCache, default: None
+        Постоянный кэш ответов.
+    """
+    def __init__(self, headers=None, throttle=None, concurrency=8, max_retries=5, timeout=30, cache=None):
+        super().__init__(headers, throttle, max_retries, timeout, cache)
+        self.concurrency = concurrency
+        self.session = None
+
+    async def __aenter__(self):
+        # Примитивы asyncio создаются внутри запущенного цикла событий
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            )
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+
+    async def get(self, url, params=None, revalidate=False):
+        """GET-запрос с повторами, возвращается тело успешного ответа (bytes).
+
+        Аргументы
+        ----------
+        url: str
+            Адрес запроса.
+        params: dict, default: None
+            Параметры запроса.
+        revalidate: bool, default: False
+            Ответ из кэша, даже свежий, проверяется условным запросом.
+        """
+        entry, request_headers = self._lookup_cache(url, params, revalidate)
+        if request_headers is None:
+            return entry.body
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self.throttle.acquire()
+                try:
+                    async with self.session.get(url, params=params, headers=request_headers) as response:
+                        body = await response.read()
+                        status = response.status
+                        response_headers = response.headers
+                        retry_after = parse_retry_after(response_headers.get('Retry-After'))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    status, body, retry_after = None, repr(error), None
+            delay = self._on_response(url, status, body, retry_after, attempt)
+            if delay is None:
+                return self._store_cache(url, params, entry, status, body, response_headers)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_json(self, url, params=None, revalidate=False):
+        """GET-запрос с повторами и разбором JSON-ответа."""
+        return json.loads(await self.get(url, params=params, revalidate=revalidate))
+
+    async def get_many(self, urls, params=None, revalidate=False):
+        """Параллельные запросы по списку адресов (params - список параметров
+        запросов той же длины, revalidate - см. get), ответы - в порядке urls."""
+        params = params or [None] * len(urls)
+        return await asyncio.gather(*(
+            self.get(url, params=p, revalidate=revalidate) for url, p in zip(urls, params)
+            ))
+
+    async def get_json_many(self, urls, params=None, revalidate=False):
+        """Параллельные запросы с разбором JSON-ответов, см. get_many."""
+        return [json.loads(body) for body in await self.get_many(urls, params=params, revalidate=revalidate)]
+
+class HhSyncClient(_HhClientBase):
+    """Синхронный клиент: keep-alive сессия requests с тем же ограничителем
+    частоты и повторами, что у HhClient.
+
+    Аргументы
+    ----------
+    headers: dict, default: None
+        Заголовки всех запросов сессии.
+    throttle: AdaptiveThrottle, default: None
+        Ограничитель частоты запросов, см. HhClient.
+    max_retries: int, default: 5
+        Максимальное количество повторов запроса.
+    timeout: float, default: 30
+        Таймаут запроса, с.
+    cache: http_cache.HttpCache, default: None
+        Постоянный кэш ответов.
+    """
+    def __init__(self, headers=None, throttle=None, max_retries=5, timeout=30, cache=None):
+        super().__init__(headers, throttle, max_retries, timeout, cache)
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, params=None, revalidate=False):
+        """GET-запрос с повторами, возвращается тело успешного ответа (bytes).
+
+        Аргументы
+        ----------
+        url: str
+            Адрес запроса.
+        params: dict, default: None
+            Параметры запроса.
+        revalidate: bool, default: False
+            Ответ из кэша, даже свежий, проверяется условным запросом.
+        """
+        entry, request_headers = self._lookup_cache(url, params, revalidate)
+        if request_headers is None:
+            return entry.body
+        attempt = 0
+        while True:
+            self.throttle.acquire_sync()
+            try:
+                response = self.session.get(url, params=params, headers=request_headers, timeout=self.timeout)
+                status, body = response.status_code, response.content
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            except requests.RequestException as error:
+                status, body, retry_after = None, repr(error), None
+            delay = self._on_response(url, status, body, retry_after, attempt)
+            if delay is None:
+                return self._store_cache(url, params, entry, status, body, response.headers)
+            time.sleep(delay)
+            attempt += 1
+
+    def get_json(self, url, params=None, revalidate=False):
+        """GET-запрос с повторами и разбором JSON-ответа."""
+        return json.loads(self.get(url, params=params, revalidate=revalidate))
+
+def get_many(urls, params=None, revalidate=False, **client_kwargs):
+    """Синхронная обертка: получение ответов (bytes) по списку адресов.
+
+    Аргументы
+    ----------
+    urls: list[str]
+        Адреса запросов.
+    params: list[dict], default: None
+        Параметры запросов в порядке urls.
+    revalidate: bool, default: False
+        Ответы из кэша, даже свежие, проверяются условным запросом, см. HhClient.get.
+    client_kwargs: dict
+        Параметры HhClient.
+
+    Возвращается
+    ----------
+    responses, stats: tuple[list, dict]
+        Ответы в порядке urls и счетчики клиента, см. HhClient.pop_stats.
+    """
+    async def run():
+        async with HhClient(**client_kwargs) as client:
+            return await client.get_many(urls, params=params, revalidate=revalidate), client.pop_stats()
+    return asyncio.run(run())
+
+def get_json_many(urls, params=None, revalidate=False, **client_kwargs):
+    """Синхронная обертка: получение JSON-ответов по списку адресов, см. get_many."""
+    responses, stats = get_many(urls, params=params, revalidate=revalidate, **client_kwargs)
+    return [json.loads(body) for body in responses], stats
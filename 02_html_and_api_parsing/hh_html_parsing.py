@@ -1,51 +1,119 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import json
-import time
+import math
 
 import config
 import psql
-from helpers import time_decorator, create_db_schema
+import metrics
+import hh_client
+import html_extract
+from helpers import (
+    create_db_schema, run_apps, add_http_metrics, merge_addnl_info, hh_cache,
+    iter_enriched_vacancies, load_in_background, get_key_skill_ids, load_vacancies_key_skills,
+    interleave_search_pages,
+    )
 
 db = psql.PsqlConnector()
 schema = config.html_schema
+# Сайт и API - разные квоты, поэтому у скрипта свой ограничитель частоты запросов
+throttle = hh_client.AdaptiveThrottle(**config.hh_throttle_params)
+client = hh_client.HhSyncClient(
+    headers=config.headers,
+    throttle=throttle,
+    max_retries=config.hh_max_retries,
+    timeout=config.hh_request_timeout,
+    cache=hh_cache,
+    )
+
+# Виды страниц, о разборе которых BeautifulSoup уже сообщалось
+warned_fallbacks = set()
+
+def warn_fallback(page_kind):
+    """Сообщение (один раз на вид страницы) о разборе страниц BeautifulSoup"""
+    if page_kind not in warned_fallbacks:
+        warned_fallbacks.add(page_kind)
+        print(f'Разметка страницы ({page_kind}) не распознана быстрым разбором, используется BeautifulSoup')
+
+def parse_vacancies_page(html):
+    """Результаты поиска (vacancySearchResult: vacancies, totalResults, paging и др.)
+    из HTML-страницы списка вакансий"""
+    if config.html_parser_engine == 'fast':
+        data = html_extract.extract_initial_state(html)
+        if data is not None and 'vacancySearchResult' in data:
+            return data['vacancySearchResult']
+        warn_fallback('список вакансий')
+    soup = BeautifulSoup(html, 'html.parser')
+    search = soup.find('template', {'id': 'HH-Lux-InitialState'})
+    data = json.loads(search.text)
+    return data['vacancySearchResult']
+
+def get_pages_count(search_result):
+    """Количество страниц поиска: по номеру последней страницы в пагинации,
+    иначе по общему количеству вакансий и размеру первой страницы"""
+    last_page = ((search_result.get('paging') or {}).get('lastPage') or {}).get('page')
+    if last_page is not None:
+        return last_page + 1
+    page_size = len(search_result['vacancies'])
+    if not page_size:
+        return 1
+    return math.ceil(search_result.get('totalResults', page_size) / page_size)
 
 def get_vacancies_by_page(page, params=config.url_params):
-    """Получение списка вакансий из страницы № page"""
+    """Получение результатов поиска со страницы № page списка вакансий.
+    Ответ из кэша всегда проверяется условным запросом: устаревший список пропустил бы
+    новые и переопубликованные вакансии"""
     params = params.copy()
     params['page'] = page
-    response = requests.get(
-        config.base_url,
+    with metrics.stage('get_vacancies_by_page', page=page) as record:
+        html = client.get(config.base_url, params=params, revalidate=True)
+        add_http_metrics(client.pop_stats(), throttle)
+        search_result = parse_vacancies_page(html)
+        record['rows_out'] = len(search_result['vacancies'])
+    
+    return search_result
+
+@metrics.timed
+def fetch_vacancies_pages(pages):
+    """Параллельное получение результатов поиска со страниц pages (параметры поискового
+    запроса и номер страницы) в рамках общего ограничения частоты запросов (см. hh_client);
+    ответы из кэша проверяются условным запросом, см. get_vacancies_by_page"""
+    responses, stats = hh_client.get_many(
+        [config.base_url] * len(pages),
+        params=[{**params, 'page': page} for params, page in pages],
+        revalidate=True,
         headers=config.headers,
-        params=params,
+        throttle=throttle,
+        concurrency=config.hh_concurrency,
+        max_retries=config.hh_max_retries,
+        timeout=config.hh_request_timeout,
+        cache=hh_cache,
+        )
+    add_http_metrics(stats, throttle)
+    search_results = [parse_vacancies_page(html) for html in responses]
+    metrics.add(rows_out=sum(len(search_result['vacancies']) for search_result in search_results))
+    return search_results
+
+def iter_vacancies(specs=None):
+    """Получение списка вакансий по поисковым запросам specs (по умолчанию config.search_specs)
+    пачками: первые страницы всех запросов запрашиваются параллельно, количество страниц - из них,
+    остальные страницы всех запросов - по очереди (см. helpers.interleave_search_pages)
+    параллельно группами по config.hh_concurrency. Следующая группа запрашивается, только когда
+    нужны следующие вакансии. Вакансия, найденная несколькими запросами, повторяется в пачках -
+    повторы отбрасываются до запроса дополнительной информации (см. helpers.iter_enriched_vacancies)"""
+    specs = config.search_specs if specs is None else specs
+    first_pages = fetch_vacancies_pages([(params, 0) for params in specs])
+    yield get_vacancies_frame(first_pages)
+    pages = interleave_search_pages(specs, [get_pages_count(search_result) for search_result in first_pages])
+    for start in range(0, len(pages), config.hh_concurrency):
+        yield get_vacancies_frame(fetch_vacancies_pages(pages[start:start + config.hh_concurrency]))
+
+def get_vacancies_frame(search_results):
+    """Вакансии из результатов поиска (записи страниц собираются в датафрейм один раз)"""
+    vacancies = pd.DataFrame(
+        [vacancy for search_result in search_results for vacancy in search_result['vacancies']],
+        columns=['vacancyId', 'name', 'company', 'area', 'links'],
         )
-    
-    if response.status_code != 200:
-        raise Exception(f'Не удалось получить список вакансий - "{response.url}"')
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-    search = soup.find('template', {'id': 'HH-Lux-InitialState'})
-    data = json.loads(search.text)
-    vacancies_by_page = data['vacancySearchResult']['vacancies']
-    
-    return vacancies_by_page
-
-@time_decorator
-def get_vacancies(page_timeout=1):
-    """Получение списка вакансий"""
-    vacancies = pd.DataFrame()
-    page = 0
-    while True:
-        vacancies_by_page = get_vacancies_by_page(page)
-        if len(vacancies_by_page) > 0:
-            temp = pd.DataFrame(vacancies_by_page)
-            vacancies = pd.concat([vacancies, temp])
-            page += 1
-            time.sleep(page_timeout)
-        else:
-            break
-    
     vacancies['employer'] = vacancies['company'].str['name']
     vacancies['city'] = vacancies['area'].str['name']
     vacancies['vacancy_url'] = vacancies['links'].str['desktop']
@@ -54,15 +122,20 @@ def get_vacancies(page_timeout=1):
 
 def get_vacancy_addnl_info(vacancy_url):
     """Получение дополнительной информации по вакансии"""
-    response = requests.get(
-        vacancy_url,
-        headers=config.headers,
-        )
-    
-    if response.status_code != 200:
-        raise Exception(f'Не удалось получить дополнительную информацию по вакансии "{vacancy_url}"')
+    with metrics.stage('get_vacancy_addnl_info', url=vacancy_url):
+        html = client.get(vacancy_url)
+        add_http_metrics(client.pop_stats(), throttle)
     
-    soup = BeautifulSoup(response.text, 'html.parser')
+    return parse_vacancy_addnl_info(html)
+
+def parse_vacancy_addnl_info(html):
+    """Описание и ключевые навыки (через '|') со страницы вакансии"""
+    if config.html_parser_engine == 'fast':
+        addnl_info = html_extract.extract_vacancy_addnl_info(html)
+        if addnl_info is not None:
+            return addnl_info
+        warn_fallback('вакансия')
+    soup = BeautifulSoup(html, 'html.parser')
     description = soup.find('div', {'data-qa': 'vacancy-description'}).text
     key_skills_block_soup = soup.find('div', {'class': 'bloko-tag-list'})
     if key_skills_block_soup:
@@ -73,31 +146,32 @@ def get_vacancy_addnl_info(vacancy_url):
     
     return description, key_skills
 
-@time_decorator
-def get_vacancies_addnl_info(vacancies, vacancy_timeout=0.5):
-    """Получение дополнительной информации по вакансиям"""
-    vacancy_addnl_info_columns = ['description', 'key_skills']
-    for _, vacancy in vacancies.iterrows():
-        current_vacancy_mask = vacancies['vacancyId'] == vacancy['vacancyId']
-        description, key_skills = get_vacancy_addnl_info(vacancy['vacancy_url'])
-        vacancies.loc[current_vacancy_mask, vacancy_addnl_info_columns] = description, key_skills
-        time.sleep(vacancy_timeout)
+@metrics.timed
+def get_vacancies_addnl_info(vacancies):
+    """Получение дополнительной информации по вакансиям
+    (паузы между запросами выдерживает ограничитель частоты клиента)"""
+    vacancy_urls = vacancies[['vacancyId', 'vacancy_url']].drop_duplicates('vacancyId')
+    addnl_info = [get_vacancy_addnl_info(vacancy_url) for vacancy_url in vacancy_urls['vacancy_url']]
+    vacancies = merge_addnl_info(vacancies, 'vacancyId', vacancy_urls['vacancyId'], addnl_info)
     
     vacancies['key_skills'] = vacancies['key_skills'].str.split('|')
     
     return vacancies[['vacancyId', 'name', 'employer', 'city', 'description', 'key_skills']]
 
-@time_decorator
+@metrics.timed
 def transform_vacancies_data(vacancies):
     """Трансформация данных по вакансиям"""
+    metrics.add(rows_in=len(vacancies))
     vacancies = vacancies.dropna()
     vacancies = vacancies.head(config.vacancies_limit)
+    metrics.add(rows_out=len(vacancies))
     vacancies = vacancies.rename(columns={'vacancyId': 'id', 'name': 'position'})
     return vacancies
 
-@time_decorator    
+@metrics.timed
 def load_vacancies(vacancies):
     """Загрузка данных по вакансиям в базу данных"""
+    metrics.add(rows_in=len(vacancies), rows_out=len(vacancies))
     db.insert_values(
         vacancies.drop(columns=['key_skills']),
         schema,
@@ -105,7 +179,7 @@ def load_vacancies(vacancies):
         on_conflict_clause='ON CONFLICT DO NOTHING',
         )
 
-@time_decorator
+@metrics.timed
 def refresh_key_skills(vacancies):
     """Обновление данных по ключевым скиллам в связанных таблицах"""
     vacancies_key_skills = vacancies.explode(['key_skills'])[['id', 'key_skills']]
@@ -113,14 +187,18 @@ def refresh_key_skills(vacancies):
     vacancies_key_skills = vacancies_key_skills.dropna()
     vacancies_key_skills['skill'] = vacancies_key_skills['skill'].str.lower()
     vacancies_key_skills = vacancies_key_skills.drop_duplicates()
-    db.insert_values(
-        vacancies_key_skills[['skill']],
-        schema,
-        config.key_skills_table,
-        on_conflict_clause='ON CONFLICT (skill) DO NOTHING',
-        )
-    key_skills = db.read_query(f'SELECT id AS key_skill_id, skill FROM {schema}.{config.key_skills_table}')
-    vacancies_key_skills = vacancies_key_skills.merge(key_skills, how='left', on='skill')
+    metrics.add(rows_in=len(vacancies), rows_out=len(vacancies_key_skills))
+    if config.key_skills_load_method == 'copy':
+        load_vacancies_key_skills(schema, vacancies['id'], vacancies_key_skills)
+    elif config.key_skills_load_method == 'values':
+        insert_vacancies_key_skills(vacancies, vacancies_key_skills)
+    else:
+        raise ValueError(f'Неизвестный способ загрузки ключевых навыков: "{config.key_skills_load_method}"')
+
+def insert_vacancies_key_skills(vacancies, vacancies_key_skills):
+    """Загрузка ключевых навыков вакансий с id навыков из словаря (см. helpers.get_key_skill_ids)"""
+    key_skill_ids = get_key_skill_ids(schema, vacancies_key_skills['skill'].unique())
+    vacancies_key_skills['key_skill_id'] = vacancies_key_skills['skill'].map(key_skill_ids)
     vacancies_key_skills = vacancies_key_skills[['vacancy_id', 'key_skill_id']].astype('Int64')
     db.insert_values(
         vacancies_key_skills,
@@ -129,15 +207,18 @@ def refresh_key_skills(vacancies):
         on_conflict_clause='ON CONFLICT DO NOTHING',
         )
 
-@time_decorator
+def enrich_vacancies(vacancies):
+    """Дополнительная информация и трансформация порции вакансий"""
+    return transform_vacancies_data(get_vacancies_addnl_info(vacancies))
+
+@metrics.timed
 def app():
-    """Запуск скрипта hh_html_parsing.py"""
+    """Запуск скрипта hh_html_parsing.py: список вакансий, дополнительная информация
+    и загрузка обрабатываются пачками, запросы прекращаются после config.vacancies_limit
+    вакансий, годных к загрузке (см. helpers.iter_enriched_vacancies)"""
     create_db_schema(schema)
-    vacancies = get_vacancies()
-    vacancies = get_vacancies_addnl_info(vacancies)
-    vacancies = transform_vacancies_data(vacancies)
-    load_vacancies(vacancies)
-    refresh_key_skills(vacancies)
+    vacancies = iter_enriched_vacancies(iter_vacancies(), enrich_vacancies, 'vacancyId')
+    load_in_background(vacancies, load_vacancies, refresh_key_skills)
     
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    run_apps(hh_html_parsing=app)
\ No newline at end of file
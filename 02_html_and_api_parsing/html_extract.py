@@ -0,0 +1,150 @@
+"""Быстрое извлечение данных со страниц hh.ru без построения дерева BeautifulSoup.
+
+Нужные блоки находятся регулярными выражениями по разметке, вложенность
+div отслеживается по открывающим и закрывающим тегам, текст блока - это
+его содержимое без тегов с раскодированными HTML-сущностями (как .text
+в BeautifulSoup). Если разметка не соответствует ожидаемой (блок не найден
+или находится внутри script/комментария, внутри блока есть script, style,
+комментарии и т.п.), функции возвращают None, и страница разбирается
+BeautifulSoup (см. hh_html_parsing.py).
+"""
+import re
+import json
+import html as html_lib
+
+initial_state_pattern = re.compile(r'<template\b[^>]*\sid=(["\'])HH-Lux-InitialState\1[^>]*>', re.I)
+template_end_pattern = re.compile(r'</template\s*>', re.I)
+description_pattern = re.compile(r'<div\b[^>]*\sdata-qa=(["\'])vacancy-description\1[^>]*>', re.I)
+skills_block_pattern = re.compile(
+    r'<div\b[^>]*\sclass=(["\'])(?:[^"\'>]*\s)?bloko-tag-list(?:\s[^"\'>]*)?\1[^>]*>', re.I)
+skill_attribute_pattern = re.compile(r'\sdata-qa=(["\'])bloko-tag bloko-tag_inline skills-element\1')
+div_tag_pattern = re.compile(r'<(/?)div\b[^>]*>', re.I)
+tag_pattern = re.compile(r'</?[a-zA-Z][^>]*>')
+# Содержимое, которое html.parser разбирает не как обычную разметку
+unsupported_pattern = re.compile(r'<(?:!|\?|script\b|style\b|textarea\b|title\b|template\b)', re.I)
+# Пары "начало - конец" областей, внутри которых теги не разбираются
+raw_regions = [('<!--', '-->'), ('<script', '</script'), ('<style', '</style')]
+
+def _decode(html):
+    if isinstance(html, str):
+        return html
+    try:
+        return html.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+def _is_in_raw_region(text, pos):
+    """Находится ли позиция внутри комментария, script или style."""
+    head = text[:pos].lower()
+    return any(head.rfind(start) > head.rfind(end) for start, end in raw_regions)
+
+def _find_div_content(text, start_match):
+    """Границы содержимого div, открывающий тег которого - start_match, или None."""
+    depth = 1
+    for match in div_tag_pattern.finditer(text, start_match.end()):
+        if match.group(0).endswith('/>'):
+            return None
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return start_match.end(), match.start()
+    return None
+
+def _get_text(fragment):
+    """Текст фрагмента разметки или None, если во фрагменте есть неподдерживаемые конструкции."""
+    if unsupported_pattern.search(fragment):
+        return None
+    text = tag_pattern.sub('', fragment)
+    return html_lib.unescape(text) if '&' in text else text
+
+def extract_initial_state(html):
+    """JSON из <template id="HH-Lux-InitialState"> (словарь) или None.
+
+    Аргументы
+    ----------
+    html: bytes | str
+        HTML-страница (bytes - в UTF-8).
+    """
+    text = _decode(html)
+    if text is None:
+        return None
+    start = initial_state_pattern.search(text)
+    if start is None or _is_in_raw_region(text, start.start()):
+        return None
+    end = template_end_pattern.search(text, start.end())
+    if end is None:
+        return None
+    content = text[start.end():end.start()]
+    if '<' in content:
+        return None
+    try:
+        return json.loads(html_lib.unescape(content) if '&' in content else content)
+    except ValueError:
+        return None
+
+def extract_key_skills(text):
+    """Ключевые навыки через '|' из первого блока bloko-tag-list.
+
+    Возвращается
+    ----------
+    found, key_skills: tuple[bool, str | None]
+        found False - разметка блока не разобрана; key_skills None - блока нет.
+    """
+    start = skills_block_pattern.search(text)
+    if start is None:
+        return True, None
+    if _is_in_raw_region(text, start.start()):
+        return False, None
+    block = _find_div_content(text, start)
+    if block is None:
+        return False, None
+    # Навыки - div с нужным data-qa среди прямых потомков блока,
+    # других элементов между прямыми потомками-div быть не должно
+    skills = []
+    depth, position, child_start = 0, block[0], None
+    for match in div_tag_pattern.finditer(text, block[0], block[1]):
+        if match.group(0).endswith('/>'):
+            return False, None
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                if child_start is not None:
+                    skill = _get_text(text[child_start:match.start()])
+                    if skill is None:
+                        return False, None
+                    skills.append(skill)
+                position, child_start = match.end(), None
+        else:
+            if depth == 0:
+                if text[position:match.start()].strip():
+                    return False, None
+                if skill_attribute_pattern.search(match.group(0)):
+                    child_start = match.end()
+            depth += 1
+    if depth != 0 or text[position:block[1]].strip():
+        return False, None
+    return True, '|'.join(skills)
+
+def extract_vacancy_addnl_info(html):
+    """Описание и ключевые навыки (через '|') со страницы вакансии или None.
+
+    Аргументы
+    ----------
+    html: bytes | str
+        HTML-страница (bytes - в UTF-8).
+    """
+    text = _decode(html)
+    if text is None:
+        return None
+    start = description_pattern.search(text)
+    if start is None or _is_in_raw_region(text, start.start()):
+        return None
+    content = _find_div_content(text, start)
+    if content is None:
+        return None
+    description = _get_text(text[content[0]:content[1]])
+    if description is None:
+        return None
+    found, key_skills = extract_key_skills(text)
+    if not found:
+        return None
+    return description, key_skills
@@ -0,0 +1,121 @@
+"""Постоянный кэш HTTP-ответов HeadHunter в SQLite.
+
+Ответ хранится по ключу "адрес + отсортированные параметры запроса"
+вместе с валидаторами ETag и Last-Modified:
+    - моложе ttl - отдается из кэша без запроса (квота API не расходуется);
+    - старше ttl - запрос отправляется с заголовками If-None-Match /
+      If-Modified-Since, ответ 304 продлевает запись без загрузки тела;
+    - записи, не обновлявшиеся дольше max_age, и самые давно использованные
+      записи сверх max_entries удаляются при открытии кэша.
+Используется клиентами hh_client через параметр cache.
+"""
+import os
+import time
+import sqlite3
+import urllib.parse
+from collections import namedtuple
+
+CacheEntry = namedtuple('CacheEntry', ['key', 'body', 'etag', 'last_modified', 'fetched_at'])
+
+class HttpCache:
+    """Кэш ответов в файле SQLite, соединение открывается при первом обращении.
+
+    Аргументы
+    ----------
+    path: str
+        Путь к файлу кэша.
+    ttl: float, default: 43200
+        Время, в течение которого ответ отдается без запроса, с.
+    max_age: float, default: 604800
+        Время хранения записи без обновления, с.
+    max_entries: int, default: 100000
+        Максимальное количество записей.
+    """
+    def __init__(self, path, ttl=12 * 3600, max_age=7 * 24 * 3600, max_entries=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Кэш может использоваться несколькими процессами (например, версиями DAG)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, last_modified TEXT, '
+                'fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+                )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+            self.evict()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def get_key(url, params=None):
+        """Ключ записи: адрес и отсортированные параметры запроса."""
+        if not params:
+            return url
+        return f'{url}?{urllib.parse.urlencode(sorted(params.items()), doseq=True)}'
+
+    def get(self, url, params=None):
+        """Запись кэша по адресу и параметрам или None."""
+        key = self.get_key(url, params)
+        row = self.conn.execute(
+            'SELECT key, body, etag, last_modified, fetched_at FROM responses WHERE key = ?', (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        return CacheEntry(*row)
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.ttl
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        """Заголовки условного запроса по валидаторам записи."""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(self, url, params, body, headers):
+        """Сохранение успешного ответа (headers - заголовки ответа)."""
+        now = time.time()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+            (self.get_key(url, params), body, headers.get('ETag'), headers.get('Last-Modified'), now, now),
+            )
+
+    def refresh(self, entry, headers):
+        """Продление записи после ответа 304 (валидаторы обновляются, если пришли новые)."""
+        now = time.time()
+        self.conn.execute(
+            'UPDATE responses SET etag = ?, last_modified = ?, fetched_at = ?, accessed_at = ? WHERE key = ?',
+            (
+                headers.get('ETag') or entry.etag, headers.get('Last-Modified') or entry.last_modified,
+                now, now, entry.key,
+                ),
+            )
+
+    def evict(self):
+        """Удаление записей старше max_age и самых давно использованных сверх max_entries."""
+        self.conn.execute('DELETE FROM responses WHERE fetched_at < ?', (time.time() - self.max_age,))
+        self.conn.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+            )
@@ -1,6 +1,9 @@
 import hh_html_parsing
 import hh_api_parsing
+from helpers import run_apps
 
 if __name__ == "__main__":
-    hh_html_parsing.app()
-    hh_api_parsing.app()
\ No newline at end of file
+    run_apps(
+        hh_html_parsing=hh_html_parsing.app,
+        hh_api_parsing=hh_api_parsing.app,
+        )
\ No newline at end of file
@@ -1,18 +1,218 @@
+import io
+import os
+import csv
+import struct
+import threading
+import weakref
+from contextlib import contextmanager
+
 import psycopg2
 import psycopg2.extras
-from sqlalchemy import create_engine
+import psycopg2.pool
+from sqlalchemy import create_engine, event, exc
+import numpy as np
 import pandas as pd
 from numpy import NaN
 from string import Template
 
 import config
+import metrics
+
+# Размер страницы psycopg2.extras.execute_values: одна страница - одно обращение к БД
+execute_values_page_size = 100
+
+# Заголовок и завершение бинарного формата COPY PostgreSQL
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+PGCOPY_NULL = struct.pack('>i', -1)
+
+# Все созданные коннекторы - для сброса пулов в дочернем процессе после fork
+_connectors = weakref.WeakSet()
+
+def _detach_connection(conn):
+    """Отвязка унаследованного после fork соединения от сокета родителя.
+    Дескриптор подменяется на /dev/null: при сборке мусора libpq отправит
+    сообщение о завершении сессии в никуда, а соединение родителя не пострадает.
+    """
+    if conn.closed:
+        return
+    devnull = os.open(os.devnull, os.O_RDWR)
+    try:
+        os.dup2(devnull, conn.fileno())
+    finally:
+        os.close(devnull)
+
+def _reset_connectors_after_fork():
+    for connector in list(_connectors):
+        connector._reset_after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_connectors_after_fork)
 
 class PsqlConnector():
     """Класс для работы с базой данных PostgreSQL"""
     
-    def __init__(self):
+    def __init__(self, minconn=None, maxconn=None):
+        """
+        Аргументы
+        ----------
+        minconn: int, default: None
+            Минимальный размер пула соединений, по умолчанию config.db_pool_minconn.
+        maxconn: int, default: None
+            Максимальный размер пула соединений, по умолчанию config.db_pool_maxconn.
+        """
         self.db_credentials = config.DB_CREDENTIALS
         self.db_uri = config.DB_URI
+        self.minconn = minconn or config.db_pool_minconn
+        self.maxconn = maxconn or config.db_pool_maxconn
+        self._pool = None
+        self._engine = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool при занятых maxconn соединениях выдает ошибку:
+        # семафор заставляет getconn ждать возврата соединения
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        # Пулы и движки, унаследованные от родительского процесса:
+        # хранятся, чтобы сборщик мусора не закрывал их соединения раньше отвязки
+        self._inherited = []
+        _connectors.add(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _reset_after_fork(self):
+        """Сброс пула и движка в дочернем процессе после fork.
+        Соединения родителя отвязываются без закрытия, новые создаются лениво.
+        """
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        if self._pool is not None:
+            for conn in list(self._pool._pool) + list(self._pool._used.values()):
+                _detach_connection(conn)
+            self._inherited.append(self._pool)
+            self._pool = None
+        if self._engine is not None:
+            self._inherited.append(self._engine)
+            self._engine = None
+    
+    def get_pool(self):
+        """Пул соединений psycopg2 текущего процесса, создается при первом обращении."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if isinstance(self.db_credentials, str):
+                        self._pool = psycopg2.pool.ThreadedConnectionPool(
+                            self.minconn, self.maxconn, self.db_credentials)
+                    else:
+                        self._pool = psycopg2.pool.ThreadedConnectionPool(
+                            self.minconn, self.maxconn, **self.db_credentials)
+        return self._pool
+    
+    def get_engine(self):
+        """Движок SQLAlchemy текущего процесса, создается при первом обращении."""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    engine = create_engine(
+                        self.db_uri,
+                        pool_size=self.minconn,
+                        max_overflow=self.maxconn - self.minconn,
+                        )
+                    
+                    @event.listens_for(engine, 'connect')
+                    def on_connect(dbapi_connection, connection_record):
+                        connection_record.info['pid'] = os.getpid()
+                    
+                    @event.listens_for(engine, 'checkout')
+                    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+                        if connection_record.info['pid'] != os.getpid():
+                            _detach_connection(dbapi_connection)
+                            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+                            raise exc.DisconnectionError('Соединение создано в другом процессе')
+                    
+                    self._engine = engine
+        return self._engine
+    
+    def getconn(self):
+        """Получение соединения из пула. Если заняты все maxconn соединений,
+        ожидается возврат соединения (не дольше config.db_pool_timeout секунд)."""
+        if not self._slots.acquire(timeout=config.db_pool_timeout):
+            raise psycopg2.pool.PoolError(
+                f'Нет свободного соединения в пуле за {config.db_pool_timeout} с (maxconn={self.maxconn})'
+                )
+        try:
+            return self.get_pool().getconn()
+        except(Exception, psycopg2.DatabaseError) as error:
+            self._slots.release()
+            print(error)
+            raise error
+    
+    def putconn(self, conn):
+        """Возврат соединения в пул. Разорванные соединения закрываются."""
+        try:
+            self.get_pool().putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер соединения из пула.
+        Транзакция фиксируется при успешном выходе и откатывается при ошибке.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+            metrics.add_db_round_trips()
+        except(Exception, psycopg2.DatabaseError) as error:
+            if not conn.closed:
+                conn.rollback()
+            raise error
+        finally:
+            self.putconn(conn)
+    
+    @contextmanager
+    def cursor(self, conn=None):
+        """Контекстный менеджер курсора.
+        Без conn соединение берется из пула, транзакция фиксируется при успешном
+        выходе и откатывается при ошибке. С conn курсор открывается на переданном
+        соединении, а фиксация транзакции остается за вызывающим кодом.
+        
+        Аргументы
+        ----------
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.connection.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = self.getconn()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            if own_conn:
+                conn.commit()
+                metrics.add_db_round_trips()
+        except(Exception, psycopg2.DatabaseError) as error:
+            print(f"Error: {error}")
+            if own_conn and not conn.closed:
+                conn.rollback()
+            raise error
+        finally:
+            cursor.close()
+            if own_conn:
+                self.putconn(conn)
+    
+    def close(self):
+        """Закрытие всех соединений пула и движка SQLAlchemy."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
         
     def get_query_from_file(self, filepath, encoding='utf-8', **sql_kwargs):
         with open(filepath, 'r', encoding=encoding) as f:
@@ -42,6 +242,63 @@ class PsqlConnector():
         df = df.replace({NaN: None})
         
         return df
+    
+    def normalize_column(self, values):
+        """Преобразование колонки в список значений Python для загрузки в БД
+        с заменой пустот на None в зависимости от типа колонки:
+        NaN - для вещественных, NaT - для дат, NA - для nullable-типов,
+        None, NaN и пустые строки '' - для object-колонок.
+        
+        Аргументы
+        ----------
+        values : pandas.Series
+            Колонка датафрейма.
+        
+        Возвращается
+        ----------
+        values : list
+        """
+        kind = values.dtype.kind
+        if kind in 'iub' and not pd.api.types.is_extension_array_dtype(values.dtype):
+            return values.tolist()
+        
+        if kind == 'f' and not pd.api.types.is_extension_array_dtype(values.dtype):
+            mask = np.isnan(values.to_numpy())
+            values = values.tolist()
+        elif kind == 'O':
+            array = values.to_numpy()
+            mask = pd.isna(array) | (array == '')
+            values = array.tolist()
+        else:
+            mask = values.isna().to_numpy()
+            values = values.astype(object).tolist()
+        
+        for i in np.flatnonzero(mask):
+            values[i] = None
+        return values
+    
+    def iter_db_rows(self, df, chunk_size=100000):
+        """Построчная сериализация датафрейма для загрузки в БД с заменой
+        пустот на None за один проход по колонкам (см. self.normalize_column).
+        В отличие от self.replace_nans, нормализованная копия датафрейма
+        не создается: колонки преобразуются частями по chunk_size строк,
+        а кортежи строк отдаются генератором.
+        
+        Аргументы
+        ----------
+        df : pandas.DataFrame
+            Датафрейм для заливки в БД.
+        chunk_size: int, default: 100000
+            Количество строк, преобразуемых за раз.
+        
+        Возвращается
+        ----------
+        Генератор кортежей значений строк.
+        """
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            columns = [self.normalize_column(chunk.iloc[:, i]) for i in range(chunk.shape[1])]
+            yield from zip(*columns)
 
     def connect(self):
         """Создание подключения к базе данных PostgreSQL."""
@@ -56,7 +313,7 @@ class PsqlConnector():
             raise error
         return conn
             
-    def insert_values(self, df, schema, table, on_conflict_clause=None):
+    def insert_values(self, df, schema, table, on_conflict_clause=None, method='values', conn=None):
         """Обертка для метода
         psycopg2.extras.execute_values с обработкой подключения.
         
@@ -75,29 +332,171 @@ class PsqlConnector():
                 или
                 "ON CONFLICT (name) DO 
                 UPDATE SET email = EXCLUDED.email"
+        method: str, default: 'values'
+            Способ загрузки:
+                'values' - INSERT ... VALUES через psycopg2.extras.execute_values;
+                'copy' - COPY ... FROM STDIN, см. self.copy_values.
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.cursor.
         """
+        if method == 'copy':
+            return self.copy_values(df, schema, table, on_conflict_clause=on_conflict_clause, conn=conn)
+        elif method != 'values':
+            raise ValueError(f'Неизвестный способ загрузки: "{method}"')
+        
         if not on_conflict_clause:
             on_conflict_clause = ''
         
-        conn = self.connect()
-        cursor = conn.cursor()
-        
-        try:
-            df = self.replace_nans(df)
-            tuples = [tuple(x) for x in df.to_numpy()]
+        with self.cursor(conn) as cursor:
+            tuples = self.iter_db_rows(df)
             cols = ','.join(list(df.columns))
             query  = f"INSERT INTO {schema}.{table}({cols}) VALUES %s {on_conflict_clause}"
-            psycopg2.extras.execute_values(cursor, query, tuples)
-            conn.commit()
-        except(Exception, psycopg2.DatabaseError) as error:
-            print(f"Error: {error}")
-            conn.rollback()
-            raise error
-        finally:
-            cursor.close()
-            conn.close()
+            psycopg2.extras.execute_values(cursor, query, tuples, page_size=execute_values_page_size)
+            metrics.add_db_round_trips(-(-len(df) // execute_values_page_size))
+
+    def get_copy_buffer(self, df, copy_format='csv'):
+        """Сериализация датафрейма в буфер в памяти для COPY ... FROM STDIN.
+        Пустоты (None, NaN, NaT) и пустые строки '' загружаются как NULL.
+        
+        Аргументы
+        ----------
+        df : pandas.DataFrame
+            Датафрейм для заливки в БД.
+        copy_format: str, default: 'csv'
+            Формат буфера:
+                'csv' - текстовый CSV;
+                'binary' - бинарный формат PostgreSQL, поддерживаются колонки
+                    целочисленных (BIGINT), вещественных (DOUBLE PRECISION), логических
+                    и строковых типов.
+        
+        Возвращается
+        ----------
+        buffer : io.BytesIO
+            Буфер, установленный на начало.
+        """
+        if copy_format == 'csv':
+            df = df.copy(deep=False)
+            for col in df.columns:
+                # Целые числа, ставшие float из-за пустот, пишутся без ".0"
+                values = df[col]
+                if values.dtype.kind == 'f' and (values.dropna() % 1 == 0).all():
+                    df[col] = values.astype('Int64')
+            buffer = io.BytesIO()
+            text_buffer = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+            df.to_csv(text_buffer, index=False, header=False, na_rep='', quoting=csv.QUOTE_MINIMAL)
+            text_buffer.detach()
+            buffer.seek(0)
+        elif copy_format == 'binary':
+            buffer = io.BytesIO()
+            buffer.write(PGCOPY_HEADER)
+            columns = [self._encode_binary_column(df[col]) for col in df.columns]
+            field_count = struct.pack('>h', len(columns))
+            for fields in zip(*columns):
+                buffer.write(field_count)
+                buffer.write(b''.join(fields))
+            buffer.write(PGCOPY_TRAILER)
+            buffer.seek(0)
+        else:
+            raise ValueError(f'Неизвестный формат COPY: "{copy_format}"')
+        return buffer
+    
+    def _encode_binary_column(self, values):
+        """Кодирование колонки в поля бинарного формата COPY (длина + данные)."""
+        kind = values.dtype.kind
+        notna = pd.notna(values).tolist()
+        if kind in 'iu':
+            pack = struct.Struct('>iq').pack
+            return [pack(8, int(x)) if ok else PGCOPY_NULL for x, ok in zip(values.tolist(), notna)]
+        if kind == 'f':
+            pack = struct.Struct('>id').pack
+            return [pack(8, x) if ok else PGCOPY_NULL for x, ok in zip(values.tolist(), notna)]
+        if kind == 'b':
+            return [struct.pack('>i?', 1, x) if ok else PGCOPY_NULL for x, ok in zip(values.tolist(), notna)]
+        if kind == 'O':
+            fields = []
+            for x, ok in zip(values.tolist(), notna):
+                if not ok or x == '':
+                    fields.append(PGCOPY_NULL)
+                elif isinstance(x, str):
+                    data = x.encode('utf-8')
+                    fields.append(struct.pack('>i', len(data)) + data)
+                else:
+                    raise TypeError(f'Колонка "{values.name}": тип {type(x).__name__} не поддерживается бинарным COPY')
+            return fields
+        raise TypeError(f'Колонка "{values.name}": тип {values.dtype} не поддерживается бинарным COPY')
+    
+    def copy_buffer(self, buffer, schema, table, columns, on_conflict_clause=None, copy_format='csv', conn=None):
+        """Загрузка подготовленного буфера через COPY ... FROM STDIN.
+        При заданном on_conflict_clause данные сначала копируются во временную
+        staging-таблицу, а затем переносятся запросом INSERT ... SELECT ... ON CONFLICT.
+        
+        Аргументы
+        ----------
+        buffer : file-like
+            Буфер в формате copy_format, см. self.get_copy_buffer.
+        schema: str
+            Название схемы БД.
+        table : str
+            Название таблицы БД.
+        columns : list[str]
+            Колонки таблицы в порядке полей буфера.
+        on_conflict_clause: str
+            Выражение для выполнения т.н. "UPSERT", см. self.insert_values.
+        copy_format: str, default: 'csv'
+            Формат буфера: 'csv', 'binary' или 'text' (текстовый формат COPY:
+            поля через табуляцию, пустоты - \\N).
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.cursor.
+        """
+        cols = ','.join(columns)
+        if copy_format == 'csv':
+            copy_options = f'FORMAT csv, FORCE_NULL ({cols})'
+        elif copy_format in ('binary', 'text'):
+            copy_options = f'FORMAT {copy_format}'
+        else:
+            raise ValueError(f'Неизвестный формат COPY: "{copy_format}"')
+        
+        with self.cursor(conn) as cursor:
+            if on_conflict_clause:
+                staging_table = f'{table}_staging'
+                cursor.execute(
+                    f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP "
+                    f"AS SELECT {cols} FROM {schema}.{table} WITH NO DATA"
+                    )
+                cursor.copy_expert(f"COPY {staging_table}({cols}) FROM STDIN WITH ({copy_options})", buffer)
+                cursor.execute(
+                    f"INSERT INTO {schema}.{table}({cols}) SELECT {cols} FROM {staging_table} {on_conflict_clause}"
+                    )
+                cursor.execute(f"DROP TABLE {staging_table}")
+                metrics.add_db_round_trips(4)
+            else:
+                cursor.copy_expert(f"COPY {schema}.{table}({cols}) FROM STDIN WITH ({copy_options})", buffer)
+                metrics.add_db_round_trips()
+    
+    def copy_values(self, df, schema, table, on_conflict_clause=None, copy_format='csv', conn=None):
+        """Загрузка датафрейма через COPY ... FROM STDIN
+        с сериализацией в буфер в памяти.
+        
+        Аргументы
+        ----------
+        df : pandas.DataFrame
+            Датафрейм для заливки в БД.
+        schema: str
+            Название схемы БД.
+        table : str
+            Название таблицы БД.
+        on_conflict_clause: str
+            Выражение для выполнения т.н. "UPSERT", см. self.insert_values.
+            Выполняется через временную staging-таблицу.
+        copy_format: str, default: 'csv'
+            Формат буфера: 'csv' или 'binary', см. self.get_copy_buffer.
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.cursor.
+        """
+        buffer = self.get_copy_buffer(df, copy_format)
+        self.copy_buffer(buffer, schema, table, list(df.columns), on_conflict_clause, copy_format, conn=conn)
 
-    def read_query(self, query):
+    def read_query(self, query, params=None):
         """Обертка для метода pd.read_sql_query
         с обработкой подключения
         
@@ -105,15 +504,13 @@ class PsqlConnector():
         ----------
         query : str
             SELECT SQL-запрос.
+        params: dict | tuple, default: None
+            Параметры запроса в формате psycopg2, например %(name)s.
         """
-        engine = create_engine(self.db_uri)
-        try:
-            df = pd.read_sql_query(query, engine)
-            return df
-        finally:
-            engine.dispose()
+        metrics.add_db_round_trips()
+        return pd.read_sql_query(query, self.get_engine(), params=params)
 
-    def execute_query(self, query):
+    def execute_query(self, query, params=None, conn=None):
         """Метод для выполнения различных запросов, 
         не возвращающих таблицы
         
@@ -121,19 +518,36 @@ class PsqlConnector():
         ----------
         query : str
             Любой SQL-запрос.
+        params: dict | tuple, default: None
+            Параметры запроса в формате psycopg2, например %(name)s.
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.cursor.
         """
-        conn = self.connect()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(query)
-            conn.commit()
-        except(Exception, psycopg2.DatabaseError) as error:
-            print(f"Error: {error}")
-            conn.rollback()
-            cursor.close()
-            raise error
-        finally:
-            conn.close()
+        with self.cursor(conn) as cursor:
+            cursor.execute(query, params)
+            metrics.add_db_round_trips()
+            
+    def fetch_query(self, query, params=None, conn=None):
+        """Выполнение запроса с возвратом строк результата
+        (например, INSERT ... RETURNING)
+        
+        Аргументы
+        ----------
+        query : str
+            SQL-запрос, возвращающий строки.
+        params: dict | tuple, default: None
+            Параметры запроса в формате psycopg2, например %(name)s.
+        conn: psycopg2.extensions.connection, default: None
+            Соединение внешней транзакции, см. self.cursor.
+        
+        Возвращается
+        ----------
+        rows: list[tuple]
+        """
+        with self.cursor(conn) as cursor:
+            cursor.execute(query, params)
+            metrics.add_db_round_trips()
+            return cursor.fetchall()
             
     def execute_sql(self, filepath, encoding='cp1251', **sql_kwargs):
         """Надстройка на методом self.execute_query
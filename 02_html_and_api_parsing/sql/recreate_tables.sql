@@ -1,5 +1,6 @@
-DROP SCHEMA IF EXISTS $schema CASCADE;
-CREATE SCHEMA $schema;
+CREATE SCHEMA IF NOT EXISTS $schema;
+
+DROP TABLE IF EXISTS $schema.vacancies_key_skills, $schema.vacancies;
 
 CREATE TABLE $schema.vacancies (
 	id BIGINT PRIMARY KEY,
@@ -7,10 +8,11 @@ CREATE TABLE $schema.vacancies (
 	position VARCHAR,
 	city VARCHAR,
 	description VARCHAR,
+	published_at TIMESTAMPTZ,
 	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 	);
 
-CREATE TABLE $schema.key_skills (
+CREATE TABLE IF NOT EXISTS $schema.key_skills (
 	id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
 	skill VARCHAR UNIQUE,
 	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
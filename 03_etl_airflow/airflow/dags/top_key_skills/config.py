@@ -12,6 +12,7 @@ preprod_schema = 'hw3_preprod'
 prod_schema = 'hw3_prod'
 
 egrul_table = 'telecom_companies'
+egrul_manifest_table = 'egrul_manifest'
 vacancies_table = 'vacancies'
 key_skills_table = 'key_skills'
 vacancies_key_skills_table = 'vacancies_key_skills'
@@ -26,7 +27,14 @@ egrul_download_prod_filepath = os.path.join(bulk_data_dir, 'egrul_full_download.
 egrul_test_filepath = os.path.join(bulk_data_dir, 'egrul_test.json.zip')
 egrul_preprod_filepath = os.path.join(bulk_data_dir, 'egrul_full.json.zip')
 
-create_tables_sql_path = 'sql/recreate_schema_n_tables.sql'
+# Создание таблиц ЕГРЮЛ: только недостающие, загруженные компании и манифест (egrul_manifest)
+# сохраняются между запусками DAG независимо от режима синхронизации вакансий
+create_egrul_tables_sql_path = 'sql/create_egrul_tables.sql'
+# Создание таблиц вакансий по режиму синхронизации вакансий (config.hh_sync_mode)
+create_hh_tables_sql_paths = dict(
+    full='sql/recreate_schema_n_tables.sql',
+    incremental='sql/create_schema_n_tables.sql',
+    )
 
 # Параметры скрипта - ЕГРЮЛ
 egrul_test_url = 'https://ofdata.ru/open-data/download/okved_2.json.zip'
@@ -37,6 +45,21 @@ egrul_dtypes = {
     'inn': 'int64',
     'kpp': 'int64',
     }
+# Режим чтения JSON-файлов ЕГРЮЛ: 'stream' - потоковый разбор пачками, 'pandas' - pd.read_json целиком,
+# 'cache' - фильтрация извлеченных из архива компаний, сохраненных в Parquet (egrul_cache_dir)
+egrul_read_mode = 'stream'
+egrul_cache_dir = os.path.join(bulk_data_dir, 'egrul_cache')
+egrul_batch_size = 10000
+# Количество потоков распаковки файлов архива ЕГРЮЛ (распаковываются с опережением, пока загружается текущий)
+egrul_unzip_workers = 4
+# Префиксы событий ijson для извлекаемых полей записи ЕГРЮЛ
+egrul_field_prefixes = {
+    'item.ogrn': 'ogrn',
+    'item.inn': 'inn',
+    'item.kpp': 'kpp',
+    'item.name': 'name',
+    'item.data.СвОКВЭД.СвОКВЭДОсн.КодОКВЭД': 'okved_code',
+    }
     
 # Параметры скрипта - Headhunter API
 base_api_url = 'https://api.hh.ru/vacancies'
@@ -46,5 +69,65 @@ url_params = {
     'text': 'middle python developer',
     'search_field': 'name',
     }
+# Поисковые запросы - параметры запроса списка вакансий (text, search_field, area и др.), например
+# [url_params, {**url_params, 'area': 2}]. Страницы всех запросов запрашиваются параллельно в рамках
+# общего ограничения частоты запросов; вакансия, найденная несколькими запросами, обрабатывается один раз
+search_specs = [url_params]
 
 vacancies_limit = 100
+
+# Синхронизация вакансий: 'full' - таблицы вакансий пересоздаются (sql/recreate_schema_n_tables.sql),
+# дополнительная информация запрашивается по всем найденным вакансиям; 'incremental' - таблицы
+# сохраняются (sql/create_schema_n_tables.sql), дополнительная информация запрашивается только
+# по новым вакансиям и вакансиям с изменившейся датой публикации
+hh_sync_mode = 'full'
+# Сокращение списка вакансий в режиме 'incremental' параметром API date_from: запрашиваются вакансии,
+# опубликованные не раньше последней сохраненной даты публикации минус hh_sync_overlap секунд;
+# None - список не сокращается (вакансии, не попавшие в vacancies_limit, будут запрошены в следующий раз)
+hh_sync_overlap = None
+
+# Получение дополнительной информации по вакансиям через API:
+# 'async' - параллельные запросы (hh_client.py), 'sync' - последовательные запросы
+hh_fetch_mode = 'async'
+# Максимальное количество одновременных запросов
+hh_concurrency = 8
+# Адаптивное ограничение частоты запросов (hh_client.AdaptiveThrottle): начальная частота
+# и запросов подряд без ожидания; на ответы 429/503 частота уменьшается вдвое (не ниже min_rate),
+# после increase_after успешных ответов подряд - увеличивается на increase_step (не выше max_rate)
+hh_throttle_params = dict(
+    rate=5,
+    burst=10,
+    min_rate=0.5,
+    max_rate=20,
+    increase_step=0.5,
+    increase_after=20,
+    backoff_base=1,
+    backoff_max=60,
+    )
+# Максимальное количество повторов запроса (429, 5xx, сетевые ошибки)
+hh_max_retries = 5
+# Таймаут запроса, с
+hh_request_timeout = 30
+# Постоянный кэш ответов HeadHunter (http_cache.py), None - без кэша: дополнительная информация
+# по вакансиям моложе ttl отдается без запроса, более старая проверяется условным запросом
+# (If-None-Match / If-Modified-Since); страницы списка вакансий условным запросом проверяются всегда,
+# в режиме hh_sync_mode='incremental' - и дополнительная информация по вакансиям (запрашивается
+# только по изменившимся вакансиям); записи старше max_age и давно использованные сверх max_entries удаляются
+hh_cache_path = os.path.join(bulk_data_dir, 'hh_http_cache.sqlite')
+hh_cache_params = dict(
+    ttl=12 * 3600,
+    max_age=7 * 24 * 3600,
+    max_entries=100000,
+    )
+# Загрузка ключевых навыков вакансий: 'copy' - пары "вакансия - навык" копируются во временную таблицу,
+# навыки и связи добавляются запросами над множествами в одной транзакции; 'values' - связи
+# загружаются PostgresHook.insert_rows (запрос на каждую строку); оба способа берут id навыков из словаря skills_cache
+key_skills_load_method = 'copy'
+# Постоянный словарь ключевых навыков "название - id" (skills_cache.py), None - без словаря:
+# id навыков берутся из словаря, в key_skills добавляются только навыки, которых в словаре нет
+# (key_skills не пересоздается и при hh_sync_mode='full', поэтому словарь действует между запусками);
+# самые давно использованные записи сверх max_entries удаляются
+skills_cache_path = os.path.join(bulk_data_dir, 'key_skills.sqlite')
+skills_cache_params = dict(
+    max_entries=100000,
+    )
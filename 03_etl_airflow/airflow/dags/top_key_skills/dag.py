@@ -51,10 +51,17 @@ for version in dag_versions.keys():
         )
     
     with globals()[dag_id] as dag:
-        create_tables = PostgresOperator(
-            task_id="create_tables",
+        create_hh_tables = PostgresOperator(
+            task_id="create_hh_tables",
             postgres_conn_id=config.postgres_conn_id,
-            sql=config.create_tables_sql_path,
+            sql=config.create_hh_tables_sql_paths[config.hh_sync_mode],
+            params={"schema": dag_versions[version]['schema']},
+            )
+        
+        create_egrul_tables = PostgresOperator(
+            task_id="create_egrul_tables",
+            postgres_conn_id=config.postgres_conn_id,
+            sql=config.create_egrul_tables_sql_path,
             params={"schema": dag_versions[version]['schema']},
             )
         
@@ -89,8 +96,10 @@ for version in dag_versions.keys():
                 ),
             )
         
-        [download_egrul, create_tables] >> upload_telecom_companies
-        upload_vacancies.set_upstream(create_tables)
+        # Оба скрипта создают схему (CREATE SCHEMA IF NOT EXISTS), одновременно они могут конфликтовать
+        create_hh_tables >> create_egrul_tables
+        [download_egrul, create_egrul_tables] >> upload_telecom_companies
+        upload_vacancies.set_upstream(create_hh_tables)
         print_top_key_skills.set_upstream(upload_vacancies)
         print_top_key_skills.set_upstream(upload_telecom_companies)
 
@@ -0,0 +1,94 @@
+"""Постоянный словарь ключевых навыков: название навыка -> id в таблице key_skills.
+
+Словарь хранится в SQLite и переживает перезапуски, поэтому при загрузке
+ключевых навыков таблица key_skills не перечитывается целиком: id берутся
+из словаря, в БД добавляются (INSERT ... ON CONFLICT ... RETURNING id)
+только навыки, которых в словаре нет.
+Записи разделяются по пространствам (namespace) - БД, схема и OID таблицы
+key_skills: после пересоздания или очистки таблицы id навыков меняются, и старые записи
+перестают использоваться. Самые давно использованные записи сверх
+max_entries удаляются при открытии словаря.
+"""
+import os
+import time
+import sqlite3
+
+# Максимальное количество параметров в одном запросе SQLite (ограничение старых версий - 999)
+sqlite_max_variables = 900
+
+class SkillsCache:
+    """Словарь навыков в файле SQLite, соединение открывается при первом обращении.
+
+    Аргументы
+    ----------
+    path: str
+        Путь к файлу словаря.
+    max_entries: int, default: 100000
+        Максимальное количество записей.
+    """
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Словарь может использоваться несколькими процессами (например, версиями DAG)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS skills ('
+                'namespace TEXT NOT NULL, skill TEXT NOT NULL, id INTEGER NOT NULL, '
+                'accessed_at REAL NOT NULL, PRIMARY KEY (namespace, skill))'
+                )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS skills_accessed_at ON skills (accessed_at)')
+            self.evict()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_many(self, namespace, skills):
+        """id навыков skills, найденных в словаре.
+
+        Возвращается
+        ----------
+        ids: dict
+            id по названию навыка (навыков, которых нет в словаре, в нем нет).
+        """
+        skills = list(skills)
+        ids = {}
+        for start in range(0, len(skills), sqlite_max_variables):
+            chunk = skills[start:start + sqlite_max_variables]
+            placeholders = ', '.join('?' * len(chunk))
+            ids.update(self.conn.execute(
+                f'SELECT skill, id FROM skills WHERE namespace = ? AND skill IN ({placeholders})',
+                (namespace, *chunk),
+                ).fetchall())
+            self.conn.execute(
+                f'UPDATE skills SET accessed_at = ? WHERE namespace = ? AND skill IN ({placeholders})',
+                (time.time(), namespace, *chunk),
+                )
+        return ids
+
+    def put_many(self, namespace, ids):
+        """Сохранение id навыков (ids - id по названию навыка)."""
+        now = time.time()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO skills VALUES (?, ?, ?, ?)',
+            [(namespace, skill, skill_id, now) for skill, skill_id in ids.items()],
+            )
+
+    def evict(self):
+        """Удаление самых давно использованных записей сверх max_entries."""
+        self.conn.execute(
+            'DELETE FROM skills WHERE rowid IN ('
+            'SELECT rowid FROM skills ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+            )
@@ -0,0 +1,25 @@
+CREATE SCHEMA IF NOT EXISTS {{ params.schema }};
+
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.telecom_companies (
+	ogrn BIGINT PRIMARY KEY,
+	inn BIGINT,
+	kpp	BIGINT,
+	name VARCHAR,
+	okved_code VARCHAR,
+	source_filename VARCHAR,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	);
+
+CREATE INDEX IF NOT EXISTS telecom_companies_source_filename_idx
+	ON {{ params.schema }}.telecom_companies (source_filename);
+
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.egrul_manifest (
+	archive_path VARCHAR,
+	member_name VARCHAR,
+	crc32 BIGINT,
+	file_size BIGINT,
+	rows_count BIGINT,
+	okved_primary_code VARCHAR,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (archive_path, member_name)
+	);
\ No newline at end of file
@@ -0,0 +1,31 @@
+CREATE SCHEMA IF NOT EXISTS {{ params.schema }};
+
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.vacancies (
+	id BIGINT PRIMARY KEY,
+	employer VARCHAR,
+	position VARCHAR,
+	city VARCHAR,
+	description VARCHAR,
+	published_at TIMESTAMPTZ,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	);
+
+ALTER TABLE {{ params.schema }}.vacancies ADD COLUMN IF NOT EXISTS published_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.key_skills (
+	id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+	skill VARCHAR UNIQUE,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+	);
+
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.vacancies_key_skills (
+	id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+	vacancy_id BIGINT
+		REFERENCES {{ params.schema }}.vacancies(id)
+			ON DELETE CASCADE,
+	key_skill_id BIGINT
+		REFERENCES {{ params.schema }}.key_skills(id)
+			ON DELETE RESTRICT,
+	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	UNIQUE(vacancy_id, key_skill_id)
+	);
\ No newline at end of file
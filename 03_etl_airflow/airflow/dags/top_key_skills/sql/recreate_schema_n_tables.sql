@@ -1,15 +1,10 @@
-DROP SCHEMA IF EXISTS {{ params.schema }} CASCADE;
-CREATE SCHEMA {{ params.schema }};
+CREATE SCHEMA IF NOT EXISTS {{ params.schema }};
 
-CREATE TABLE {{ params.schema }}.telecom_companies (
-	ogrn BIGINT PRIMARY KEY,
-	inn BIGINT,
-	kpp	BIGINT,
-	name VARCHAR,
-	okved_code VARCHAR,
-	source_filename VARCHAR,
-	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-	);
+-- Пересоздаются только таблицы вакансий: таблицы ЕГРЮЛ (sql/create_egrul_tables.sql) сохраняются между запусками,
+-- словарь key_skills тоже сохраняется, чтобы id навыков в постоянном словаре (skills_cache) оставались верными
+DROP TABLE IF EXISTS
+	{{ params.schema }}.vacancies_key_skills,
+	{{ params.schema }}.vacancies;
 
 CREATE TABLE {{ params.schema }}.vacancies (
 	id BIGINT PRIMARY KEY,
@@ -17,10 +12,11 @@ CREATE TABLE {{ params.schema }}.vacancies (
 	position VARCHAR,
 	city VARCHAR,
 	description VARCHAR,
+	published_at TIMESTAMPTZ,
 	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 	);
 
-CREATE TABLE {{ params.schema }}.key_skills (
+CREATE TABLE IF NOT EXISTS {{ params.schema }}.key_skills (
 	id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
 	skill VARCHAR UNIQUE,
 	load_dttm TIMESTAMP DEFAULT CURRENT_TIMESTAMP
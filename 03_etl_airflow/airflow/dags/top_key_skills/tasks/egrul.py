@@ -13,10 +13,9 @@ def get_filelist(zip_path, max_files_count=None):
     max_files_count: int, default: None
         Количество читаемых файлов (для тестирования).
     """
-    from zipfile import ZipFile
+    from top_key_skills.egrul_archive import get_archive
     
-    with ZipFile(zip_path, 'r') as zip_archive:
-        filelist = zip_archive.namelist()
+    filelist = get_archive(zip_path).namelist()
     if max_files_count:
         return filelist[:max_files_count]
     else:
@@ -34,11 +33,87 @@ def get_okved_code(item):
         if item['СвОКВЭД'].get('СвОКВЭДОсн'):
             return item['СвОКВЭД']['СвОКВЭДОсн']['КодОКВЭД']
             
-def get_egrul_data_by_file(egrul_filepath, filename, okved_primary_code, dtypes):
+def iter_egrul_records(f):
+    """Потоковый обход записей JSON-файла ЕГРЮЛ по событиям парсера.
+    Из каждой записи извлекаются только поля config.egrul_field_prefixes.
+    
+    Аргументы
+    ----------
+    f: file-like
+        Бинарный файловый объект с JSON-массивом записей ЕГРЮЛ.
+    """
+    import ijson
+    
+    record = None
+    for prefix, event, value in ijson.parse(f):
+        if prefix == 'item':
+            if event == 'start_map':
+                record = dict.fromkeys(config.egrul_field_prefixes.values())
+            elif event == 'end_map':
+                yield record
+                record = None
+        elif record is not None:
+            field = config.egrul_field_prefixes.get(prefix)
+            if field is not None and event in ('string', 'number'):
+                record[field] = value
+                
+def iter_egrul_data_by_file(f, filename, okved_primary_code, dtypes, batch_size):
+    """Потоковое получение данных ЕГРЮЛ из одного JSON-файла пачками по batch_size строк.
+    
+    Аргументы
+    ----------
+    f: file-like
+        Распакованный JSON-файл.
+    filename: str
+        Название JSON-файла в архиве.
+    okved_primary_code: str | int
+        Фильтруемый код ОКВЭД.
+    dtypes: dict
+        Словарь-маппинг типов данных.
+    batch_size: int
+        Максимальное количество строк в одной пачке.
+    """
+    import pandas as pd
+    from numpy import NaN
+    
+    columns = ['ogrn', 'inn', 'kpp', 'name', 'okved_code', 'source_filename']
+    okved_primary_code = str(okved_primary_code)
+    
+    def get_batch(rows):
+        egrul = pd.DataFrame.from_records(rows, columns=columns)
+        egrul = egrul.replace({'': NaN})
+        egrul = egrul.dropna(how='any')
+        return egrul.astype(dtypes)
+    
+    rows = []
+    for record in iter_egrul_records(f):
+        okved_code = record['okved_code']
+        if not okved_code or not (
+            okved_code == okved_primary_code
+            or okved_code.startswith(f'{okved_primary_code}.')
+            ):
+            continue
+        rows.append((
+            record['ogrn'],
+            record['inn'],
+            record['kpp'],
+            record['name'],
+            okved_code,
+            filename,
+            ))
+        if len(rows) >= batch_size:
+            yield get_batch(rows)
+            rows = []
+    if rows:
+        yield get_batch(rows)
+    
+def get_egrul_data_by_file(f, filename, okved_primary_code, dtypes):
     """Функция для получения данных ЕГРЮЛ из одного JSON-файла.
     
     Аргументы
     ----------
+    f: file-like
+        Распакованный JSON-файл.
     filename: str
         Название JSON-файла в архиве.
     okved_primary_code: str | int
@@ -46,41 +121,172 @@ def get_egrul_data_by_file(egrul_filepath, filename, okved_primary_code, dtypes)
     dtypes: dict
         Словарь-маппинг типов данных.
     """
-    from zipfile import ZipFile
     import pandas as pd
     from numpy import NaN
     
-    with ZipFile(egrul_filepath, 'r') as zip_archive:
-        with zip_archive.open(filename) as f:
-            egrul = pd.read_json(f, dtype=dtypes)
-            egrul['okved_code'] = egrul['data'].map(get_okved_code)
-            egrul = egrul[
-                (egrul['okved_code'].str.startswith(f'{okved_primary_code}.', na=False))
-                | (egrul['okved_code'] == str(okved_primary_code))
-                ]
-            egrul['source_filename'] = filename
-            egrul = egrul[[
-                'ogrn',
-                'inn',
-                'kpp',
-                'name',
-                'okved_code',
-                'source_filename',
-                ]]
-            egrul = egrul.replace({'': NaN})
-            egrul = egrul.dropna(how='any')
-            return egrul
-            
-def upload_egrul(schema, egrul_filepath):
-    """Task - загрузка данных ЕГРЮЛ в базу данных"""
-    filelist = get_filelist(egrul_filepath)
-    for filename in filelist:
+    egrul = pd.read_json(f, dtype=dtypes)
+    egrul['okved_code'] = egrul['data'].map(get_okved_code)
+    egrul = egrul[
+        (egrul['okved_code'].str.startswith(f'{okved_primary_code}.', na=False))
+        | (egrul['okved_code'] == str(okved_primary_code))
+        ]
+    egrul['source_filename'] = filename
+    egrul = egrul[[
+        'ogrn',
+        'inn',
+        'kpp',
+        'name',
+        'okved_code',
+        'source_filename',
+        ]]
+    egrul = egrul.replace({'': NaN})
+    egrul = egrul.dropna(how='any')
+    return egrul
+    
+def get_cached_egrul_data_by_file(egrul_archive, info, okved_primary_code, dtypes):
+    """Получение данных ЕГРЮЛ из одного JSON-файла через кэш Parquet.
+    При первом обращении файл разбирается целиком (без фильтра по ОКВЭД)
+    и сохраняется в config.egrul_cache_dir с ключом по CRC32 файла,
+    последующие обращения, в т.ч. с другим кодом ОКВЭД, читают только кэш.
+    
+    Аргументы
+    ----------
+    egrul_archive: top_key_skills.egrul_archive.EgrulArchive
+        Открытый архив ЕГРЮЛ.
+    info: zipfile.ZipInfo
+        Описание файла в архиве.
+    okved_primary_code: str | int
+        Фильтруемый код ОКВЭД.
+    dtypes: dict
+        Словарь-маппинг типов данных.
+    """
+    import os
+    import pandas as pd
+    from numpy import NaN
+    
+    archive_name = os.path.basename(egrul_archive.path).split('.')[0]
+    member_name = info.filename.replace('/', '_')
+    cache_path = os.path.join(config.egrul_cache_dir, archive_name, f'{member_name}.{info.CRC:08x}.parquet')
+    if not os.path.exists(cache_path):
+        logger.info(f'Кэширование файла {info.filename} в {cache_path}')
+        with egrul_archive.open(info) as f:
+            egrul = pd.DataFrame.from_records(
+                list(iter_egrul_records(f)),
+                columns=list(config.egrul_field_prefixes.values()),
+                )
+        for col in dtypes:
+            egrul[col] = pd.to_numeric(egrul[col], errors='coerce').astype('Int64')
+        egrul['source_filename'] = info.filename
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        egrul.to_parquet(temp_path, index=False)
+        os.replace(temp_path, cache_path)
+    
+    egrul = pd.read_parquet(cache_path)
+    okved_primary_code = str(okved_primary_code)
+    egrul = egrul[
+        (egrul['okved_code'] == okved_primary_code)
+        | egrul['okved_code'].str.startswith(f'{okved_primary_code}.', na=False)
+        ]
+    egrul = egrul.replace({'': NaN})
+    egrul = egrul.dropna(how='any')
+    return egrul.astype(dtypes)
+    
+def get_pending_fileinfo(pg_hook, schema, egrul_filepath):
+    """Получение описаний файлов архива, которые еще не загружены
+    или изменились с момента загрузки (по CRC32 и размеру в манифесте),
+    а также всех файлов, загруженных с другим кодом ОКВЭД.
+    
+    Аргументы
+    ----------
+    pg_hook: PostgresHook
+        Хук подключения к базе данных.
+    schema: str
+        Название схемы БД.
+    egrul_filepath: str
+        Путь к zip-файлу.
+    """
+    import os
+    from top_key_skills.egrul_archive import get_archive
+    
+    infolist = get_archive(egrul_filepath).infolist
+    records = pg_hook.get_records(
+        f"""SELECT member_name, crc32, file_size, okved_primary_code
+        FROM {schema}.{config.egrul_manifest_table} WHERE archive_path = %s""",
+        parameters=(os.path.abspath(egrul_filepath),),
+        )
+    loaded = {record[0]: tuple(record[1:]) for record in records}
+    okved_primary_code = str(config.okved_primary_code)
+    return [
+        info for info in infolist
+        if loaded.get(info.filename) != (info.CRC, info.file_size, okved_primary_code)
+        ]
+
+def upload_egrul(schema, egrul_filepath, read_mode=config.egrul_read_mode):
+    """Task - загрузка данных ЕГРЮЛ в базу данных.
+    Загружаются только новые или измененные файлы архива (см. egrul_manifest),
+    каждый файл - в отдельной транзакции вместе с записью в манифесте.
+    Пока файл разбирается и загружается, следующие файлы распаковываются
+    в config.egrul_unzip_workers потоках (см. egrul_archive).
+    
+    Аргументы
+    ----------
+    read_mode: str
+        'stream' - потоковый разбор JSON-файлов с загрузкой пачками,
+        'pandas' - чтение JSON-файлов целиком через pd.read_json,
+        'cache' - фильтрация кэша Parquet (см. get_cached_egrul_data_by_file).
+    """
+    import os
+    from sqlalchemy import text
+    from top_key_skills.egrul_archive import get_archive
+    
+    pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
+    engine = pg_hook.get_sqlalchemy_engine()
+    infolist = get_pending_fileinfo(pg_hook, schema, egrul_filepath)
+    logger.info(f'Новых или измененных файлов в архиве {egrul_filepath}: {len(infolist)}')
+    egrul_archive = get_archive(egrul_filepath)
+    if read_mode == 'cache':
+        # Файл распаковывается, только если его еще нет в кэше
+        members = ((info, None) for info in infolist)
+    else:
+        members = egrul_archive.iter_members(infolist, workers=config.egrul_unzip_workers)
+    for info, f in members:
+        filename = info.filename
         logger.info(f'Чтение файла {filename} из архива {egrul_filepath}')
-        egrul = get_egrul_data_by_file(egrul_filepath, filename, config.okved_primary_code, config.egrul_dtypes)
-        if not egrul.empty:
-            pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
-            engine = pg_hook.get_sqlalchemy_engine()    
-            egrul.to_sql(config.egrul_table, schema=schema, con=engine, if_exists='append', index=False)
-            logger.info(f'Залиты данные в {schema}.{config.egrul_table}, кол-во строк: {egrul.shape[0]}')
+        if read_mode == 'stream':
+            batches = iter_egrul_data_by_file(
+                f, filename, config.okved_primary_code, config.egrul_dtypes, config.egrul_batch_size)
+        elif read_mode == 'cache':
+            batches = [get_cached_egrul_data_by_file(
+                egrul_archive, info, config.okved_primary_code, config.egrul_dtypes)]
+        else:
+            batches = [get_egrul_data_by_file(f, filename, config.okved_primary_code, config.egrul_dtypes)]
+        rows_count = 0
+        with engine.begin() as connection:
+            connection.execute(
+                text(f'DELETE FROM {schema}.{config.egrul_table} WHERE source_filename = :filename'),
+                filename=filename,
+                )
+            for egrul in batches:
+                if not egrul.empty:
+                    egrul.to_sql(config.egrul_table, schema=schema, con=connection, if_exists='append', index=False)
+                    rows_count += egrul.shape[0]
+            connection.execute(
+                text(f"""INSERT INTO {schema}.{config.egrul_manifest_table}
+                    (archive_path, member_name, crc32, file_size, rows_count, okved_primary_code)
+                VALUES (:archive_path, :member_name, :crc32, :file_size, :rows_count, :okved_primary_code)
+                ON CONFLICT (archive_path, member_name) DO
+                    UPDATE SET crc32 = EXCLUDED.crc32, file_size = EXCLUDED.file_size,
+                    rows_count = EXCLUDED.rows_count, okved_primary_code = EXCLUDED.okved_primary_code,
+                    load_dttm = CURRENT_TIMESTAMP"""),
+                archive_path=os.path.abspath(egrul_filepath),
+                member_name=filename,
+                crc32=info.CRC,
+                file_size=info.file_size,
+                rows_count=rows_count,
+                okved_primary_code=str(config.okved_primary_code),
+                )
+        if rows_count:
+            logger.info(f'Залиты данные в {schema}.{config.egrul_table}, кол-во строк: {rows_count}')
         else:
             logger.info(f'В файле {filename} нет компаний с номером ОКВЭД {config.okved_primary_code}, пропускаю')
\ No newline at end of file
@@ -3,63 +3,241 @@ from airflow.providers.postgres.hooks.postgres import PostgresHook
 from top_key_skills import config
 from top_key_skills.config import logger
 
-def get_vacancies_by_page(page, params=config.url_params):
-    """Получение списка вакансий из страницы № page"""
-    import requests
-    import pandas as pd
-    import json
+_hh_client = None
+_skills_cache = None
+
+def get_hh_client():
+    """Синхронный клиент API с адаптивным ограничителем частоты запросов (см. hh_client)
+    и постоянным кэшем ответов (см. http_cache), общий для запросов таска;
+    ограничитель и кэш используются и параллельными запросами"""
+    from top_key_skills import hh_client, http_cache
     
+    global _hh_client
+    if _hh_client is None:
+        cache = None
+        if config.hh_cache_path:
+            cache = http_cache.HttpCache(config.hh_cache_path, **config.hh_cache_params)
+        _hh_client = hh_client.HhSyncClient(
+            headers=config.headers,
+            throttle=hh_client.AdaptiveThrottle(**config.hh_throttle_params),
+            max_retries=config.hh_max_retries,
+            timeout=config.hh_request_timeout,
+            cache=cache,
+            )
+    return _hh_client
+
+def get_skills_cache():
+    """Постоянный словарь ключевых навыков (см. skills_cache) или None, если он отключен"""
+    from top_key_skills import skills_cache
+    
+    global _skills_cache
+    if _skills_cache is None and config.skills_cache_path:
+        _skills_cache = skills_cache.SkillsCache(config.skills_cache_path, **config.skills_cache_params)
+    return _skills_cache
+
+def get_key_skills_namespace(cursor, schema):
+    """Пространство постоянного словаря для таблицы key_skills схемы schema: БД, схема,
+    OID и файл таблицы. После пересоздания или очистки таблицы (id навыков начинаются заново)
+    пространство меняется; полная синхронизация (sql/recreate_schema_n_tables.sql)
+    key_skills не пересоздает, поэтому словарь используется и между запусками"""
+    table = f'{schema}.{config.key_skills_table}'
+    cursor.execute(
+        'SELECT current_database(), %s, %s::regclass::oid, pg_relation_filenode(%s::regclass)',
+        (schema, table, table),
+        )
+    return '.'.join(map(str, cursor.fetchone()))
+
+def get_key_skill_ids(pg_hook, schema, skills):
+    """id ключевых навыков: из постоянного словаря, навыки, которых в нем нет,
+    добавляются в таблицу key_skills (или находятся в ней) одним запросом
+    INSERT ... ON CONFLICT ... RETURNING id, без чтения таблицы целиком
+    
+    Возвращается
+    ----------
+    ids: dict
+        id по названию навыка.
+    """
+    skills = list(skills)
+    cache = get_skills_cache()
+    ids, new_ids = {}, {}
+    conn = pg_hook.get_conn()
+    try:
+        with conn, conn.cursor() as cursor:
+            if cache is not None and skills:
+                namespace = get_key_skills_namespace(cursor, schema)
+                ids = cache.get_many(namespace, skills)
+            missing_skills = [skill for skill in skills if skill not in ids]
+            if missing_skills:
+                # DO UPDATE вместо DO NOTHING: RETURNING возвращает и уже существующие навыки
+                cursor.execute(
+                    f'INSERT INTO {schema}.{config.key_skills_table} (skill) SELECT unnest(%s::varchar[]) '
+                    'ON CONFLICT (skill) DO UPDATE SET skill = EXCLUDED.skill RETURNING skill, id',
+                    (missing_skills,),
+                    )
+                new_ids = dict(cursor.fetchall())
+                ids.update(new_ids)
+    finally:
+        conn.close()
+    # В словарь - только после фиксации транзакции: при откате добавленных навыков в БД нет
+    if cache is not None and new_ids:
+        cache.put_many(namespace, new_ids)
+    logger.info(f'Ключевых навыков: {len(skills)}, из них добавлено или найдено в БД: {len(missing_skills)}')
+    return ids
+
+def log_hh_client_stats(stats, throttle):
+    """Логирование счетчиков клиента API и текущей частоты запросов"""
+    logger.info(
+        f'Запросов к API: {stats["http_requests"]}, повторов: {stats["http_retries"]}, '
+        f'ответов 429/503: {stats["http_throttled"]}, из кэша: {stats["http_cache_hits"]}, '
+        f'не изменилось (304): {stats["http_not_modified"]}, получено байт: {stats["bytes_read"]}, '
+        f'частота запросов: {throttle.rate:.2f} запросов/с'
+        )
+
+def get_vacancies_by_page(page, params=config.url_params):
+    """Получение страницы № page списка вакансий (ответ API: items, found, pages и др.).
+    Ответ из кэша всегда проверяется условным запросом: устаревший список пропустил бы
+    новые и переопубликованные вакансии"""
     params = params.copy()
     params['page'] = page
-    response = requests.get(
-        config.base_api_url,
-        headers=config.headers,
-        params=params,
-        )
+    return get_hh_client().get_json(config.base_api_url, params=params, revalidate=True)
+
+def fetch_vacancies_pages(pages):
+    """Параллельное получение страниц списка вакансий
+    в рамках общего ограничения частоты запросов (см. hh_client);
+    ответы из кэша проверяются условным запросом, см. get_vacancies_by_page
     
-    if response.status_code != 200:
-        raise Exception(f'Не удалось получить список вакансий - "{response.url}"')
+    Аргументы
+    ----------
+    pages: list[tuple[dict, int]]
+        Параметры поискового запроса и номер страницы.
     
-    data = json.loads(response.text)
-    vacancies_by_page = pd.DataFrame(data['items'])
+    Возвращается
+    ----------
+    responses: list[dict]
+        Ответы API в порядке pages.
+    """
+    from top_key_skills import hh_client
     
-    return vacancies_by_page
+    client = get_hh_client()
+    responses, stats = hh_client.get_json_many(
+        [config.base_api_url] * len(pages),
+        params=[{**params, 'page': page} for params, page in pages],
+        revalidate=True,
+        headers=config.headers,
+        throttle=client.throttle,
+        concurrency=config.hh_concurrency,
+        max_retries=config.hh_max_retries,
+        timeout=config.hh_request_timeout,
+        cache=client.cache,
+        )
+    log_hh_client_stats(stats, client.throttle)
+    return responses
+
+def get_vacancies_pages(pages):
+    """Получение страниц списка вакансий (pages - см. fetch_vacancies_pages)
+    в режиме config.hh_fetch_mode"""
+    if config.hh_fetch_mode == 'async':
+        return fetch_vacancies_pages(pages)
+    elif config.hh_fetch_mode == 'sync':
+        client = get_hh_client()
+        responses = [get_vacancies_by_page(page, params) for params, page in pages]
+        log_hh_client_stats(client.pop_stats(), client.throttle)
+        return responses
+    else:
+        raise ValueError(f'Неизвестный режим получения вакансий: "{config.hh_fetch_mode}"')
 
-def get_vacancies():
-    """Получение списка вакансий"""
+def get_vacancies(specs=None):
+    """Получение списка вакансий по поисковым запросам specs (по умолчанию config.search_specs):
+    первые страницы всех запросов запрашиваются параллельно, количество страниц - из ответов
+    на них, остальные страницы всех запросов - параллельно. Вакансия, найденная несколькими
+    запросами, остается одна - дополнительная информация по ней запрашивается один раз"""
     import pandas as pd
     
-    vacancies = pd.DataFrame()
-    page = 0
-    while True:
-        vacancies_by_page = get_vacancies_by_page(page)
-        if len(vacancies_by_page) > 0:
-            temp = pd.DataFrame(vacancies_by_page)
-            vacancies = pd.concat([vacancies, temp])
-            page += 1
-        else:
-            break
-            
+    specs = config.search_specs if specs is None else specs
+    first_pages = get_vacancies_pages([(params, 0) for params in specs])
+    pages = [
+        (params, page)
+        for params, data in zip(specs, first_pages)
+        for page in range(1, data['pages'])
+        ]
+    logger.info(
+        f'Поисковых запросов: {len(specs)}, найдено вакансий: {sum(data["found"] for data in first_pages)}, '
+        f'страниц: {len(first_pages) + len(pages)}'
+        )
+    other_pages = get_vacancies_pages(pages)
+    
+    # Записи всех страниц собираются в датафрейм один раз
+    vacancies = pd.DataFrame(
+        [item for data in [*first_pages, *other_pages] for item in data['items']],
+        columns=['id', 'name', 'employer', 'area', 'url', 'published_at'],
+        )
+    found_count = len(vacancies)
+    vacancies = vacancies.drop_duplicates('id')
+    logger.info(f'Вакансий в списке: {found_count}, без повторов: {len(vacancies)}')
     vacancies['city'] = vacancies['area'].str['name']
     vacancies['employer'] = vacancies['employer'].str['name']
     vacancies['position'] = vacancies['name']
     
-    return vacancies[['id', 'position', 'employer', 'city', 'url']]
+    return vacancies[['id', 'position', 'employer', 'city', 'url', 'published_at']]
 
-def get_vacancy_addnl_info(vacancy_url):
-    """Получение дополнительной информации по вакансии"""
-    import requests
-    import json
+def get_stored_vacancies(schema):
+    """Загруженные ранее вакансии с описанием: id и дата публикации"""
+    import pandas as pd
     
-    response = requests.get(
-        vacancy_url,
-        headers=config.headers,
+    pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
+    engine = pg_hook.get_sqlalchemy_engine()
+    
+    stored = pd.read_sql(
+        f'SELECT id, published_at FROM {schema}.{config.vacancies_table} WHERE description IS NOT NULL',
+        con=engine,
         )
+    stored['id'] = stored['id'].astype(str)
+    return stored
+
+def get_sync_specs(stored):
+    """Поисковые запросы config.search_specs: при заданном config.hh_sync_overlap - с date_from
+    по последней сохраненной дате публикации (минус hh_sync_overlap секунд)"""
+    import pandas as pd
     
-    if response.status_code != 200:
-        raise Exception(f'response.status_code = {response.status_code} - Не удалось получить дополнительную информацию по вакансии "{vacancy_url}". response.text = {response.text}')
+    published_at = pd.to_datetime(stored['published_at'], utc=True)
+    if config.hh_sync_overlap is None or published_at.isna().all():
+        return config.search_specs
+    date_from = published_at.max() - pd.Timedelta(seconds=config.hh_sync_overlap)
+    return [{**params, 'date_from': date_from.strftime('%Y-%m-%dT%H:%M:%S%z')} for params in config.search_specs]
+
+def select_changed_vacancies(vacancies, stored):
+    """Отбор новых вакансий и вакансий с изменившейся датой публикации
     
-    data = json.loads(response.text)
+    Аргументы
+    ----------
+    vacancies: pandas.DataFrame
+        Найденные вакансии, см. get_vacancies.
+    stored: pandas.DataFrame
+        Загруженные ранее вакансии, см. get_stored_vacancies.
+    """
+    import pandas as pd
+    
+    vacancies = vacancies.merge(
+        stored.rename(columns={'published_at': 'stored_published_at'}),
+        how='left',
+        on='id',
+        validate='many_to_one',
+        )
+    # У новых вакансий stored_published_at пустая (NaT), сравнение с ней дает True
+    is_changed = (
+        pd.to_datetime(vacancies['published_at'], utc=True)
+        != pd.to_datetime(vacancies['stored_published_at'], utc=True)
+        )
+    return vacancies.loc[is_changed].drop(columns=['stored_published_at'])
+
+def get_vacancy_addnl_info(vacancy_url, revalidate=False):
+    """Получение дополнительной информации по вакансии
+    (revalidate - ответ из кэша проверяется условным запросом, см. hh_client)"""
+    data = get_hh_client().get_json(vacancy_url, revalidate=revalidate)
+    return parse_vacancy_addnl_info(data)
+
+def parse_vacancy_addnl_info(data):
+    """Описание и ключевые навыки (через '|') из ответа API по вакансии"""
     description = data['description']
 
     key_skills_dict = data.get('key_skills')
@@ -70,67 +248,184 @@ def get_vacancy_addnl_info(vacancy_url):
     
     return description, key_skills
 
-def get_vacancies_addnl_info(vacancies, cooldown_timeout=60):
-    """Получение дополнительной информации по вакансиям"""
-    import time
+def fetch_vacancies_addnl_info(vacancy_urls, revalidate=False):
+    """Параллельное получение дополнительной информации по вакансиям
+    с ограничением количества одновременных запросов и их частоты (см. hh_client;
+    revalidate - ответы из кэша проверяются условным запросом)
     
-    vacancy_addnl_info_columns = ['description', 'key_skills']
-    for i, vacancy_tuple in enumerate(vacancies.iterrows()):
-        _, vacancy = vacancy_tuple
-        
-        if i % 119 == 0 and i > 0:
-            logger.info(f'Превышен лимит запросов к API, ожидание {cooldown_timeout} с')
-            time.sleep(cooldown_timeout)
-        current_vacancy_mask = vacancies['id'] == vacancy['id']
-        description, key_skills = get_vacancy_addnl_info(vacancy['url'])
-        vacancies.loc[current_vacancy_mask, vacancy_addnl_info_columns] = description, key_skills
+    Возвращается
+    ----------
+    addnl_info: list[tuple]
+        Описание и ключевые навыки в порядке vacancy_urls.
+    """
+    from top_key_skills import hh_client
+    
+    client = get_hh_client()
+    responses, stats = hh_client.get_json_many(
+        list(vacancy_urls),
+        revalidate=revalidate,
+        headers=config.headers,
+        throttle=client.throttle,
+        concurrency=config.hh_concurrency,
+        max_retries=config.hh_max_retries,
+        timeout=config.hh_request_timeout,
+        cache=client.cache,
+        )
+    log_hh_client_stats(stats, client.throttle)
+    return [parse_vacancy_addnl_info(data) for data in responses]
+
+def merge_addnl_info(vacancies, ids, addnl_info):
+    """Присоединение дополнительной информации к вакансиям одним слиянием по id
+    (вместо присваивания по маске для каждой вакансии)
+    
+    Аргументы
+    ----------
+    ids: list-like
+        Идентификаторы вакансий, по которым получена информация (без повторов).
+    addnl_info: list[tuple]
+        Описание и ключевые навыки (через '|') в порядке ids.
+    """
+    import pandas as pd
+    
+    addnl_info = pd.DataFrame(list(addnl_info), columns=['description', 'key_skills'])
+    addnl_info.insert(0, 'id', list(ids))
+    return vacancies.merge(addnl_info, how='left', on='id', validate='many_to_one')
+
+def get_vacancies_addnl_info(vacancies):
+    """Получение дополнительной информации по вакансиям"""
+    vacancy_urls = vacancies[['id', 'url']].drop_duplicates('id')
+    # В режиме incremental сюда попадают только новые и изменившиеся вакансии (select_changed_vacancies):
+    # свежий ответ из кэша мог быть получен до изменения, поэтому он проверяется условным запросом
+    revalidate = config.hh_sync_mode == 'incremental'
+    if config.hh_fetch_mode == 'async':
+        addnl_info = fetch_vacancies_addnl_info(vacancy_urls['url'], revalidate)
+    elif config.hh_fetch_mode == 'sync':
+        client = get_hh_client()
+        addnl_info = [get_vacancy_addnl_info(vacancy_url, revalidate) for vacancy_url in vacancy_urls['url']]
+        log_hh_client_stats(client.pop_stats(), client.throttle)
+    else:
+        raise ValueError(f'Неизвестный режим получения вакансий: "{config.hh_fetch_mode}"')
+    vacancies = merge_addnl_info(vacancies, vacancy_urls['id'], addnl_info)
 
     vacancies['key_skills'] = vacancies['key_skills'].str.split('|')
     
-    return vacancies[['id', 'position', 'employer', 'city', 'description', 'key_skills']]
+    return vacancies[['id', 'position', 'employer', 'city', 'published_at', 'description', 'key_skills']]
 
 def transform_vacancies_data(vacancies):
     """Трансформация данных по вакансиям"""
     vacancies = vacancies.dropna()
+    # Вакансия может попасть на две страницы списка (при сдвиге выдачи), а загрузка - обновление по id
+    vacancies = vacancies.drop_duplicates('id')
     vacancies = vacancies.head(config.vacancies_limit)
     return vacancies
   
 def load_vacancies(vacancies_src, schema):
-    """Загрузка данных по вакансиям в базу данных"""
-    vacancies = vacancies_src.copy()
-    vacancies = vacancies.drop(columns=['key_skills'])
-    pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
-    engine = pg_hook.get_sqlalchemy_engine()
-    
-    vacancies.to_sql(config.vacancies_table, schema=schema, con=engine, if_exists='append', index=False)
-
-def refresh_key_skills(vacancies, schema):
-    """Обновление данных по ключевым скиллам в связанных таблицах"""
-    import pandas as pd
+    """Загрузка данных по вакансиям в базу данных одним запросом над множеством:
+    вакансии копируются (COPY) во временную staging-таблицу и добавляются
+    в vacancies с обновлением загруженных ранее (ON CONFLICT (id) DO UPDATE)."""
+    import io
     
+    vacancies = vacancies_src.drop(columns=['key_skills'])
+    columns = ', '.join(vacancies.columns)
+    update_columns = ', '.join(f'{column} = EXCLUDED.{column}' for column in vacancies.columns.drop('id'))
+    staging_table = f'{config.vacancies_table}_staging'
+    buffer = io.StringIO()
+    vacancies.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
     pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
-    engine = pg_hook.get_sqlalchemy_engine()
     
-    vacancies_key_skills = vacancies.explode(['key_skills'])[['id', 'key_skills']]
-    vacancies_key_skills.columns = ['vacancy_id', 'skill']
-    vacancies_key_skills = vacancies_key_skills.dropna()
-    vacancies_key_skills['skill'] = vacancies_key_skills['skill'].str.lower()
-    vacancies_key_skills = vacancies_key_skills.drop_duplicates()
-    
-    pg_hook.insert_rows(
-        table=f'{schema}.{config.key_skills_table}',
-        rows=list(
-            vacancies_key_skills[['skill']].itertuples(index=False)
-            ),
-        target_fields=['skill'],
-        replace=True,
-        replace_index=['skill'],
-        )
+    conn = pg_hook.get_conn()
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging_table} '
+                f'(LIKE {schema}.{config.vacancies_table} INCLUDING DEFAULTS) ON COMMIT DROP'
+                )
+            cursor.copy_expert(f'COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f'INSERT INTO {schema}.{config.vacancies_table} ({columns}) '
+                f'SELECT {columns} FROM {staging_table} '
+                f'ON CONFLICT (id) DO UPDATE SET {update_columns}, load_dttm = CURRENT_TIMESTAMP'
+                )
+            logger.info(f'Загружено вакансий: {cursor.rowcount}')
+    finally:
+        conn.close()
+
+def load_vacancies_key_skills(pg_hook, schema, vacancy_ids, vacancies_key_skills):
+    """Загрузка ключевых навыков вакансий запросами над множествами в одной транзакции:
+    тройки (vacancy_id, skill, key_skill_id) копируются (COPY) во временную staging-таблицу
+    (key_skill_id - из постоянного словаря, для навыков не из словаря - пусто), навыки
+    не из словаря добавляются в key_skills (или находятся в ней) с возвратом их id
+    в словарь, а связи - в vacancies_key_skills; id навыков не из словаря ищутся
+    соединением в БД (без чтения key_skills и без запроса на каждую строку).
+    Загруженные ранее связи вакансий vacancy_ids заменяются.
+    """
+    import io
     
-    key_skills = pd.read_sql(f'SELECT id AS key_skill_id, skill FROM {schema}.{config.key_skills_table}', con=engine)
-    vacancies_key_skills = vacancies_key_skills.merge(key_skills, how='left', on='skill')
+    staging_table = f'{config.vacancies_key_skills_table}_staging'
+    vacancies_key_skills = vacancies_key_skills[['vacancy_id', 'skill']]
+    cache = get_skills_cache()
+    new_ids = {}
+    conn = pg_hook.get_conn()
+    try:
+        with conn, conn.cursor() as cursor:
+            cached_ids = {}
+            if cache is not None and not vacancies_key_skills.empty:
+                namespace = get_key_skills_namespace(cursor, schema)
+                cached_ids = cache.get_many(namespace, vacancies_key_skills['skill'].unique())
+            vacancies_key_skills = vacancies_key_skills.assign(
+                key_skill_id=vacancies_key_skills['skill'].map(cached_ids).astype('Int64'),
+                )
+            buffer = io.StringIO()
+            vacancies_key_skills.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging_table} (vacancy_id BIGINT, skill VARCHAR, key_skill_id BIGINT) '
+                'ON COMMIT DROP'
+                )
+            cursor.copy_expert(
+                f'COPY {staging_table} (vacancy_id, skill, key_skill_id) FROM STDIN WITH (FORMAT csv)', buffer,
+                )
+            # DO UPDATE вместо DO NOTHING: RETURNING возвращает и уже существующие навыки
+            cursor.execute(
+                f'INSERT INTO {schema}.{config.key_skills_table} (skill) '
+                f'SELECT DISTINCT skill FROM {staging_table} WHERE key_skill_id IS NULL ORDER BY skill '
+                'ON CONFLICT (skill) DO UPDATE SET skill = EXCLUDED.skill RETURNING skill, id'
+                )
+            new_ids = dict(cursor.fetchall())
+            cursor.execute(
+                f'DELETE FROM {schema}.{config.vacancies_key_skills_table} WHERE vacancy_id = ANY(%s)',
+                ([int(vacancy_id) for vacancy_id in vacancy_ids],),
+                )
+            cursor.execute(
+                f'INSERT INTO {schema}.{config.vacancies_key_skills_table} (vacancy_id, key_skill_id) '
+                f'SELECT vacancy_id, key_skill_id FROM {staging_table} WHERE key_skill_id IS NOT NULL '
+                'UNION ALL '
+                f'SELECT staging.vacancy_id, key_skills.id FROM {staging_table} AS staging '
+                f'JOIN {schema}.{config.key_skills_table} AS key_skills USING (skill) '
+                'WHERE staging.key_skill_id IS NULL '
+                'ON CONFLICT DO NOTHING'
+                )
+            logger.info(f'Загружено связей вакансий и ключевых навыков: {cursor.rowcount}')
+    finally:
+        conn.close()
+    logger.info(f'Ключевых навыков из словаря: {len(cached_ids)}, добавлено или найдено в БД: {len(new_ids)}')
+    # В словарь - только после фиксации транзакции: при откате добавленных навыков в БД нет
+    if cache is not None and new_ids:
+        cache.put_many(namespace, new_ids)
+
+def insert_vacancies_key_skills(pg_hook, schema, vacancies, vacancies_key_skills):
+    """Загрузка ключевых навыков вакансий с id навыков из словаря (см. get_key_skill_ids)"""
+    key_skill_ids = get_key_skill_ids(pg_hook, schema, vacancies_key_skills['skill'].unique())
+    vacancies_key_skills['key_skill_id'] = vacancies_key_skills['skill'].map(key_skill_ids)
     vacancies_key_skills = vacancies_key_skills[['vacancy_id', 'key_skill_id']]
     
+    # Ключевые навыки обновленных вакансий заменяются полностью
+    pg_hook.run(
+        f'DELETE FROM {schema}.{config.vacancies_key_skills_table} WHERE vacancy_id = ANY(%s)',
+        parameters=(vacancies['id'].astype('int64').tolist(),),
+        )
     pg_hook.insert_rows(
         table=f'{schema}.{config.vacancies_key_skills_table}',
         rows=list(
@@ -140,11 +435,40 @@ def refresh_key_skills(vacancies, schema):
         replace=True,
         replace_index=list(vacancies_key_skills.columns),
         )
+
+def refresh_key_skills(vacancies, schema):
+    """Обновление данных по ключевым скиллам в связанных таблицах"""
+    pg_hook = PostgresHook(postgres_conn_id=config.postgres_conn_id)
+    
+    vacancies_key_skills = vacancies.explode(['key_skills'])[['id', 'key_skills']]
+    vacancies_key_skills.columns = ['vacancy_id', 'skill']
+    vacancies_key_skills = vacancies_key_skills.dropna()
+    vacancies_key_skills['skill'] = vacancies_key_skills['skill'].str.lower()
+    vacancies_key_skills = vacancies_key_skills.drop_duplicates()
+    
+    if config.key_skills_load_method == 'copy':
+        load_vacancies_key_skills(pg_hook, schema, vacancies['id'], vacancies_key_skills)
+    elif config.key_skills_load_method == 'values':
+        insert_vacancies_key_skills(pg_hook, schema, vacancies, vacancies_key_skills)
+    else:
+        raise ValueError(f'Неизвестный способ загрузки ключевых навыков: "{config.key_skills_load_method}"')
         
 def upload_hh(schema):
     """Task - получение и загрузка вакансий в базу данных"""
     logger.info('Получение основной информации о вакансиях')
-    vacancies = get_vacancies()
+    if config.hh_sync_mode == 'full':
+        vacancies = get_vacancies()
+    elif config.hh_sync_mode == 'incremental':
+        stored = get_stored_vacancies(schema)
+        vacancies = get_vacancies(get_sync_specs(stored))
+        logger.info(f'Вакансий в списке: {len(vacancies)}, загружено ранее: {len(stored)}')
+        vacancies = select_changed_vacancies(vacancies, stored)
+        logger.info(f'Новых и измененных вакансий: {len(vacancies)}')
+        if vacancies.empty:
+            logger.info('Загрузка данных по вакансиям завершена')
+            return
+    else:
+        raise ValueError(f'Неизвестный режим синхронизации вакансий: "{config.hh_sync_mode}"')
     
     logger.info('Получение дополнительной информации о вакансиях')
     vacancies = get_vacancies_addnl_info(vacancies)